@@ -6,10 +6,32 @@ import uuid
 from dataclasses import dataclass, field
 from typing import Any, Iterable
 
+from .json_fragments import encode, encode_object
 from .students_cms import StudentsCms
 
 CURRENT_VERSION = 2
 DEFAULT_CLASS_NAME = "默认班级"
+# Draw history kept in the user file; older entries move to the archive.
+# Retention is off unless a class sets it, since reports only count the
+# history kept in the file.
+DEFAULT_HISTORY_RETENTION: dict[str, int | None] = {
+    "max_entries": None,
+    "max_days": None,
+}
+
+
+# algorithm_data keys written from StudentsCms state on every save.
+CMS_ALGORITHM_KEYS = frozenset(
+    {
+        "cooldown_days",
+        "history",
+        "next_student_id",
+        "reuse_student_ids",
+        "free_student_ids",
+        "pick_stats",
+        "history_archived_before",
+    }
+)
 
 
 def _generate_id() -> str:
@@ -26,9 +48,35 @@ class Classroom:
     last_used_at: float
     order_index: int
     algorithm_data: dict[str, Any] = field(default_factory=dict)
+    # Encoded students and history per layout, valid for one cms revision.
+    _fragments: dict[
+        tuple[bool, int | None, int], tuple[int, dict[str, str], str]
+    ] = field(default_factory=dict, repr=False, compare=False)
 
     def students_count(self) -> int:
-        return len(self.cms.get_students())
+        return self.cms.student_count()
+
+    def history_retention(self) -> dict[str, int | None]:
+        retention = dict(DEFAULT_HISTORY_RETENTION)
+        configured = self.algorithm_data.get("history_retention")
+        if isinstance(configured, dict):
+            for key in retention:
+                if key not in configured:
+                    continue
+                value = configured[key]
+                try:
+                    retention[key] = None if value is None else max(1, int(value))
+                except (TypeError, ValueError):
+                    continue
+        return retention
+
+    def set_history_retention(
+        self, max_entries: int | None, max_days: int | None
+    ) -> None:
+        self.algorithm_data["history_retention"] = {
+            "max_entries": max_entries,
+            "max_days": max_days,
+        }
 
     def to_metadata(self) -> dict[str, Any]:
         return {
@@ -37,15 +85,76 @@ class Classroom:
             "order": self.order_index,
             "student_count": self.students_count(),
             "cooldown_days": self.cms.pick_cooldown,
+            "history_retention": self.history_retention(),
             "created_at": self.created_at,
             "updated_at": self.updated_at,
             "last_used_at": self.last_used_at,
         }
 
+    def encode_unified(
+        self, compact: bool = False, indent: int | None = None, depth: int = 0
+    ) -> str:
+        """JSON text of this class's unified payload at ``depth``.
+
+        Students, history and the other StudentsCms sections are re-encoded
+        only when the cms revision moved; meta, the remaining
+        ``algorithm_data`` keys and, outside compact output, the roster stats
+        are small and encoded every time. Outside compact output the
+        ``revision`` tag lets clients tell which classes did not change.
+        """
+        cms = self.cms
+        key = (compact, indent, depth)
+        cached = self._fragments.get(key)
+        if cached is None or cached[0] != cms.revision:
+            sections: dict[str, Any] = {
+                "cooldown_days": cms.pick_cooldown,
+                "history": cms.export_history(compact=compact),
+            }
+            sections.update(cms.export_id_state())
+            sections.update(cms.export_pick_stats())
+            students_map = {
+                str(student.student_id): student.serialize()
+                for student in cms.get_students()
+            }
+            cached = self._fragments[key] = (
+                cms.revision,
+                {
+                    name: encode(value, indent, depth + 2)
+                    for name, value in sections.items()
+                },
+                encode(students_map, indent, depth + 1),
+            )
+        _, sections_text, students_text = cached
+        meta = {
+            "name": self.name,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "last_used_at": self.last_used_at,
+            "order": self.order_index,
+        }
+        algorithm_members = [
+            (name, encode(value, indent, depth + 2))
+            for name, value in self.algorithm_data.items()
+            if name not in sections_text
+        ]
+        algorithm_members.extend(sections_text.items())
+        members = [
+            ("meta", encode(meta, indent, depth + 1)),
+            ("algorithm_data", encode_object(algorithm_members, indent, depth + 1)),
+            ("students", students_text),
+        ]
+        if not compact:
+            stats = cms.roster_stats(time.time())
+            members.append(("stats", encode(stats, indent, depth + 1)))
+            members.append(("revision", encode(cms.revision_tag, indent, depth + 1)))
+        return encode_object(members, indent, depth)
+
     def to_payload(self) -> dict[str, Any]:
         algorithm_data = dict(self.algorithm_data)
         algorithm_data["cooldown_days"] = self.cms.pick_cooldown
         algorithm_data["history"] = self.cms.export_history()
+        algorithm_data.update(self.cms.export_id_state())
+        algorithm_data.update(self.cms.export_pick_stats())
         return {
             "id": self.class_id,
             "meta": {
@@ -114,7 +223,10 @@ class ClassroomsState:
         return classroom
 
     def mark_current_modified(self, timestamp: float | None = None) -> None:
-        classroom = self.current_class
+        self.mark_modified(self._current_class_id, timestamp)
+
+    def mark_modified(self, class_id: str, timestamp: float | None = None) -> None:
+        classroom = self.get_class(class_id)
         when = timestamp or time.time()
         classroom.updated_at = when
         classroom.last_used_at = when
@@ -216,7 +328,7 @@ class ClassroomsState:
         }
         return json.dumps(payload, ensure_ascii=False, indent=2)
 
-    def to_unified_payload(self) -> dict[str, Any]:
+    def to_unified_payload(self, compact: bool = False) -> dict[str, Any]:
         classes_payload: dict[str, Any] = {}
         for classroom in self.iter_classes():
             cms = classroom.cms
@@ -226,7 +338,9 @@ class ClassroomsState:
             }
             algorithm_data = dict(classroom.algorithm_data)
             algorithm_data["cooldown_days"] = cms.pick_cooldown
-            algorithm_data["history"] = cms.export_history()
+            algorithm_data["history"] = cms.export_history(compact=compact)
+            algorithm_data.update(cms.export_id_state())
+            algorithm_data.update(cms.export_pick_stats())
             classes_payload[classroom.class_id] = {
                 "meta": {
                     "name": classroom.name,
@@ -238,8 +352,29 @@ class ClassroomsState:
                 "algorithm_data": algorithm_data,
                 "students": students_map,
             }
+            if not compact:
+                classes_payload[classroom.class_id]["stats"] = cms.roster_stats(
+                    time.time()
+                )
+                classes_payload[classroom.class_id]["revision"] = cms.revision_tag
         return classes_payload
 
+    def encode_unified(
+        self, compact: bool = False, indent: int | None = None, depth: int = 0
+    ) -> str:
+        """``to_unified_payload`` as JSON text, reusing clean class fragments."""
+        return encode_object(
+            [
+                (
+                    classroom.class_id,
+                    classroom.encode_unified(compact, indent, depth + 1),
+                )
+                for classroom in self.iter_classes()
+            ],
+            indent,
+            depth,
+        )
+
     def _next_order_index(self) -> int:
         return (
             max(
@@ -278,6 +413,60 @@ class ClassroomsState:
             return cls._default_state()
         raise ValueError("invalid_classrooms_payload")
 
+    @classmethod
+    def from_stored(cls, raw: dict[str, Any]) -> "ClassroomsState":
+        """Load the ``classes`` of a file this version wrote, without coercion.
+
+        Raises ValueError when anything differs from what
+        ``encode_unified`` writes; ``from_payload`` handles everything else.
+        """
+        classes_payload = raw.get("classes")
+        version = raw.get("version")
+        if not isinstance(classes_payload, dict) or not classes_payload:
+            raise ValueError("classes_invalid")
+        if type(version) is not int:
+            raise ValueError("classes_invalid")
+        classes: dict[str, Classroom] = {}
+        for class_id, class_payload in classes_payload.items():
+            try:
+                meta = class_payload["meta"]
+                algorithm = class_payload["algorithm_data"]
+                name = meta["name"]
+                created_at = meta["created_at"]
+                updated_at = meta["updated_at"]
+                last_used_at = meta["last_used_at"]
+                order_index = meta["order"]
+                students = class_payload["students"]
+            except (KeyError, TypeError) as error:
+                raise ValueError("classes_invalid") from error
+            if (
+                not isinstance(algorithm, dict)
+                or type(name) is not str
+                or type(created_at) is not float
+                or type(updated_at) is not float
+                or type(last_used_at) is not float
+                or type(order_index) is not int
+            ):
+                raise ValueError("classes_invalid")
+            classes[class_id] = Classroom(
+                class_id=class_id,
+                name=name,
+                cms=StudentsCms.from_stored(algorithm, students),
+                created_at=created_at,
+                updated_at=updated_at,
+                last_used_at=last_used_at,
+                order_index=order_index,
+                algorithm_data={
+                    key: value
+                    for key, value in algorithm.items()
+                    if key not in CMS_ALGORITHM_KEYS
+                },
+            )
+        current_class_id = raw.get("current_class_id")
+        if current_class_id not in classes:
+            raise ValueError("classes_invalid")
+        return cls(classes, current_class_id, version)
+
     @classmethod
     def _build_from_payload(
         cls,
@@ -393,7 +582,11 @@ class ClassroomsState:
             algorithm = class_payload.get("algorithm_data")
             if not isinstance(algorithm, dict):
                 algorithm = {}
-            algorithm_data = dict(algorithm)
+            algorithm_data = {
+                key: value
+                for key, value in algorithm.items()
+                if key not in CMS_ALGORITHM_KEYS
+            }
             students_blob = class_payload.get("students")
             students_payload: list[dict[str, Any]] = []
             if isinstance(students_blob, dict):
@@ -424,6 +617,11 @@ class ClassroomsState:
                 ),
                 "students": students_payload,
                 "history": algorithm.get("history"),
+                "next_student_id": algorithm.get("next_student_id"),
+                "reuse_student_ids": algorithm.get("reuse_student_ids", False),
+                "free_student_ids": algorithm.get("free_student_ids"),
+                "pick_stats": algorithm.get("pick_stats"),
+                "history_archived_before": algorithm.get("history_archived_before"),
             }
             cms = StudentsCms.deserialize(cms_payload)
             classroom = Classroom(
@@ -1,18 +1,23 @@
 from __future__ import annotations
 
-import secrets
 import time
+from bisect import bisect_right
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, Iterable
+from itertools import accumulate
+from typing import Any, Generic, Sequence, TypeVar
 
-from .classrooms import ClassroomsState
-from .random_provider import get_today_random
+from .classrooms import Classroom, ClassroomsState
+from .random_provider import get_today_offsets, get_today_random
 from .student import Student
 from .students_cms import DrawHistoryEntry, StudentsCms
 
 ALGORITHM_LAST_NUM_KEY = "algorithm_last_num"
 ALGORITHM_LAST_TIME_KEY = "algorithm_last_time"
+MAX_ROUNDS = 50
+# Rounds of one request are spaced apart so their history entries keep a
+# stable order.
+ROUND_SPACING_SECONDS = 0.001
 
 
 class DrawError(Exception):
@@ -61,11 +66,39 @@ class DrawMode(str, Enum):
             raise DrawError("unsupported_random_mode") from exc
 
 
+def _normalize_class_ids(value: Any) -> tuple[str, ...]:
+    if value is None:
+        return ()
+    if not isinstance(value, (list, tuple)):
+        raise KeyError("class_missing")
+    class_ids: dict[str, None] = {}
+    for item in value:
+        class_id = str(item or "").strip()
+        if not class_id:
+            raise KeyError("class_missing")
+        class_ids[class_id] = None
+    return tuple(class_ids)
+
+
+def _normalize_rounds(value: Any) -> int:
+    if value is None:
+        return 1
+    try:
+        rounds = int(float(value))
+    except (TypeError, ValueError):
+        raise DrawError("rounds_invalid")
+    if rounds < 1 or rounds > MAX_ROUNDS:
+        raise DrawError("rounds_invalid")
+    return rounds
+
+
 @dataclass(frozen=True)
 class DrawRequest:
     mode: DrawMode
     ignore_cooldown: bool = False
     requested_count: Any | None = None
+    rounds: int = 1
+    class_ids: tuple[str, ...] = ()
 
     @classmethod
     def from_payload(cls, payload: Any) -> "DrawRequest":
@@ -75,7 +108,15 @@ class DrawRequest:
         count = data.get("count")
         if count is None:
             count = data.get("requested_count")
-        return cls(mode=mode, ignore_cooldown=ignore, requested_count=count)
+        rounds = _normalize_rounds(data.get("rounds"))
+        class_ids = _normalize_class_ids(data.get("class_ids"))
+        return cls(
+            mode=mode,
+            ignore_cooldown=ignore,
+            requested_count=count,
+            rounds=rounds,
+            class_ids=class_ids,
+        )
 
 
 @dataclass
@@ -114,6 +155,122 @@ class DrawResult:
             payload["group"] = self.group_value
         return payload
 
+    def affected_class_ids(self) -> list[str]:
+        return [self.class_id]
+
+
+@dataclass
+class CrossClassDrawResult:
+    """Outcome of a draw over the union of several classes."""
+
+    mode: DrawMode
+    class_ids: list[str]
+    picks: list[tuple[str, Student]]
+    ignore_cooldown: bool
+    requested_count: int
+    history_entries: dict[str, DrawHistoryEntry]
+    pool_size: int
+    pool_groups: list[tuple[str, int]]
+    group_value: int | None = None
+
+    def to_payload(self) -> dict[str, Any]:
+        students = []
+        for class_id, student in self.picks:
+            item = _serialize_student(student)
+            item["class_id"] = class_id
+            students.append(item)
+        payload: dict[str, Any] = {
+            "mode": self.mode.value,
+            "class_ids": list(self.class_ids),
+            "ignore_cooldown": self.ignore_cooldown,
+            "requested_count": self.requested_count,
+            "history_entry_ids": {
+                class_id: entry.entry_id
+                for class_id, entry in self.history_entries.items()
+            },
+            "students": students,
+            "pool": {
+                "size": self.pool_size,
+                "groups": [
+                    {"class_id": class_id, "group": group}
+                    for class_id, group in self.pool_groups
+                ],
+            },
+        }
+        if self.mode is DrawMode.SINGLE:
+            payload["type"] = "student"
+            payload["student_id"] = students[0]["id"] if students else ""
+            payload["class_id"] = students[0]["class_id"] if students else ""
+        else:
+            payload["type"] = self.mode.value
+            payload["student_ids"] = [item["id"] for item in students]
+        if self.group_value is not None:
+            payload["group"] = self.group_value
+            payload["class_id"] = self.picks[0][0] if self.picks else ""
+        return payload
+
+    def affected_class_ids(self) -> list[str]:
+        return list(self.history_entries)
+
+
+T = TypeVar("T")
+
+
+class _MergedPool(Generic[T]):
+    """Read-only concatenation of per-class candidate lists.
+
+    Items are located by offset, so the union is never materialised; draws
+    pick offsets through ``get_today_offsets``.
+    """
+
+    def __init__(self, parts: Sequence[tuple[str, Sequence[T]]]) -> None:
+        self._parts = [(key, items) for key, items in parts if items]
+        self._offsets = list(accumulate(len(items) for _, items in self._parts))
+
+    def __len__(self) -> int:
+        return self._offsets[-1] if self._offsets else 0
+
+    def __getitem__(self, index: int) -> tuple[str, T]:
+        slot = bisect_right(self._offsets, index)
+        start = self._offsets[slot - 1] if slot else 0
+        key, items = self._parts[slot]
+        return key, items[index - start]
+
+    def __iter__(self):
+        for key, items in self._parts:
+            for item in items:
+                yield key, item
+
+    def choice(self, user_id: str) -> tuple[str, T]:
+        return self.sample(1, user_id)[0]
+
+    def sample(self, count: int, user_id: str) -> list[tuple[str, T]]:
+        offsets = get_today_offsets(len(self), count, user_id)
+        if len(offsets) != count:
+            raise DrawError("no_students_available")
+        return [self[index] for index in offsets]
+
+
+@dataclass
+class DrawRounds:
+    """Results of a multi-round draw, in the order the rounds were drawn."""
+
+    results: list[DrawResult | CrossClassDrawResult]
+    requested_rounds: int
+
+    def to_payload(self) -> dict[str, Any]:
+        payload = self.results[-1].to_payload()
+        payload["rounds"] = [result.to_payload() for result in self.results]
+        payload["requested_rounds"] = self.requested_rounds
+        payload["completed_rounds"] = len(self.results)
+        return payload
+
+    def affected_class_ids(self) -> list[str]:
+        class_ids: dict[str, None] = {}
+        for result in self.results:
+            class_ids.update(dict.fromkeys(result.affected_class_ids()))
+        return list(class_ids)
+
 
 class DrawService:
     def execute(
@@ -123,9 +280,43 @@ class DrawService:
         request: DrawRequest,
         *,
         timestamp: float | None = None,
-    ) -> DrawResult:
-        cms = state.current_cms
+    ) -> DrawResult | CrossClassDrawResult | DrawRounds:
         moment = time.time() if timestamp is None else float(timestamp)
+        if request.rounds > 1:
+            return self._draw_rounds(user_id, state, request, moment)
+        return self._draw_once(user_id, state, request, moment)
+
+    def _draw_rounds(
+        self,
+        user_id: str,
+        state: ClassroomsState,
+        request: DrawRequest,
+        moment: float,
+    ) -> DrawRounds:
+        # Every round sees the cooldowns of the rounds before it. Once the
+        # pool runs dry the rounds drawn so far are returned; only a failing
+        # first round is an error.
+        results: list[DrawResult] = []
+        for index in range(request.rounds):
+            round_moment = moment + index * ROUND_SPACING_SECONDS
+            try:
+                results.append(self._draw_once(user_id, state, request, round_moment))
+            except DrawError:
+                if not results:
+                    raise
+                break
+        return DrawRounds(results=results, requested_rounds=request.rounds)
+
+    def _draw_once(
+        self,
+        user_id: str,
+        state: ClassroomsState,
+        request: DrawRequest,
+        moment: float,
+    ) -> DrawResult | CrossClassDrawResult:
+        if request.class_ids:
+            return self._draw_across(user_id, state, request, moment)
+        cms = state.current_cms
         if request.mode is DrawMode.GROUP:
             return self._draw_group(user_id, state, cms, request, moment)
         if request.mode is DrawMode.BATCH:
@@ -154,6 +345,7 @@ class DrawService:
         cms.register_random_pick([chosen], timestamp=moment)
         entry = cms.record_history_entry(
             DrawHistoryEntry(
+                timestamp=moment,
                 mode=DrawMode.SINGLE.value,
                 students=[_serialize_student(chosen)],
                 requested_count=1,
@@ -204,6 +396,7 @@ class DrawService:
         cms.register_random_pick(chosen, timestamp=moment)
         entry = cms.record_history_entry(
             DrawHistoryEntry(
+                timestamp=moment,
                 mode=DrawMode.BATCH.value,
                 students=[_serialize_student(student) for student in chosen],
                 requested_count=count,
@@ -229,26 +422,25 @@ class DrawService:
         request: DrawRequest,
         moment: float,
     ) -> DrawResult:
-        groups = cms.eligible_groups(ignore_cooldown=request.ignore_cooldown)
+        groups = cms.eligible_groups(
+            ignore_cooldown=request.ignore_cooldown, current_time=moment
+        )
         if not groups:
             raise DrawError("no_groups_available")
-        candidates = [int(value) for value in groups]
-        placeholder = secrets.choice(candidates)
-        group_value = get_today_random(candidates, [], placeholder, user_id)
+        group_value = get_today_random(groups, [], None, user_id)
         if group_value is None:
             raise DrawError("no_groups_available")
-        members = self._group_members(
-            cms.get_students(),
+        members = cms.group_members(
             group_value,
-            moment,
-            cms.pick_cooldown,
-            request.ignore_cooldown,
+            ignore_cooldown=request.ignore_cooldown,
+            current_time=moment,
         )
         if not members:
             raise DrawError("no_students_available")
         cms.register_random_pick(members, timestamp=moment)
         entry = cms.record_history_entry(
             DrawHistoryEntry(
+                timestamp=moment,
                 mode=DrawMode.GROUP.value,
                 students=[_serialize_student(student) for student in members],
                 group=group_value,
@@ -264,10 +456,135 @@ class DrawService:
             requested_count=len(members),
             history_entry=entry,
             pool_student_ids=[student.student_id for student in members],
-            pool_groups=[int(value) for value in groups],
+            pool_groups=list(groups),
+            group_value=group_value,
+        )
+
+    def _draw_across(
+        self,
+        user_id: str,
+        state: ClassroomsState,
+        request: DrawRequest,
+        moment: float,
+    ) -> CrossClassDrawResult:
+        classrooms = [state.get_class(class_id) for class_id in request.class_ids]
+        if request.mode is DrawMode.GROUP:
+            return self._draw_group_across(user_id, classrooms, request, moment)
+        pool = _MergedPool(
+            [
+                (
+                    classroom.class_id,
+                    self._class_candidates(classroom, moment, request.ignore_cooldown),
+                )
+                for classroom in classrooms
+            ]
+        )
+        if not len(pool):
+            raise DrawError("no_students_available")
+        if request.mode is DrawMode.BATCH:
+            count = self._normalize_batch_count(request.requested_count)
+            if count > len(pool):
+                raise DrawError("batch_count_exceeds_available")
+            picks = pool.sample(count, user_id)
+        else:
+            count = 1
+            picks = [pool.choice(user_id)]
+        by_class: dict[str, list[Student]] = {}
+        for class_id, student in picks:
+            by_class.setdefault(class_id, []).append(student)
+        entries: dict[str, DrawHistoryEntry] = {}
+        for classroom in classrooms:
+            chosen = by_class.get(classroom.class_id)
+            if not chosen:
+                continue
+            classroom.cms.register_random_pick(chosen, timestamp=moment)
+            entries[classroom.class_id] = classroom.cms.record_history_entry(
+                DrawHistoryEntry(
+                    timestamp=moment,
+                    mode=request.mode.value,
+                    students=[_serialize_student(student) for student in chosen],
+                    requested_count=len(chosen),
+                    ignore_cooldown=request.ignore_cooldown,
+                )
+            )
+            self._update_last_pick(classroom, chosen[-1].student_id, moment)
+        return CrossClassDrawResult(
+            mode=request.mode,
+            class_ids=[classroom.class_id for classroom in classrooms],
+            picks=picks,
+            ignore_cooldown=request.ignore_cooldown,
+            requested_count=count,
+            history_entries=entries,
+            pool_size=len(pool),
+            pool_groups=[],
+            group_value=picks[0][1].group if request.mode is DrawMode.SINGLE else None,
+        )
+
+    def _draw_group_across(
+        self,
+        user_id: str,
+        classrooms: list[Classroom],
+        request: DrawRequest,
+        moment: float,
+    ) -> CrossClassDrawResult:
+        pool = _MergedPool(
+            [
+                (
+                    classroom.class_id,
+                    classroom.cms.eligible_groups(
+                        ignore_cooldown=request.ignore_cooldown, current_time=moment
+                    ),
+                )
+                for classroom in classrooms
+            ]
+        )
+        if not len(pool):
+            raise DrawError("no_groups_available")
+        class_id, group_value = pool.choice(user_id)
+        classroom = next(item for item in classrooms if item.class_id == class_id)
+        members = classroom.cms.group_members(
+            group_value,
+            ignore_cooldown=request.ignore_cooldown,
+            current_time=moment,
+        )
+        if not members:
+            raise DrawError("no_students_available")
+        classroom.cms.register_random_pick(members, timestamp=moment)
+        entry = classroom.cms.record_history_entry(
+            DrawHistoryEntry(
+                timestamp=moment,
+                mode=DrawMode.GROUP.value,
+                students=[_serialize_student(student) for student in members],
+                group=group_value,
+                requested_count=len(members),
+                ignore_cooldown=request.ignore_cooldown,
+            )
+        )
+        return CrossClassDrawResult(
+            mode=DrawMode.GROUP,
+            class_ids=[item.class_id for item in classrooms],
+            picks=[(class_id, student) for student in members],
+            ignore_cooldown=request.ignore_cooldown,
+            requested_count=len(members),
+            history_entries={class_id: entry},
+            pool_size=len(pool),
+            pool_groups=list(pool),
             group_value=group_value,
         )
 
+    def _class_candidates(
+        self, classroom: Classroom, moment: float, ignore_cooldown: bool
+    ) -> list[Student]:
+        # Mirrors _pick_student: the student drawn last in a class today sits
+        # out the next draw of that class.
+        pool = classroom.cms.eligible_students(
+            ignore_cooldown=ignore_cooldown, current_time=moment
+        )
+        last_picked = self._resolve_last_pick(classroom, moment)
+        if last_picked is None:
+            return pool
+        return [student for student in pool if student.student_id != last_picked]
+
     @staticmethod
     def _normalize_batch_count(value: Any) -> int:
         try:
@@ -278,22 +595,6 @@ class DrawService:
             raise DrawError("batch_count_invalid")
         return count
 
-    @staticmethod
-    def _group_members(
-        students: Iterable[Student],
-        group_value: int,
-        moment: float,
-        cooldown_days: int,
-        ignore_cooldown: bool,
-    ) -> list[Student]:
-        members: list[Student] = []
-        for student in students:
-            if student.group != group_value:
-                continue
-            if student.pickable(moment, cooldown_days, ignore_cooldown):
-                members.append(student)
-        return members
-
     @staticmethod
     def _same_day(first: float, second: float) -> bool:
         if first <= 0 or second <= 0:
@@ -335,17 +636,12 @@ class DrawService:
         ignore_cooldown: bool,
         extra_disabled: set[int] | None = None,
     ) -> Student:
-        students = cms.get_students()
-        if not students:
+        pool = cms.eligible_students(ignore_cooldown, current_time=moment)
+        if not pool:
             raise DrawError("no_students_available")
-        lookup = {student.student_id: student for student in students}
-        items = list(lookup.keys())
-        disabled_set: set[int] = set(extra_disabled or ())
-        if not ignore_cooldown:
-            for student in students:
-                if not student.pickable(moment, cms.pick_cooldown, False):
-                    disabled_set.add(student.student_id)
-        disabled = list(disabled_set)
+        lookup = {student.student_id: student for student in pool}
+        items = list(lookup)
+        disabled = list(extra_disabled or ())
         last_picked = self._resolve_last_pick(classroom, moment)
         if last_picked is not None and last_picked not in lookup:
             last_picked = None
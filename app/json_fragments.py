@@ -0,0 +1,47 @@
+"""Assemble JSON documents from separately encoded fragments.
+
+Fragments are encoded the way ``json.dumps`` lays out a nested value, so a
+document spliced together from cached fragments is byte-for-byte what
+encoding the whole payload at once would produce. ``indent=None`` gives the
+compact separators used for HTTP responses.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Iterable
+
+
+def encode(value: Any, indent: int | None = None, depth: int = 0) -> str:
+    """Encode ``value`` as it appears ``depth`` levels into a document."""
+    if indent is None:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    text = json.dumps(value, ensure_ascii=False, indent=indent)
+    if depth:
+        # Strings are escaped, so every raw newline is layout.
+        text = text.replace("\n", "\n" + " " * (indent * depth))
+    return text
+
+
+def encode_object(
+    members: Iterable[tuple[str, str]], indent: int | None = None, depth: int = 0
+) -> str:
+    """Join encoded member values into an object at ``depth``.
+
+    Each value must have been encoded for ``depth + 1``.
+    """
+    if indent is None:
+        separator, colon, inner, outer = ",", ":", "", ""
+    else:
+        separator, colon = ",", ": "
+        inner = "\n" + " " * (indent * (depth + 1))
+        outer = "\n" + " " * (indent * depth)
+    # One join per object: values can be large, so avoid copying them twice.
+    parts = ["{"]
+    for key, value in members:
+        parts.extend((inner, encode(key), colon, value, separator))
+    if len(parts) == 1:
+        return "{}"
+    parts[-1] = outer
+    parts.append("}")
+    return "".join(parts)
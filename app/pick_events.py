@@ -0,0 +1,337 @@
+"""Columnar log of individual picks for history analytics.
+
+Every student of every draw is one row of packed columns, so reports over
+a whole term are a few vectorised passes over flat arrays instead of a walk
+over ``DrawHistoryEntry`` objects. NumPy is used when it is installed;
+without it the same reports are counted in plain Python.
+"""
+
+from __future__ import annotations
+
+import time
+from array import array
+from collections import Counter
+from typing import Any, Iterable
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is an optional extra
+    np = None
+
+PICK_MODES = ("single", "group", "batch")
+
+# Periods of the day as shown in the history panel, by starting hour.
+DAY_PERIODS = (("dawn", 0), ("morning", 6), ("afternoon", 12), ("evening", 18))
+_PERIOD_OF_HOUR = bytes(
+    max(index for index, (_, start) in enumerate(DAY_PERIODS) if hour >= start)
+    for hour in range(24)
+)
+
+_DAY = 86400
+# 1970-01-01 was a Thursday; shifting by three days starts weeks on Monday.
+_WEEK_SHIFT = 3
+
+
+class PickEventLog:
+    """Append-only pick events: timestamp, student id, mode, draw group and
+    the draw entry, one row per student picked.
+
+    Rows of removed draws are flagged dead in ``_live`` and dropped once they
+    make up half of the log. ``group`` is the drawn group for group draws
+    and -1 otherwise.
+    """
+
+    def __init__(self) -> None:
+        self._timestamps = array("d")
+        self._students = array("q")
+        self._modes = array("b")
+        self._groups = array("q")
+        self._entries = array("q")
+        self._live = bytearray()
+        # Entry ordinals in the entries column, and the rows of each entry.
+        self._entry_ids: list[str | None] = []
+        self._ordinal_of: dict[str, int] = {}
+        self._rows: dict[str, list[int]] = {}
+        self._dead = 0
+
+    def __len__(self) -> int:
+        return len(self._live) - self._dead
+
+    def add(
+        self,
+        entry_id: str,
+        timestamp: float,
+        mode: str,
+        group: int | None,
+        student_ids: Iterable[int],
+    ) -> None:
+        if entry_id in self._ordinal_of:
+            self.remove(entry_id)
+        ordinal = len(self._entry_ids)
+        self._entry_ids.append(entry_id)
+        self._ordinal_of[entry_id] = ordinal
+        mode_code = PICK_MODES.index(mode) if mode in PICK_MODES else 0
+        group_value = -1 if group is None else group
+        rows = self._rows[entry_id] = []
+        for student_id in student_ids:
+            rows.append(len(self._live))
+            self._timestamps.append(timestamp)
+            self._students.append(student_id)
+            self._modes.append(mode_code)
+            self._groups.append(group_value)
+            self._entries.append(ordinal)
+            self._live.append(1)
+
+    def remove(self, entry_id: str) -> bool:
+        rows = self._rows.pop(entry_id, None)
+        if rows is None:
+            return False
+        self._entry_ids[self._ordinal_of.pop(entry_id)] = None
+        for row in rows:
+            self._kill(row)
+        self._maybe_compact()
+        return True
+
+    def detach_student(self, entry_id: str, student_id: int) -> None:
+        rows = self._rows.get(entry_id)
+        if not rows:
+            return
+        for row in [row for row in rows if self._students[row] == student_id]:
+            rows.remove(row)
+            self._kill(row)
+        if not rows:
+            self.remove(entry_id)
+        else:
+            self._maybe_compact()
+
+    def rekey_student(
+        self, entry_ids: Iterable[str], old_id: int, new_id: int
+    ) -> None:
+        students = self._students
+        for entry_id in entry_ids:
+            for row in self._rows.get(entry_id, ()):
+                if students[row] == old_id:
+                    students[row] = new_id
+
+    def report(
+        self,
+        since: float | None = None,
+        until: float | None = None,
+        student_id: int | None = None,
+        utc_offset: int | None = None,
+    ) -> dict[str, Any]:
+        """Pick counts in ``[since, until)``, rolled up several ways.
+
+        Days, weeks (starting Monday) and periods of the day are taken in
+        local time, ``utc_offset`` seconds east of UTC; the server's own
+        offset is used when it is not given. Days and weeks are keyed by
+        the timestamp of their local midnight.
+        """
+        if utc_offset is None:
+            utc_offset = time.localtime().tm_gmtoff
+        if np is not None and self._live:
+            counted = self._report_numpy(since, until, student_id, utc_offset)
+        else:
+            counted = self._report_python(since, until, student_id, utc_offset)
+        picks, draws, days, weeks, periods, students, modes, groups = counted
+        return {
+            "picks": picks,
+            "draws": draws,
+            "per_day": {
+                str(day * _DAY - utc_offset): count for day, count in days
+            },
+            "per_week": {
+                str((week * 7 - _WEEK_SHIFT) * _DAY - utc_offset): count
+                for week, count in weeks
+            },
+            "per_period": {
+                name: periods.get(index, 0)
+                for index, (name, _) in enumerate(DAY_PERIODS)
+            },
+            "per_student": {str(key): count for key, count in students},
+            "per_mode": {PICK_MODES[key]: count for key, count in modes},
+            "per_group": {str(key): count for key, count in groups if key >= 0},
+        }
+
+    def student_counts(
+        self, since: float | None = None, until: float | None = None
+    ) -> dict[int, int]:
+        """Picks per student id with a timestamp in ``[since, until)``."""
+        if np is None or not self._live:
+            return dict(
+                Counter(
+                    student
+                    for alive, timestamp, student in zip(
+                        self._live, self._timestamps, self._students
+                    )
+                    if alive
+                    and (since is None or timestamp >= since)
+                    and (until is None or timestamp < until)
+                )
+            )
+        timestamps = np.frombuffer(self._timestamps, dtype=np.float64)
+        mask = np.frombuffer(self._live, dtype=np.uint8) != 0
+        if since is not None:
+            mask &= timestamps >= since
+        if until is not None:
+            mask &= timestamps < until
+        students = np.frombuffer(self._students, dtype=np.int64)
+        return dict(_binned(students[mask]))
+
+    def _report_numpy(
+        self,
+        since: float | None,
+        until: float | None,
+        student_id: int | None,
+        utc_offset: int,
+    ) -> tuple:
+        timestamps = np.frombuffer(self._timestamps, dtype=np.float64)
+        mask = np.frombuffer(self._live, dtype=np.uint8) != 0
+        if since is not None:
+            mask &= timestamps >= since
+        if until is not None:
+            mask &= timestamps < until
+        students = np.frombuffer(self._students, dtype=np.int64)
+        if student_id is not None:
+            mask &= students == student_id
+        rows = np.flatnonzero(mask)
+        local = timestamps[rows].astype(np.int64) + utc_offset
+        days = local // _DAY
+        hours = local % _DAY // 3600
+        periods = np.frombuffer(_PERIOD_OF_HOUR, dtype=np.uint8)[hours]
+        return (
+            int(rows.size),
+            int(np.unique(np.frombuffer(self._entries, dtype=np.int64)[rows]).size),
+            _binned(days),
+            _binned((days + _WEEK_SHIFT) // 7),
+            dict(_binned(periods)),
+            _binned(students[rows]),
+            _binned(np.frombuffer(self._modes, dtype=np.int8)[rows]),
+            _binned(np.frombuffer(self._groups, dtype=np.int64)[rows]),
+        )
+
+    def _report_python(
+        self,
+        since: float | None,
+        until: float | None,
+        student_id: int | None,
+        utc_offset: int,
+    ) -> tuple:
+        rows = [
+            row
+            for row, (alive, timestamp, student) in enumerate(
+                zip(self._live, self._timestamps, self._students)
+            )
+            if alive
+            and (since is None or timestamp >= since)
+            and (until is None or timestamp < until)
+            and (student_id is None or student == student_id)
+        ]
+        local = [int(self._timestamps[row]) + utc_offset for row in rows]
+        days = Counter(moment // _DAY for moment in local)
+        weeks: Counter[int] = Counter()
+        for day, count in days.items():
+            weeks[(day + _WEEK_SHIFT) // 7] += count
+        return (
+            len(rows),
+            len({self._entries[row] for row in rows}),
+            sorted(days.items()),
+            sorted(weeks.items()),
+            dict(Counter(_PERIOD_OF_HOUR[moment % _DAY // 3600] for moment in local)),
+            sorted(Counter(self._students[row] for row in rows).items()),
+            sorted(Counter(self._modes[row] for row in rows).items()),
+            sorted(Counter(self._groups[row] for row in rows).items()),
+        )
+
+    def _kill(self, row: int) -> None:
+        if self._live[row]:
+            self._live[row] = 0
+            self._dead += 1
+
+    def _maybe_compact(self) -> None:
+        if self._dead * 2 < len(self._live) or not self._dead:
+            return
+        keep = [row for row, alive in enumerate(self._live) if alive]
+        entry_ids = [self._entry_ids[self._entries[row]] for row in keep]
+        for column in (self._timestamps, self._students, self._modes, self._groups):
+            column[:] = array(column.typecode, [column[row] for row in keep])
+        self._entry_ids = []
+        self._ordinal_of = {}
+        self._rows = {}
+        self._entries = array("q")
+        for row, entry_id in enumerate(entry_ids):
+            ordinal = self._ordinal_of.get(entry_id)
+            if ordinal is None:
+                ordinal = self._ordinal_of[entry_id] = len(self._entry_ids)
+                self._entry_ids.append(entry_id)
+                self._rows[entry_id] = []
+            self._entries.append(ordinal)
+            self._rows[entry_id].append(row)
+        self._live = bytearray(b"\x01" * len(keep))
+        self._dead = 0
+
+
+def count_metrics(counts: list[int]) -> dict[str, Any]:
+    """Spread of per-student pick counts.
+
+    ``gini`` is 0 when every student was picked equally often and tends to
+    1 as the picks concentrate on one student.
+    """
+    size = len(counts)
+    if not size:
+        return {
+            "students": 0,
+            "picks": 0,
+            "mean": 0.0,
+            "variance": 0.0,
+            "stddev": 0.0,
+            "gini": 0.0,
+            "min": 0,
+            "max": 0,
+            "never_picked": 0,
+        }
+    if np is not None:
+        values = np.sort(np.asarray(counts, dtype=np.float64))
+        total = float(values.sum())
+        mean = total / size
+        variance = float(values.var())
+        weighted = float(np.arange(1, size + 1) @ values)
+        never = int(np.count_nonzero(values == 0))
+    else:
+        values = sorted(counts)
+        total = float(sum(values))
+        mean = total / size
+        variance = sum((value - mean) ** 2 for value in values) / size
+        weighted = float(sum(rank * value for rank, value in enumerate(values, 1)))
+        never = values.count(0)
+    gini = 2.0 * weighted / (size * total) - (size + 1) / size if total else 0.0
+    return {
+        "students": size,
+        "picks": int(total),
+        "mean": mean,
+        "variance": variance,
+        "stddev": variance**0.5,
+        "gini": max(0.0, gini),
+        "min": int(values[0]),
+        "max": int(values[-1]),
+        "never_picked": never,
+    }
+
+
+def _binned(values) -> list[tuple[int, int]]:
+    """Sorted ``(value, count)`` pairs of an integer NumPy array.
+
+    Dense ranges such as days, hours or groups are counted with
+    ``bincount``; sparse ones, like hand-numbered student ids, fall back to
+    sorting.
+    """
+    if not values.size:
+        return []
+    offset = int(values.min())
+    span = int(values.max()) - offset + 1
+    if span > 4 * values.size + 1024:
+        present, counts = np.unique(values, return_counts=True)
+        return list(zip(present.tolist(), counts.tolist()))
+    counts = np.bincount(values.astype(np.int64) - offset)
+    present = np.flatnonzero(counts)
+    return list(zip((present + offset).tolist(), counts[present].tolist()))
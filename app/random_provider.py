@@ -1,19 +1,121 @@
+import os
 import secrets
-from typing import List, Optional
+import threading
+import weakref
+from array import array
+from typing import List, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_BUFFER_SIZE = 4096
+_WORD_BITS = array("I").itemsize * 8
+
+
+class EntropyBuffer:
+    """Cryptographically secure random source that reads OS entropy in bulk.
+
+    Bytes come from ``secrets.token_bytes`` in blocks of ``buffer_size`` and
+    are kept as machine words that are handed out under a lock. Bounded
+    integers use rejection sampling on the smallest covering bit width, so
+    results are exactly uniform. The buffer is discarded in a forked child
+    so workers never share bytes with their parent.
+    """
+
+    def __init__(self, buffer_size: int = DEFAULT_BUFFER_SIZE) -> None:
+        self._word_count = max(16, int(buffer_size) // 4)
+        self._lock = threading.Lock()
+        self._words = array("I")
+        self._position = 0
+        if hasattr(os, "register_at_fork"):
+            reference = weakref.ref(self)
+
+            def reset_in_child() -> None:
+                source = reference()
+                if source is not None:
+                    source.reset()
+
+            os.register_at_fork(after_in_child=reset_in_child)
+
+    def reset(self) -> None:
+        # Runs in a freshly forked child where no other thread holds the
+        # lock, but the lock itself may have been copied in a held state.
+        self._lock = threading.Lock()
+        self._words = array("I")
+        self._position = 0
+
+    def randbelow(self, upper: int) -> int:
+        """Return a uniform integer in ``[0, upper)``."""
+        if upper <= 0:
+            raise ValueError("upper bound must be positive")
+        if upper == 1:
+            return 0
+        bits = (upper - 1).bit_length()
+        if bits > _WORD_BITS:
+            return secrets.randbelow(upper)
+        shift = _WORD_BITS - bits
+        with self._lock:
+            while True:
+                if self._position >= len(self._words):
+                    self._refill()
+                value = self._words[self._position] >> shift
+                self._position += 1
+                if value < upper:
+                    return value
+
+    def choice(self, items: Sequence[T]) -> T:
+        if not items:
+            raise IndexError("cannot choose from an empty sequence")
+        return items[self.randbelow(len(items))]
+
+    def sample(self, population: Sequence[T], count: int) -> List[T]:
+        """Pick ``count`` distinct items with a sparse Fisher-Yates shuffle."""
+        size = len(population)
+        if count < 0 or count > size:
+            raise ValueError("sample larger than population")
+        swapped: dict[int, int] = {}
+        picked: List[T] = []
+        for index in range(count):
+            target = index + self.randbelow(size - index)
+            chosen = swapped.get(target, target)
+            swapped[target] = swapped.get(index, index)
+            picked.append(population[chosen])
+        return picked
+
+    def _refill(self) -> None:
+        words = array("I")
+        words.frombytes(secrets.token_bytes(self._word_count * words.itemsize))
+        self._words = words
+        self._position = 0
+
+
+secure_random = EntropyBuffer()
 
 
 def get_today_random(
     items: List[int], disabled: List[int], last_picked: Optional[int], user_id: str
 ) -> Optional[int]:
-    available = [x for x in items if x not in disabled]
+    disabled_set = set(disabled)
+    available = [x for x in items if x not in disabled_set]
     if last_picked is not None:
         available = [x for x in available if x != last_picked]
     if available:
-        return secrets.choice(available)
+        return secure_random.choice(available)
     if (
         last_picked is not None
-        and last_picked not in disabled
+        and last_picked not in disabled_set
         and last_picked not in items
     ):
         return last_picked
     return None
+
+
+def get_today_offsets(size: int, count: int, user_id: str) -> List[int]:
+    """Pick ``count`` distinct offsets of a pool of ``size`` candidates.
+
+    The counterpart of ``get_today_random`` for pools addressed by position:
+    offsets are drawn from ``range(size)`` directly, so nothing of pool size
+    is built. Returns an empty list when the pool is too small.
+    """
+    if count < 0 or count > size:
+        return []
+    return secure_random.sample(range(size), count)
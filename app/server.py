@@ -6,13 +6,21 @@ from pathlib import Path
 from typing import Any, Callable
 
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, JSONResponse, Response
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    Response,
+    StreamingResponse,
+)
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
 from .classrooms import ClassroomsState
 from .draw_service import DrawError, DrawRequest, DrawService
+from .json_fragments import encode, encode_object
 from .metadata import load_app_metadata
+from .student_index import RANGE_OPERATORS
+from .students_cms import QUERY_FIELDS, StudentsCms
 from .storage import UnifiedStorage
 from .user_data import DEFAULT_UUID, UserData
 
@@ -21,6 +29,7 @@ ERROR_TEXT = {
     "name_exists": "姓名已存在",
     "id_exists": "学号已存在",
     "id_required": "学号不能为空",
+    "students_invalid": "学生列表格式无效",
     "student_missing": "未找到指定学生",
     "history_missing": "未找到对应记录",
     "history_invalid": "无效的历史记录",
@@ -30,8 +39,14 @@ ERROR_TEXT = {
     "unsupported_random_mode": "不支持的抽取模式",
     "batch_count_invalid": "抽取人数至少需要 1 人",
     "batch_count_exceeds_available": "可抽取人数不足",
+    "rounds_invalid": "抽取轮数需在 1 到 50 之间",
     "history_note_too_long": "备注太长",
     "cooldown_invalid": "冷却时间必须至少为 1 天",
+    "retention_invalid": "历史保留设置必须为正整数或留空",
+    "id_reuse_invalid": "学号复用设置必须为开启或关闭",
+    "page_invalid": "分页参数无效",
+    "query_invalid": "查询条件无效",
+    "report_invalid": "统计范围参数无效",
     "action_missing": "缺少操作指令",
     "class_missing": "未找到指定班级",
     "class_last": "至少需要保留一个班级",
@@ -43,9 +58,31 @@ ERROR_TEXT = {
     "migrate_invalid_uuid": "无效的 UID 格式",
 }
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_QUERY_SIZE = 10_000
+# Students per chunk of a streamed query response, sent as rows of these
+# columns.
+QUERY_CHUNK_SIZE = 256
+QUERY_COLUMNS = (
+    "id",
+    "name",
+    "group",
+    "pick_count",
+    "last_pick",
+    "cooldown_expires_at",
+)
+
 ActionHandler = Callable[[UserData, ClassroomsState, dict[str, Any]], JSONResponse]
 
 
+class EncodedJSONResponse(JSONResponse):
+    """JSON response whose body was already encoded to text."""
+
+    def render(self, content: Any) -> bytes:
+        return content.encode("utf-8")
+
+
 def create_app(
     app_data_dir: Path,
     app_run_mode: str,
@@ -111,13 +148,13 @@ def create_app(
         user_data.runtime["active_class_id"] = state.current_class_id
         if persist:
             storage.save_user(user_data)
-        payload = user_data.to_dict()
-        runtime_payload = payload.setdefault("runtime", {})
-        runtime_payload["last_synced_at"] = now
-        body: dict[str, Any] = {"uuid": user_data.user_id, "data": payload}
+        members = [
+            ("uuid", encode(user_data.user_id)),
+            ("data", user_data.to_json(runtime_extra={"last_synced_at": now})),
+        ]
         if result is not None:
-            body["result"] = result
-        return JSONResponse(status_code=status, content=body)
+            members.append(("result", encode(result)))
+        return EncodedJSONResponse(status_code=status, content=encode_object(members))
 
     def error_response(message: str, status: int = 400) -> JSONResponse:
         return JSONResponse(status_code=status, content={"message": message})
@@ -132,6 +169,73 @@ def create_app(
         except (TypeError, ValueError):
             raise ValueError("student_missing")
 
+    def parse_page(
+        data: dict[str, Any], max_limit: int = MAX_PAGE_SIZE
+    ) -> tuple[int, int]:
+        """Parse offset and limit query parameters for paged results."""
+        try:
+            offset = int(data.get("offset") or 0)
+            limit = int(data.get("limit") or DEFAULT_PAGE_SIZE)
+        except (TypeError, ValueError):
+            raise ValueError("page_invalid")
+        if offset < 0 or not 1 <= limit <= max_limit:
+            raise ValueError("page_invalid")
+        return offset, limit
+
+    def parse_report_window(
+        data: dict[str, Any],
+    ) -> tuple[float | None, float | None, int | None]:
+        """Parse ``since``, ``until`` and ``utc_offset`` (seconds east of UTC)."""
+        try:
+            since = None if data.get("since") in (None, "") else float(data["since"])
+            until = None if data.get("until") in (None, "") else float(data["until"])
+            raw_offset = data.get("utc_offset")
+            utc_offset = None if raw_offset in (None, "") else int(raw_offset)
+        except (TypeError, ValueError):
+            raise ValueError("report_invalid")
+        if utc_offset is not None and abs(utc_offset) > 86400:
+            raise ValueError("report_invalid")
+        return since, until, utc_offset
+
+    def parse_student_filters(
+        data: dict[str, Any], cms: StudentsCms, now: float
+    ) -> dict[str, dict[str, float]]:
+        """Range filters from ``<field>_<min|max|gt|lt>`` query parameters.
+
+        ``group``, ``cooling`` and ``not_picked_days`` are shorthands, and
+        ``pick_count`` bounds accept ``median``.
+        """
+        filters: dict[str, dict[str, float]] = {}
+        try:
+            for field in QUERY_FIELDS:
+                for operator in RANGE_OPERATORS:
+                    raw = data.get(f"{field}_{operator}")
+                    if raw is None or raw == "":
+                        continue
+                    if field == "pick_count" and raw == "median":
+                        value = cms.median_pick_count()
+                        if value is None:
+                            continue
+                    else:
+                        value = float(raw)
+                    filters.setdefault(field, {})[operator] = value
+            if data.get("group") not in (None, ""):
+                group = int(data["group"])
+                filters.setdefault("group", {}).update(min=group, max=group)
+            if data.get("not_picked_days") not in (None, ""):
+                cutoff = now - float(data["not_picked_days"]) * 86400.0
+                filters.setdefault("last_pick", {})["lt"] = cutoff
+        except (TypeError, ValueError):
+            raise ValueError("query_invalid")
+        cooling = str(data.get("cooling") or "").lower()
+        if cooling in ("1", "true"):
+            filters.setdefault("cooldown_expires_at", {})["gt"] = now
+        elif cooling in ("0", "false"):
+            filters.setdefault("cooldown_expires_at", {})["max"] = now
+        elif cooling:
+            raise ValueError("query_invalid")
+        return filters
+
     def handle_set_cooldown(
         user_data: UserData, state: ClassroomsState, data: dict[str, Any]
     ) -> JSONResponse:
@@ -150,6 +254,54 @@ def create_app(
             touch="modified",
         )
 
+    def handle_set_history_retention(
+        user_data: UserData, state: ClassroomsState, data: dict[str, Any]
+    ) -> JSONResponse:
+        limits: dict[str, int | None] = {}
+        for key in ("max_entries", "max_days"):
+            raw_value = data.get(key)
+            if raw_value is None:
+                limits[key] = None
+                continue
+            try:
+                value = int(raw_value)
+            except (TypeError, ValueError):
+                raise ValueError("retention_invalid")
+            if value < 1:
+                raise ValueError("retention_invalid")
+            limits[key] = value
+        classroom = state.current_class
+        classroom.set_history_retention(limits["max_entries"], limits["max_days"])
+        return build_response(
+            user_data,
+            result={
+                "type": "set_history_retention",
+                "class_id": classroom.class_id,
+                "history_retention": classroom.history_retention(),
+            },
+            persist=True,
+            touch="modified",
+        )
+
+    def handle_set_student_id_reuse(
+        user_data: UserData, state: ClassroomsState, data: dict[str, Any]
+    ) -> JSONResponse:
+        enabled = data.get("enabled")
+        if not isinstance(enabled, bool):
+            raise ValueError("id_reuse_invalid")
+        classroom = state.current_class
+        classroom.cms.set_reuse_ids(enabled)
+        return build_response(
+            user_data,
+            result={
+                "type": "set_student_id_reuse",
+                "class_id": classroom.class_id,
+                "enabled": classroom.cms.reuse_ids,
+            },
+            persist=True,
+            touch="modified",
+        )
+
     def handle_clear_cooldown(
         user_data: UserData, state: ClassroomsState, data: dict[str, Any]
     ) -> JSONResponse:
@@ -166,9 +318,10 @@ def create_app(
         user_data: UserData, state: ClassroomsState, data: dict[str, Any]
     ) -> JSONResponse:
         request = DrawRequest.from_payload(data)
-        outcome = draw_service.execute(
-            user_data.user_id, state, request, timestamp=current_timestamp()
-        )
+        now = current_timestamp()
+        outcome = draw_service.execute(user_data.user_id, state, request, timestamp=now)
+        for class_id in outcome.affected_class_ids():
+            state.mark_modified(class_id, now)
         return build_response(
             user_data,
             result=outcome.to_payload(),
@@ -201,6 +354,37 @@ def create_app(
             touch="modified",
         )
 
+    def handle_student_bulk_create(
+        user_data: UserData, state: ClassroomsState, data: dict[str, Any]
+    ) -> JSONResponse:
+        cms = state.current_cms
+        raw_students = data.get("students")
+        if not isinstance(raw_students, list) or not raw_students:
+            raise ValueError("students_invalid")
+        entries: list[tuple[Any, Any, int | None]] = []
+        for item in raw_students:
+            if not isinstance(item, dict):
+                raise ValueError("students_invalid")
+            student_id = None
+            raw_id = item.get("student_id")
+            if raw_id is not None:
+                try:
+                    student_id = int(raw_id)
+                except (TypeError, ValueError):
+                    raise ValueError("id_required")
+            entries.append((item.get("name"), item.get("group"), student_id))
+        students = cms.create_students(entries)
+        return build_response(
+            user_data,
+            result={
+                "type": "create_students",
+                "class_id": state.current_class_id,
+                "student_ids": [student.student_id for student in students],
+            },
+            persist=True,
+            touch="modified",
+        )
+
     def handle_student_delete(
         user_data: UserData, state: ClassroomsState, data: dict[str, Any]
     ) -> JSONResponse:
@@ -313,12 +497,16 @@ def create_app(
         student = cms.get_student_by_id(student_id)
         if not student:
             raise KeyError("student_missing")
-        timestamp = data.get("timestamp")
-        try:
-            timestamp_value = float(timestamp)
-        except (TypeError, ValueError):
-            raise ValueError("history_invalid")
-        if not cms.remove_student_history_entry(student, timestamp_value):
+        entry_id = str(data.get("entry_id") or "").strip() or None
+        timestamp_value = None
+        if entry_id is None:
+            try:
+                timestamp_value = float(data.get("timestamp"))
+            except (TypeError, ValueError):
+                raise ValueError("history_invalid")
+        if not cms.remove_student_history_entry(
+            student, timestamp_value, entry_id=entry_id
+        ):
             raise ValueError("history_missing")
         return build_response(
             user_data,
@@ -327,6 +515,7 @@ def create_app(
                 "class_id": state.current_class_id,
                 "student_id": student_id,
                 "timestamp": timestamp_value,
+                "entry_id": entry_id,
             },
             persist=True,
             touch="modified",
@@ -349,7 +538,7 @@ def create_app(
             result={
                 "type": "history_note",
                 "class_id": state.current_class_id,
-                "entry": entry.serialize(),
+                "entry": cms.serialize_history_entry(entry),
             },
             persist=True,
             touch="modified",
@@ -442,8 +631,11 @@ def create_app(
     ACTIONS: dict[str, ActionHandler] = {
         "set_cooldown": handle_set_cooldown,
         "clear_cooldown": handle_clear_cooldown,
+        "history_retention": handle_set_history_retention,
+        "student_id_reuse": handle_set_student_id_reuse,
         "random_pick": handle_random_pick,
         "student_create": handle_student_create,
+        "student_bulk_create": handle_student_bulk_create,
         "student_delete": handle_student_delete,
         "student_update": handle_student_update,
         "student_force_cooldown": handle_student_force_cooldown,
@@ -634,12 +826,262 @@ def create_app(
         state = user_data.classrooms
         try:
             return handler(user_data, state, data)
-        except DrawError as error:
-            return error_response(translate_error(error.code), status=400)
+        except Exception as error:
+            # The loaded object is shared between requests; drop whatever the
+            # failed handler changed before it was saved.
+            storage.evict_user(user_data.user_id)
+            if isinstance(error, DrawError):
+                return error_response(translate_error(error.code), status=400)
+            if isinstance(error, ValueError):
+                return error_response(translate_error(str(error)), status=400)
+            if isinstance(error, KeyError):
+                return error_response(translate_error(str(error)), status=404)
+            raise
+
+    @app.get("/students/history")
+    async def student_history(request: Request) -> JSONResponse:
+        query = request.query_params
+        try:
+            uuid_value = extract_uuid({"uuid": query.get("uuid")})
+        except ValueError:
+            return error_response(translate_error("uuid_missing"))
+        user_data = storage.load_user(uuid_value)
+        state = user_data.classrooms
+        try:
+            class_id = str(query.get("class_id") or "").strip()
+            classroom = state.get_class(class_id) if class_id else state.current_class
+            student_id = parse_student_id(dict(query))
         except ValueError as error:
             return error_response(translate_error(str(error)), status=400)
         except KeyError as error:
             return error_response(translate_error(str(error)), status=404)
+        entries = [
+            entry.serialize() for entry in classroom.cms.student_history(student_id)
+        ]
+        archived_before = classroom.cms.history_archived_before
+        if archived_before:
+            # Entries rolled off by history retention are read back from
+            # the class archive.
+            seen = {entry["id"] for entry in entries}
+            for item in storage.read_archive(user_data.user_id, classroom.class_id):
+                students = item.get("students")
+                if item.get("id") in seen or not isinstance(students, list):
+                    continue
+                if any(
+                    isinstance(member, dict) and member.get("id") == student_id
+                    for member in students
+                ):
+                    seen.add(item.get("id"))
+                    entries.append(item)
+            entries.sort(key=lambda item: item.get("timestamp") or 0.0, reverse=True)
+        events = []
+        for entry in entries:
+            event = {
+                "entry_id": entry.get("id"),
+                "timestamp": entry.get("timestamp"),
+                "mode": entry.get("mode"),
+                "count": entry.get("count"),
+                "note": entry.get("note", ""),
+            }
+            if entry.get("group") is not None:
+                event["group"] = entry["group"]
+            events.append(event)
+        return JSONResponse(
+            {
+                "class_id": classroom.class_id,
+                "student_id": student_id,
+                "events": events,
+            }
+        )
+
+    @app.get("/history/report")
+    async def history_report(request: Request) -> JSONResponse:
+        query = request.query_params
+        try:
+            uuid_value = extract_uuid({"uuid": query.get("uuid")})
+        except ValueError:
+            return error_response(translate_error("uuid_missing"))
+        user_data = storage.load_user(uuid_value)
+        state = user_data.classrooms
+        try:
+            class_id = str(query.get("class_id") or "").strip()
+            classroom = state.get_class(class_id) if class_id else state.current_class
+            since, until, utc_offset = parse_report_window(dict(query))
+            student_id = None
+            if query.get("student_id") is not None:
+                student_id = parse_student_id(dict(query))
+        except ValueError as error:
+            return error_response(translate_error(str(error)), status=400)
+        except KeyError as error:
+            return error_response(translate_error(str(error)), status=404)
+        return JSONResponse(
+            {
+                "class_id": classroom.class_id,
+                "since": since,
+                "until": until,
+                "student_id": student_id,
+                # Reports count the history kept in the user file; picks at
+                # or before this time are only in the archive.
+                "archived_before": classroom.cms.history_archived_before or None,
+                "report": classroom.cms.pick_report(
+                    since, until, student_id, utc_offset
+                ),
+            }
+        )
+
+    @app.get("/history/fairness")
+    async def history_fairness(request: Request) -> JSONResponse:
+        query = request.query_params
+        try:
+            uuid_value = extract_uuid({"uuid": query.get("uuid")})
+        except ValueError:
+            return error_response(translate_error("uuid_missing"))
+        user_data = storage.load_user(uuid_value)
+        state = user_data.classrooms
+        try:
+            class_id = str(query.get("class_id") or "").strip()
+            classroom = state.get_class(class_id) if class_id else state.current_class
+            since, until, _ = parse_report_window(dict(query))
+        except ValueError as error:
+            return error_response(translate_error(str(error)), status=400)
+        except KeyError as error:
+            return error_response(translate_error(str(error)), status=404)
+        now = current_timestamp()
+        report = dict(classroom.cms.fairness_report(since, until))
+        oldest = report.pop("oldest_last_pick")
+        # Seconds each student has waited since their last pick, longest
+        # first; None for students never picked.
+        waits = [
+            [student_id, max(0.0, now - last_pick) if last_pick else None]
+            for student_id, last_pick in report.pop("last_picks")
+        ]
+        return JSONResponse(
+            {
+                "class_id": classroom.class_id,
+                "generated_at": now,
+                "since": since,
+                "until": until,
+                "longest_wait": None if oldest is None else max(0.0, now - oldest),
+                "waits": waits,
+                **report,
+            }
+        )
+
+    @app.get("/students/search")
+    async def search_students(request: Request) -> JSONResponse:
+        query = request.query_params
+        try:
+            uuid_value = extract_uuid({"uuid": query.get("uuid")})
+        except ValueError:
+            return error_response(translate_error("uuid_missing"))
+        user_data = storage.load_user(uuid_value)
+        state = user_data.classrooms
+        try:
+            class_id = str(query.get("class_id") or "").strip()
+            classroom = state.get_class(class_id) if class_id else state.current_class
+            offset, limit = parse_page(dict(query))
+        except ValueError as error:
+            return error_response(translate_error(str(error)), status=400)
+        except KeyError as error:
+            return error_response(translate_error(str(error)), status=404)
+        term = str(query.get("q") or "")
+        total, page = classroom.cms.search_students(term, offset, limit)
+        now = current_timestamp()
+        return JSONResponse(
+            {
+                "class_id": classroom.class_id,
+                "query": term,
+                "total": total,
+                "offset": offset,
+                "limit": limit,
+                "students": [
+                    classroom.cms.student_payload(student, now) for student in page
+                ],
+            }
+        )
+
+    @app.get("/students/stats")
+    async def student_stats(request: Request) -> JSONResponse:
+        query = request.query_params
+        try:
+            uuid_value = extract_uuid({"uuid": query.get("uuid")})
+        except ValueError:
+            return error_response(translate_error("uuid_missing"))
+        user_data = storage.load_user(uuid_value)
+        state = user_data.classrooms
+        try:
+            class_id = str(query.get("class_id") or "").strip()
+            classroom = state.get_class(class_id) if class_id else state.current_class
+        except KeyError as error:
+            return error_response(translate_error(str(error)), status=404)
+        now = current_timestamp()
+        return JSONResponse(
+            {
+                "class_id": classroom.class_id,
+                "generated_at": now,
+                "stats": classroom.cms.roster_stats(now),
+            }
+        )
+
+    @app.get("/students/query")
+    async def query_students(request: Request) -> Response:
+        query = request.query_params
+        try:
+            uuid_value = extract_uuid({"uuid": query.get("uuid")})
+        except ValueError:
+            return error_response(translate_error("uuid_missing"))
+        user_data = storage.load_user(uuid_value)
+        state = user_data.classrooms
+        now = current_timestamp()
+        try:
+            class_id = str(query.get("class_id") or "").strip()
+            classroom = state.get_class(class_id) if class_id else state.current_class
+            cms = classroom.cms
+            offset, limit = parse_page(dict(query), max_limit=MAX_QUERY_SIZE)
+            total, students = cms.query_students(
+                parse_student_filters(dict(query), cms, now),
+                order=str(query.get("order") or "default"),
+                descending=str(query.get("desc") or "").lower() in ("1", "true"),
+                offset=offset,
+                limit=limit,
+            )
+        except ValueError as error:
+            return error_response(translate_error(str(error)), status=400)
+        except KeyError as error:
+            return error_response(translate_error(str(error)), status=404)
+        header = encode(
+            {
+                "class_id": classroom.class_id,
+                "total": total,
+                "offset": offset,
+                "limit": limit,
+                "median_pick_count": cms.median_pick_count(),
+                "generated_at": now,
+                "columns": QUERY_COLUMNS,
+            }
+        )
+
+        def rows() -> Any:
+            yield header[:-1] + ',"students":['
+            for start in range(0, len(students), QUERY_CHUNK_SIZE):
+                chunk = students[start : start + QUERY_CHUNK_SIZE]
+                text = ",".join(
+                    encode(
+                        [
+                            student.student_id,
+                            student.name,
+                            student.group,
+                            student.pick_count,
+                            student.last_pick,
+                            student.cooldown_expires_at,
+                        ]
+                    )
+                    for student in chunk
+                )
+                yield ("," if start else "") + text
+            yield "]}"
+
+        return StreamingResponse(rows(), media_type="application/json")
 
     @app.get("/preferences")
     async def get_preferences(request: Request) -> JSONResponse:
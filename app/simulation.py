@@ -0,0 +1,410 @@
+"""Offline draw-policy simulator used to tune cooldown settings.
+
+The engine replays a draw schedule against many independent replicas of a
+classroom at once. Every replica is one row of the state arrays, so a single
+schedule step advances all replicas with a handful of NumPy operations.
+Eligibility follows ``Student.pickable`` (a student can be drawn once the
+current time reaches ``cooldown_expires_at``) and picks follow
+``Student.apply_cooldown``. Like ``DrawService``, single draws and the first
+slot of a batch skip the student picked last on the same day; later slots
+only skip the slots drawn before them.
+
+NumPy is only needed for this module; install the ``simulation`` extra.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+
+from .student import Student
+
+_SECONDS_PER_DAY = 60 * 60 * 24
+_SUPPORTED_MODES = ("single", "batch", "group")
+
+
+@dataclass(frozen=True)
+class SimulationRoster:
+    """Array view of a classroom: one slot per student."""
+
+    student_ids: np.ndarray
+    names: tuple[str, ...]
+    groups: np.ndarray
+    cooldown_expires_at: np.ndarray
+
+    @classmethod
+    def from_students(cls, students: Iterable[Student]) -> "SimulationRoster":
+        items = sorted(students, key=lambda student: student.student_id)
+        return cls(
+            student_ids=np.array([s.student_id for s in items], dtype=np.int64),
+            names=tuple(s.name for s in items),
+            groups=np.array([s.group for s in items], dtype=np.int64),
+            cooldown_expires_at=np.array(
+                [s.cooldown_expires_at for s in items], dtype=np.float64
+            ),
+        )
+
+    def __len__(self) -> int:
+        return int(self.student_ids.size)
+
+
+@dataclass(frozen=True)
+class SimulationConfig:
+    mode: str = "single"
+    cooldown_days: int = 3
+    days: int = 120
+    draws_per_day: int = 6
+    weekdays: tuple[int, ...] = (0, 1, 2, 3, 4)
+    day_start_hour: float = 8.0
+    day_end_hour: float = 17.0
+    batch_count: int = 1
+    ignore_cooldown: bool = False
+    replicas: int = 1000
+    seed: int | None = None
+    start_time: float | None = None
+    respect_current_cooldowns: bool = True
+
+    def __post_init__(self) -> None:
+        if self.mode not in _SUPPORTED_MODES:
+            raise ValueError("unsupported_random_mode")
+        if self.batch_count < 1:
+            raise ValueError("batch_count_invalid")
+        if self.replicas < 1 or self.days < 1 or self.draws_per_day < 1:
+            raise ValueError("simulation_schedule_invalid")
+
+
+@dataclass
+class SimulationReport:
+    config: dict[str, Any]
+    students: int
+    replicas: int
+    scheduled_draws: int
+    completed_draws: int
+    failed_draws: int
+    failure_rate: float
+    picks_per_student: dict[str, float]
+    fairness: dict[str, float]
+    expected_picks: list[dict[str, Any]] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def load_roster(path: Path, class_id: str | None = None) -> SimulationRoster:
+    """Read a classroom roster from a user data file.
+
+    ``class_id`` may also be a class name; when omitted the active class is
+    used.
+    """
+    from .user_data import UserData
+
+    payload = json.loads(Path(path).read_text(encoding="utf-8"))
+    state = UserData.from_dict(payload).classrooms
+    classroom = state.current_class
+    if class_id:
+        matches = [
+            item
+            for item in state.iter_classes()
+            if class_id in (item.class_id, item.name)
+        ]
+        if not matches:
+            raise KeyError("class_missing")
+        classroom = matches[0]
+    return SimulationRoster.from_students(classroom.cms.get_students())
+
+
+def build_schedule(config: SimulationConfig, start_time: float) -> np.ndarray:
+    """Timestamps of every scheduled draw, in order."""
+    start = time.localtime(start_time)
+    midnight = time.mktime(
+        (start.tm_year, start.tm_mon, start.tm_mday, 0, 0, 0, 0, 0, -1)
+    )
+    span = max(0.0, config.day_end_hour - config.day_start_hour) * 3600.0
+    offsets = config.day_start_hour * 3600.0 + np.arange(config.draws_per_day) * (
+        span / config.draws_per_day
+    )
+    weekdays = set(config.weekdays)
+    days = [
+        midnight + index * _SECONDS_PER_DAY
+        for index in range(config.days)
+        if time.localtime(midnight + index * _SECONDS_PER_DAY + 43200).tm_wday
+        in weekdays
+    ]
+    if not days:
+        return np.empty(0, dtype=np.float64)
+    return (np.asarray(days)[:, None] + offsets[None, :]).ravel()
+
+
+def simulate(roster: SimulationRoster, config: SimulationConfig) -> SimulationReport:
+    started = time.perf_counter()
+    start_time = time.time() if config.start_time is None else config.start_time
+    schedule = build_schedule(config, start_time)
+    rng = np.random.default_rng(config.seed)
+    replicas = config.replicas
+    size = len(roster)
+    counts = np.zeros((replicas, size), dtype=np.int64)
+    expires = np.zeros((replicas, size), dtype=np.float64)
+    if config.respect_current_cooldowns:
+        expires[:] = roster.cooldown_expires_at
+    last_pick = np.full(replicas, -1, dtype=np.int64)
+    last_day = np.full(replicas, -1, dtype=np.int64)
+    failed = 0
+    if size:
+        step = _STEPS[config.mode]
+        context = _StepContext(roster, config, rng)
+        for moment in schedule:
+            failed += step(context, counts, expires, last_pick, last_day, moment)
+    scheduled = int(schedule.size) * replicas
+    return _build_report(
+        roster,
+        config,
+        counts,
+        scheduled=scheduled,
+        failed=failed if size else scheduled,
+        elapsed=time.perf_counter() - started,
+    )
+
+
+def sweep(
+    roster: SimulationRoster,
+    configs: Iterable[SimulationConfig],
+    *,
+    processes: int | None = None,
+) -> list[SimulationReport]:
+    """Run several configurations, one worker process per configuration.
+
+    Configurations without a seed receive independent child seeds of a
+    common ``SeedSequence`` so the sweep stays reproducible when the first
+    configuration is seeded.
+    """
+    items = list(configs)
+    root_seed = next((item.seed for item in items if item.seed is not None), None)
+    children = np.random.SeedSequence(root_seed).spawn(len(items))
+    seeded = [
+        item
+        if item.seed is not None
+        else replace(item, seed=int(child.generate_state(1)[0]))
+        for item, child in zip(items, children)
+    ]
+    if processes == 1 or len(seeded) <= 1:
+        return [simulate(roster, item) for item in seeded]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(simulate, [roster] * len(seeded), seeded))
+
+
+class _StepContext:
+    def __init__(
+        self,
+        roster: SimulationRoster,
+        config: SimulationConfig,
+        rng: np.random.Generator,
+    ) -> None:
+        self.config = config
+        self.rng = rng
+        self.rows = np.arange(config.replicas)
+        self.duration = max(0, int(config.cooldown_days)) * _SECONDS_PER_DAY
+        group_values, group_slots = np.unique(roster.groups, return_inverse=True)
+        self.group_values = group_values
+        self.group_slots = group_slots
+        self.membership = np.zeros((len(roster), group_values.size), dtype=np.int64)
+        self.membership[np.arange(len(roster)), group_slots] = 1
+
+    def eligible(self, expires: np.ndarray, moment: float) -> np.ndarray:
+        if self.config.ignore_cooldown:
+            return np.ones(expires.shape, dtype=bool)
+        return moment >= expires
+
+    def cool_down(self, expires: np.ndarray, mask: np.ndarray, moment: float) -> None:
+        expires[mask] = moment + self.duration if self.duration > 0 else 0.0
+
+    def exclude_last_pick(
+        self,
+        eligible: np.ndarray,
+        last_pick: np.ndarray,
+        last_day: np.ndarray,
+        day: int,
+    ) -> None:
+        same_day = (last_day == day) & (last_pick >= 0)
+        eligible[self.rows[same_day], last_pick[same_day]] = False
+
+
+def _day_number(moment: float) -> int:
+    local = time.localtime(moment)
+    return local.tm_year * 1000 + local.tm_yday
+
+
+def _step_single(
+    context: _StepContext,
+    counts: np.ndarray,
+    expires: np.ndarray,
+    last_pick: np.ndarray,
+    last_day: np.ndarray,
+    moment: float,
+) -> int:
+    day = _day_number(moment)
+    eligible = context.eligible(expires, moment)
+    context.exclude_last_pick(eligible, last_pick, last_day, day)
+    keys = np.where(eligible, context.rng.random(eligible.shape), -1.0)
+    chosen = keys.argmax(axis=1)
+    ok = eligible[context.rows, chosen]
+    rows = context.rows[ok]
+    picked = chosen[ok]
+    counts[rows, picked] += 1
+    mask = np.zeros(expires.shape, dtype=bool)
+    mask[rows, picked] = True
+    context.cool_down(expires, mask, moment)
+    last_pick[rows] = picked
+    last_day[rows] = day
+    return int((~ok).sum())
+
+
+def _step_batch(
+    context: _StepContext,
+    counts: np.ndarray,
+    expires: np.ndarray,
+    last_pick: np.ndarray,
+    last_day: np.ndarray,
+    moment: float,
+) -> int:
+    wanted = context.config.batch_count
+    if wanted > expires.shape[1]:
+        return expires.shape[0]
+    day = _day_number(moment)
+    eligible = context.eligible(expires, moment)
+    # DrawService moves the last pick to each slot as it is drawn, so the
+    # previous last pick is ruled out for the first slot only.
+    opening = eligible.copy()
+    context.exclude_last_pick(opening, last_pick, last_day, day)
+    keys = np.where(opening, context.rng.random(eligible.shape), -1.0)
+    first = keys.argmax(axis=1)
+    ok = opening[context.rows, first] & (eligible.sum(axis=1) >= wanted)
+    rest = eligible.copy()
+    rest[context.rows, first] = False
+    keys = np.where(rest, context.rng.random(eligible.shape), -1.0)
+    others = np.argpartition(-keys, max(0, wanted - 2), axis=1)[:, : wanted - 1]
+    rows = context.rows[ok]
+    picked = np.concatenate([first[:, None], others], axis=1)[ok]
+    mask = np.zeros(expires.shape, dtype=bool)
+    mask[rows[:, None], picked] = True
+    counts += mask
+    context.cool_down(expires, mask, moment)
+    if rows.size:
+        if wanted > 1:
+            # The slot with the lowest key is the one drawn last.
+            tail = others[ok]
+            order = np.take_along_axis(keys[rows], tail, axis=1).argmin(axis=1)
+            last_pick[rows] = tail[np.arange(rows.size), order]
+        else:
+            last_pick[rows] = first[rows]
+        last_day[rows] = day
+    return int((~ok).sum())
+
+
+def _step_group(
+    context: _StepContext,
+    counts: np.ndarray,
+    expires: np.ndarray,
+    last_pick: np.ndarray,
+    last_day: np.ndarray,
+    moment: float,
+) -> int:
+    eligible = context.eligible(expires, moment)
+    cooling = (~eligible).astype(np.int64) @ context.membership
+    open_groups = cooling == 0
+    keys = np.where(open_groups, context.rng.random(open_groups.shape), -1.0)
+    chosen = keys.argmax(axis=1)
+    ok = open_groups[context.rows, chosen]
+    mask = (context.group_slots[None, :] == chosen[:, None]) & ok[:, None]
+    counts += mask
+    context.cool_down(expires, mask, moment)
+    return int((~ok).sum())
+
+
+_STEPS = {
+    "single": _step_single,
+    "batch": _step_batch,
+    "group": _step_group,
+}
+
+
+def _gini(values: np.ndarray) -> np.ndarray:
+    """Row-wise Gini coefficient of non-negative pick counts."""
+    size = values.shape[1]
+    totals = values.sum(axis=1)
+    ordered = np.sort(values, axis=1)
+    weights = 2 * np.arange(1, size + 1) - size - 1
+    scores = (ordered * weights).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = np.where(totals > 0, scores / (size * totals), 0.0)
+    return result
+
+
+def _build_report(
+    roster: SimulationRoster,
+    config: SimulationConfig,
+    counts: np.ndarray,
+    *,
+    scheduled: int,
+    failed: int,
+    elapsed: float,
+) -> SimulationReport:
+    replicas, size = counts.shape
+    if size:
+        flat = counts.ravel()
+        quantiles = np.quantile(flat, [0.0, 0.1, 0.5, 0.9, 1.0])
+        means = counts.mean(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cv = np.where(means > 0, counts.std(axis=1) / means, 0.0)
+        picks = {
+            "mean": float(flat.mean()),
+            "std": float(flat.std()),
+            "min": float(quantiles[0]),
+            "p10": float(quantiles[1]),
+            "median": float(quantiles[2]),
+            "p90": float(quantiles[3]),
+            "max": float(quantiles[4]),
+        }
+        fairness = {
+            "gini": float(_gini(counts).mean()),
+            "coefficient_of_variation": float(cv.mean()),
+            "spread": float((counts.max(axis=1) - counts.min(axis=1)).mean()),
+            "never_picked_share": float((counts == 0).mean()),
+        }
+        per_student = counts.mean(axis=0)
+        expected = [
+            {
+                "id": int(student_id),
+                "name": name,
+                "group": int(group),
+                "expected_picks": float(value),
+            }
+            for student_id, name, group, value in zip(
+                roster.student_ids, roster.names, roster.groups, per_student
+            )
+        ]
+    else:
+        picks = {}
+        fairness = {}
+        expected = []
+    config_payload = asdict(config)
+    config_payload["weekdays"] = list(config.weekdays)
+    return SimulationReport(
+        config=config_payload,
+        students=size,
+        replicas=replicas,
+        scheduled_draws=scheduled,
+        completed_draws=scheduled - failed,
+        failed_draws=failed,
+        failure_rate=float(failed / scheduled) if scheduled else 0.0,
+        picks_per_student=picks,
+        fairness=fairness,
+        expected_picks=expected,
+        elapsed_seconds=elapsed,
+    )
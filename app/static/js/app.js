@@ -18,6 +18,7 @@ const dom = {
     resultModeDisplay: $("result-mode-display"),
     batchField: document.querySelector("[data-batch-field]"),
     batchCount: $("batch-count"),
+    roundCount: $("round-count"),
     resultModeControl: document.querySelector("[data-mode-control]"),
     ignoreCooldown: $("ignore-cooldown"),
     classSwitcher: $("class-switcher"),
@@ -37,12 +38,6 @@ const dom = {
     drawModeTooltipClose: null,
 };
 
-const DRAW_MODES = Object.freeze({
-    SINGLE: "single",
-    BATCH: "batch",
-    GROUP: "group",
-});
-
 const ACTIONS = Object.freeze({
     CLASS_SWITCH: "class_switch",
     CLASS_DELETE: "class_delete",
@@ -63,6 +58,9 @@ const ACTIONS = Object.freeze({
 });
 
 let resultNameFitFrame = 0;
+// Kind and value last written to the result name, so repeated renders of the
+// same selection leave its nodes alone.
+let resultNameShown = "";
 
 function scheduleResultNameFit(opts = {}) {
     const element = dom.resultName;
@@ -165,6 +163,9 @@ function fitResultNameContent() {
 function applyResultName(value, kind) {
     const element = dom.resultName;
     if (!element) return;
+    const shown = `${kind}:${Array.isArray(value) ? value.join("\n") : value}`;
+    if (shown === resultNameShown) return;
+    resultNameShown = shown;
     element.classList.remove("is-placeholder", "is-text", "is-names");
     element.innerHTML = "";
     element.style.removeProperty("font-size");
@@ -232,19 +233,6 @@ function setResultNameNames(values) {
     applyResultName(list, "names");
 }
 
-const DRAW_MODE_ALIASES = {
-    [DRAW_MODES.SINGLE]: DRAW_MODES.SINGLE,
-    any: DRAW_MODES.SINGLE,
-    student: DRAW_MODES.SINGLE,
-    [DRAW_MODES.BATCH]: DRAW_MODES.BATCH,
-    [DRAW_MODES.GROUP]: DRAW_MODES.GROUP,
-};
-
-function normalizeDrawMode(value) {
-    const key = typeof value === "string" ? value.trim().toLowerCase() : "";
-    return DRAW_MODE_ALIASES[key] || DRAW_MODES.SINGLE;
-}
- 
 function normalizeResultStudents(entries) {
     if (!Array.isArray(entries)) {
         return [];
@@ -354,7 +342,8 @@ const RUNTIME_LABELS = {
     desktop: "客户端",
 };
 
-// Storage keys for browser localStorage
+// Storage keys for browser localStorage; session data used to be kept under
+// PAYLOAD_STORAGE_KEY and is now cached in IndexedDB (sessionCache).
 const PAYLOAD_STORAGE_KEY = "pickme::data";
 const UUID_STORAGE_KEY = "pickme::uuid";
 
@@ -372,34 +361,34 @@ const sessionStore = (() => {
     return {
         uuid: null,
         data: null,
+        // Pending session request when cached data was shown first.
+        revalidation: null,
         async initialize() {
             const cachedUuid = this.loadUuid();
-            const cachedPayload = this.loadCachedData();
+            const legacyPayload = this.loadCachedData();
             try {
                 localStorage.removeItem(PAYLOAD_STORAGE_KEY);
             } catch (_) {}
-            try {
-                const response = await this.requestSession(cachedUuid);
-                this.uuid = response.uuid || cachedUuid || null;
+            const session = this.requestSession(cachedUuid);
+            // Failures are handled by whoever awaits the request.
+            session.catch(() => {});
+            const cachedPayload =
+                (await sessionCache.load(cachedUuid || "")) || legacyPayload;
+            if (cachedPayload) {
+                this.uuid = cachedUuid || null;
                 updateAppWatermark(this.uuid);
-                this.data =
-                    response.data && typeof response.data === "object"
-                        ? response.data
-                        : {};
-                this.persist();
-            } catch (error) {
-                if (cachedPayload) {
-                    this.uuid = cachedUuid || null;
-                    updateAppWatermark(this.uuid);
-                    this.data = cachedPayload;
-                    console.warn(
-                        "Session initialization failed, using cached data",
-                        error
-                    );
-                } else {
-                    throw error;
-                }
+                this.data = cachedPayload;
+                this.revalidation = session;
+                return;
             }
+            const response = await session;
+            this.uuid = response.uuid || cachedUuid || null;
+            updateAppWatermark(this.uuid);
+            this.data =
+                response.data && typeof response.data === "object"
+                    ? response.data
+                    : {};
+            this.persist();
         },
         async requestSession(uuidCandidate) {
             const payload = {};
@@ -460,6 +449,7 @@ const sessionStore = (() => {
                 console.warn("Failed to persist UUID", error);
             }
         },
+        // Session data left in localStorage by earlier versions.
         loadCachedData() {
             try {
                 const raw = localStorage.getItem(PAYLOAD_STORAGE_KEY);
@@ -474,14 +464,7 @@ const sessionStore = (() => {
                 this.saveUuid(this.uuid);
             }
             if (this.data) {
-                try {
-                    localStorage.setItem(
-                        PAYLOAD_STORAGE_KEY,
-                        JSON.stringify(this.data)
-                    );
-                } catch (error) {
-                    console.warn("Failed to persist session payload", error);
-                }
+                sessionCache.save(this.uuid || "", this.data);
             }
         },
         updateFromResponse(payload) {
@@ -594,6 +577,7 @@ function renderInitializationError(error) {
         dom.resultNote.textContent = "Unable to load data, please refresh.";
     }
     if (dom.resultName) {
+        resultNameShown = "";
         dom.resultName.textContent = "--";
     }
     showToast("Unable to load data, please refresh.", "error");
@@ -602,7 +586,6 @@ function renderInitializationError(error) {
 function isWebViewEnvironment() {
     return !!window.pywebview || (navigator && /WebView|Edg\//.test(navigator.userAgent || ""));
 }
-const DEFAULT_CLASS_NAME = "默认班级";
 
 const state = {
     app: null,
@@ -615,6 +598,7 @@ const state = {
     students: [],
     studentsMap: new Map(),
     search: "",
+    searchResults: null,
     ignoreCooldown: false,
     busy: false,
     isAnimating: false,
@@ -630,6 +614,18 @@ const state = {
 };
 
 const TOAST_DEFAULT_DURATION = 2400;
+// Rosters larger than this are searched through the server's index.
+const SERVER_SEARCH_THRESHOLD = 500;
+const SERVER_SEARCH_LIMIT = 200;
+const SERVER_SEARCH_DELAY = 120;
+let serverSearchTimer = 0;
+// Windowed views of the student, cooldown and history lists (VirtualList).
+const listViews = { students: null, cooldown: null, history: null };
+// History rows of the last render, reused while the class, its revision and
+// the day (which the day labels are relative to) stay the same.
+let historyRowsCache = { key: "", rows: [] };
+let preparedStateSequence = 0;
+let committedStateSequence = 0;
 const toastStates = new Map();
 let toastPauseDepth = 0;
 let animationInterval = null;
@@ -658,12 +654,76 @@ const timeShortFormatter = new Intl.DateTimeFormat("zh-CN", {
     minute: "2-digit",
     hour12: false
 });
-const WEEKDAY_LABELS = ["周日", "周一", "周二", "周三", "周四", "周五", "周六"];
 const PICK_MODE_LABELS = {
     [DRAW_MODES.SINGLE]: "抽取一人",
     [DRAW_MODES.BATCH]: "抽取多人",
     [DRAW_MODES.GROUP]: "抽取小组",
 };
+const PAYLOAD_WORKER_URL = new URL("payload-worker.js", document.currentScript ? document.currentScript.src : location.href).href;
+
+// Runs prepareAppState in payload-worker.js. Requests are answered in order;
+// if the worker cannot start or fails, the pending and later requests are
+// prepared on this thread instead.
+const statePreparer = (() => {
+    let worker = null;
+    let nextId = 0;
+    const pending = new Map();
+
+    function prepareHere(raw, historyKey) {
+        return Promise.resolve().then(() => prepareAppState(raw, historyKey));
+    }
+
+    function abandonWorker(error) {
+        console.warn("Payload worker unavailable, preparing on the page", error);
+        if (worker) {
+            worker.terminate();
+            worker = null;
+        }
+        for (const request of pending.values()) {
+            prepareHere(request.raw, request.historyKey).then(request.resolve, request.reject);
+        }
+        pending.clear();
+    }
+
+    try {
+        worker = typeof Worker === "function" ? new Worker(PAYLOAD_WORKER_URL) : null;
+    } catch (error) {
+        worker = null;
+    }
+    if (worker) {
+        worker.addEventListener("message", event => {
+            const { id, prepared, error } = event.data || {};
+            const request = pending.get(id);
+            if (!request) {
+                return;
+            }
+            pending.delete(id);
+            if (error) {
+                request.reject(new Error(error));
+            } else {
+                request.resolve(prepared);
+            }
+        });
+        worker.addEventListener("error", abandonWorker);
+    }
+
+    return {
+        prepare(raw, historyKey) {
+            if (!worker) {
+                return prepareHere(raw, historyKey);
+            }
+            return new Promise((resolve, reject) => {
+                const id = ++nextId;
+                pending.set(id, { raw, historyKey, resolve, reject });
+                try {
+                    worker.postMessage({ id, raw, historyKey });
+                } catch (error) {
+                    abandonWorker(error);
+                }
+            });
+        },
+    };
+})();
 
 window.addEventListener("resize", () => {
     if (dom.resultName && dom.resultName.classList.contains("is-names")) {
@@ -687,6 +747,23 @@ async function init() {
     scheduleResultNameFit();
     setPickMode(state.pickMode || DRAW_MODES.SINGLE, { silent: true, skipControls: true });
     requestRender({ immediate: true });
+    if (sessionStore.revalidation) {
+        revalidateSession(sessionStore.revalidation);
+    }
+}
+
+// Cached data is on screen; bring in the server's copy once it arrives. The
+// sequence is taken now so that any action answered in the meantime wins.
+async function revalidateSession(request) {
+    const sequence = ++preparedStateSequence;
+    try {
+        const response = await request;
+        sessionStore.revalidation = null;
+        commitServerState(await prepareServerState(response, sequence));
+        requestRender();
+    } catch (error) {
+        console.warn("Session revalidation failed, showing cached data", error);
+    }
 }
 
 function loadInitialState() {
@@ -701,6 +778,13 @@ function persistState() {
 }
 
 function bindEvents() {
+    // Pending cache writes go out before the page is hidden or closed.
+    window.addEventListener("pagehide", () => sessionCache.flush());
+    document.addEventListener("visibilitychange", () => {
+        if (document.visibilityState === "hidden") {
+            sessionCache.flush();
+        }
+    });
     if (dom.pickAction) {
         dom.pickAction.addEventListener("click", handlePickAction);
     }
@@ -722,6 +806,7 @@ function bindEvents() {
         const value = event.target.value;
         state.search = value.trim() ? value : "";
         renderLists();
+        scheduleServerSearch();
     });
     dom.cooldownDisplay.addEventListener("click", openCooldownModal);
     dom.clearCooldown.addEventListener("click", handleClearCooldown);
@@ -757,37 +842,39 @@ function bindEvents() {
 }
 
 function applyAppState(rawState) {
-    const normalized = normalizeAppState(rawState);
+    commitAppState(prepareAppState(rawState, historyRowsCache.key));
+}
+
+function commitAppState(prepared) {
+    const { normalized, payloads, current } = prepared;
     if (!(state.classData instanceof Map)) {
         state.classData = new Map();
     }
     state.classes = normalized.classes;
     state.classMap = new Map(state.classes.map(item => [item.id, item]));
-    state.currentClassId = normalized.current_class_id || (state.classes.length ? state.classes[0].id : "");
+    state.currentClassId = current.id;
     const currentMeta = state.classMap.get(state.currentClassId) || state.classes.find(item => item.id === state.currentClassId) || null;
     state.currentClassName = currentMeta ? currentMeta.name : DEFAULT_CLASS_NAME;
-    const classesData = normalized.classes_data || {};
-    Object.entries(classesData).forEach(([classId, payload]) => {
-        if (payload && typeof payload === "object") {
-            state.classData.set(classId, normalizePayload(payload));
-        }
+    Object.entries(payloads).forEach(([classId, payload]) => {
+        state.classData.set(classId, payload);
     });
     // Prioritize classes_data over current_class.payload to avoid losing data during import
-    let payloadSource = null;
-    if (state.classData.has(state.currentClassId)) {
-        payloadSource = state.classData.get(state.currentClassId);
-    } else {
-        const rawCurrent = normalized.current_class && typeof normalized.current_class === "object" ? normalized.current_class : {};
-        payloadSource = rawCurrent.payload;
-    }
-    state.payload = normalizePayload(payloadSource || {});
+    const prepareUsed = !!payloads[state.currentClassId] || !state.classData.has(state.currentClassId);
+    state.payload = prepareUsed ? current.payload : normalizePayload(state.classData.get(state.currentClassId));
     state.classData.set(state.currentClassId, state.payload);
     if (currentMeta) {
         currentMeta.student_count = state.payload.students.length;
         currentMeta.cooldown_days = state.payload.cooldown_days;
     }
     state.studentsMap = new Map(state.payload.students.map(student => [student.id, student]));
-    state.students = getSortedStudents(state.payload.students);
+    state.students = prepareUsed ? current.students : getSortedStudents(state.payload.students);
+    if (prepareUsed && current.history) {
+        historyRowsCache = current.history;
+    }
+    if (state.searchResults) {
+        // Names or groups may have changed; refresh the server matches.
+        scheduleServerSearch();
+    }
     const historyData = state.payload.history || { entries: [] };
     state.history = Array.isArray(historyData.entries) ? historyData.entries : [];
     state.historyIndex = new Map(state.history.map(entry => [entry.id, entry]));
@@ -799,14 +886,29 @@ function applyAppState(rawState) {
     updateClassModal();
 }
 
-function applyServerState(response) {
-    if (!response || typeof response !== "object") {
-        return;
+// Server responses are applied in two steps. Preparing converts and
+// normalizes the new state, in a worker when one is available, and can run
+// while a draw is still animating; committing then swaps it in. A state
+// older than the last committed one is dropped.
+function prepareServerState(response, sequence = ++preparedStateSequence) {
+    if (!response || typeof response !== "object" || sequence < committedStateSequence) {
+        return Promise.resolve(null);
     }
     sessionStore.updateFromResponse(response);
     const unified = sessionStore.data && typeof sessionStore.data === "object" ? sessionStore.data : {};
-    const legacy = convertUnifiedToLegacy(unified);
-    applyAppState(legacy);
+    return statePreparer.prepare(unified, historyRowsCache.key).then(prepared => ({ sequence, prepared }));
+}
+
+function commitServerState(result) {
+    if (!result || result.sequence < committedStateSequence) {
+        return;
+    }
+    committedStateSequence = result.sequence;
+    commitAppState(result.prepared);
+}
+
+async function applyServerState(response) {
+    commitServerState(await prepareServerState(response));
 }
 
 function requestRender(options = {}) {
@@ -850,44 +952,92 @@ function renderClassSwitcher() {
         return;
     }
     const name = state.currentClassName || "默认班级";
-    dom.classSwitcherLabel.textContent = name;
+    patchText(dom.classSwitcherLabel, name);
     if (dom.classSwitcher) {
-        dom.classSwitcher.dataset.classId = state.currentClassId || "";
-        dom.classSwitcher.title = `${name} · ${state.payload.students.length} 人`;
+        const classId = state.currentClassId || "";
+        const title = `${name} · ${state.payload.students.length} 人`;
+        if (dom.classSwitcher.dataset.classId !== classId) {
+            dom.classSwitcher.dataset.classId = classId;
+        }
+        if (dom.classSwitcher.title !== title) {
+            dom.classSwitcher.title = title;
+        }
+    }
+}
+
+// Text setter for nodes re-rendered on every state change; unchanged text is
+// not written, so the node and any selection inside it are left alone.
+function patchText(element, value) {
+    const text = String(value);
+    if (element && element.textContent !== text) {
+        element.textContent = text;
     }
 }
 
 function renderStats() {
-    dom.cooldownValue.textContent = state.payload.cooldown_days;
+    patchText(dom.cooldownValue, state.payload.cooldown_days);
     const total = state.payload.students.length;
+    // The server keeps these totals; they hold until the next cooldown ends.
+    const stats = state.payload.stats;
+    const expiry = stats ? Number(stats.next_expiry) : 0;
     let cooling = 0;
-    for (const student of state.payload.students) {
-        if (student.is_cooling) {
-            cooling += 1;
+    if (stats && stats.students === total && (!expiry || Date.now() / 1000 < expiry)) {
+        cooling = Number(stats.cooling) || 0;
+    } else {
+        for (const student of state.payload.students) {
+            if (student.is_cooling) {
+                cooling += 1;
+            }
         }
     }
-    dom.statTotal.textContent = total;
-    dom.statCooling.textContent = cooling;
-    dom.statAvailable.textContent = total - cooling;
+    patchText(dom.statTotal, total);
+    patchText(dom.statCooling, cooling);
+    patchText(dom.statAvailable, total - cooling);
+}
+
+function ensureListViews() {
+    if (listViews.students) {
+        return;
+    }
+    const studentKey = student => student.id;
+    listViews.students = new VirtualList(dom.studentList, {
+        keyOf: studentKey,
+        renderRow: renderStudentItem,
+        emptyHtml: '<li class="empty-message">未找到匹配的学生</li>'
+    });
+    listViews.cooldown = new VirtualList(dom.cooldownList, {
+        keyOf: studentKey,
+        renderRow: renderCooldownItem,
+        emptyHtml: '<li class="empty-message">当前没有学生处于冷却</li>'
+    });
+    if (dom.historyList && dom.historyGroups) {
+        listViews.history = new VirtualList(dom.historyList, {
+            target: dom.historyGroups,
+            keyOf: row => row.key,
+            renderRow: renderHistoryRow,
+            estimate: 120
+        });
+    }
 }
 
 function renderLists() {
+    ensureListViews();
     dom.studentSearch.value = state.search;
     const keyword = state.search.trim();
     const base = state.students;
-    const filtered = keyword ? base.filter(student => matchesKeyword(student, keyword)) : base;
-    dom.studentList.innerHTML = filtered.length ? filtered.map(renderStudentItem).join("") : '<li class="empty-message">未找到匹配的学生</li>';
-    const coolingStudents = base.filter(student => student.is_cooling);
-    dom.cooldownList.innerHTML = coolingStudents.length ? coolingStudents.map(renderCooldownItem).join("") : '<li class="empty-message">当前没有学生处于冷却</li>';
+    const filtered = keyword ? searchStudents(keyword) : base;
+    listViews.students.setItems(filtered);
+    listViews.cooldown.setItems(base.filter(student => student.is_cooling));
 }
 
 function renderHistory() {
     if (!dom.historyList || !dom.historyGroups) {
         return;
     }
+    ensureListViews();
     const entries = Array.isArray(state.history) ? state.history : [];
     if (!entries.length) {
-        dom.historyGroups.innerHTML = "";
+        listViews.history.setItems([]);
         if (dom.historyEmpty) {
             dom.historyEmpty.classList.remove("d-none");
         }
@@ -896,68 +1046,29 @@ function renderHistory() {
     if (dom.historyEmpty) {
         dom.historyEmpty.classList.add("d-none");
     }
-    const groups = buildHistoryGroups(entries);
-    dom.historyGroups.innerHTML = groups.map(renderHistoryGroup).join("");
+    const key = historyRowsKey(state.currentClassId, state.payload);
+    if (!key || historyRowsCache.key !== key) {
+        historyRowsCache = { key, rows: flattenHistoryGroups(buildHistoryGroups(entries)) };
+    }
+    listViews.history.setItems(historyRowsCache.rows);
     requestAnimationFrame(() => {
         highlightHistoryEntry();
     });
 }
 
-function buildHistoryGroups(entries) {
-    const sorted = entries.slice().sort((a, b) => b.timestamp - a.timestamp);
-    const dayMap = new Map();
-    for (const entry of sorted) {
-        const dayKey = buildHistoryDayKey(entry.timestamp);
-        let group = dayMap.get(dayKey);
-        if (!group) {
-            group = {
-                key: dayKey,
-                label: formatHistoryDayLabel(entry.timestamp),
-                order: entry.timestamp,
-                subgroups: new Map()
-            };
-            dayMap.set(dayKey, group);
-        }
-        const period = resolveHistoryPeriod(entry.timestamp);
-        let bucket = group.subgroups.get(period.key);
-        if (!bucket) {
-            bucket = { key: period.key, label: period.label, entries: [] };
-            group.subgroups.set(period.key, bucket);
-        }
-        bucket.entries.push(entry);
-    }
-    return Array.from(dayMap.values())
-        .sort((a, b) => b.order - a.order)
-        .map(group => {
-            const subgroups = Array.from(group.subgroups.values());
-            if (subgroups.length <= 1) {
-                const entriesList = subgroups.length ? subgroups[0].entries : [];
-                return { key: group.key, label: group.label, entries: entriesList, subgroups: [] };
-            }
-            return { key: group.key, label: group.label, entries: [], subgroups };
-        });
-}
-
-function renderHistoryGroup(group) {
-    const content = group.subgroups.length ? group.subgroups.map(renderHistorySubgroup).join("") : `<div class="history-entries">${group.entries.map(renderHistoryEntry).join("")}</div>`;
-    return `<section class="history-group" data-history-group="${escapeHtml(group.key)}">
-    <div class="history-group-label">${escapeHtml(group.label)}</div>
-    ${content}
-  </section>`;
-}
-
-function renderHistorySubgroup(subgroup) {
-    return `<div class="history-subgroup" data-history-period="${escapeHtml(subgroup.key)}">
-    <div class="history-subgroup-label">${escapeHtml(subgroup.label)}</div>
-    <div class="history-entries">
-      ${subgroup.entries.map(renderHistoryEntry).join("")}
-    </div>
-  </div>`;
+function renderHistoryRow(row) {
+    if (row.kind === "day") {
+        return `<div class="history-row history-row-day${row.first ? " is-first" : ""}"><div class="history-group-label">${escapeHtml(row.label)}</div></div>`;
+    }
+    if (row.kind === "period") {
+        return `<div class="history-row history-row-period"><div class="history-subgroup-label">${escapeHtml(row.label)}</div></div>`;
+    }
+    return `<div class="history-row history-row-after-${row.after}">${renderHistoryEntry(row.entry)}</div>`;
 }
 
 function renderHistoryEntry(entry) {
     const modeLabel = describeHistoryMode(entry);
-    const names = formatHistoryNames(entry);
+    const names = renderHistoryNames(entry);
     const meta = buildHistoryEntryMeta(entry);
     const metaMarkup = `<div class="history-entry-meta">${meta.join("")}</div>`;
     const noteMarkup = entry.note ? `<div class="history-entry-note">${escapeHtml(entry.note)}</div>` : "";
@@ -965,7 +1076,7 @@ function renderHistoryEntry(entry) {
     <div class="history-entry-header">
       <div class="history-entry-title">
         <div class="history-entry-mode">${escapeHtml(modeLabel)}</div>
-        <div class="history-entry-names">${escapeHtml(names)}</div>
+        ${names}
       </div>
     </div>
     ${metaMarkup}
@@ -1003,6 +1114,18 @@ function describeHistoryMode(entry) {
     }
 }
 
+// Names wrapped the way wrapHistoryEntryNames leaves them, so patching a
+// rendered entry does not undo the wrapping.
+function renderHistoryNames(entry) {
+    const students = Array.isArray(entry.students) ? entry.students : [];
+    const names = students.map(student => (student && student.name ? student.name : "")).filter(Boolean);
+    if (!names.length) {
+        return '<div class="history-entry-names">--</div>';
+    }
+    const items = names.map(name => `<span class="history-name-item" style="cursor: pointer;">${escapeHtml(name)}</span>`);
+    return `<div class="history-entry-names" data-wrapped="true">${items.join("、")}</div>`;
+}
+
 function formatHistoryNames(entry) {
     const students = Array.isArray(entry.students) ? entry.students : [];
     const names = students.map(student => (student && student.name ? student.name : "")).filter(Boolean);
@@ -1032,45 +1155,6 @@ function buildHistoryEntryMeta(entry) {
     return meta;
 }
 
-function buildHistoryDayKey(timestamp) {
-    const date = new Date(timestamp * 1000);
-    const month = String(date.getMonth() + 1).padStart(2, "0");
-    const day = String(date.getDate()).padStart(2, "0");
-    return `${date.getFullYear()}-${month}-${day}`;
-}
-
-function formatHistoryDayLabel(timestamp) {
-    const target = new Date(timestamp * 1000);
-    const diff = Math.round((startOfDay(new Date()) - startOfDay(target)) / 86400000);
-    if (diff === 0) {
-        return "今天";
-    }
-    if (diff === 1) {
-        return "昨天";
-    }
-    if (diff === 2) {
-        return "前天";
-    }
-    const month = target.getMonth() + 1;
-    const day = target.getDate();
-    const weekday = WEEKDAY_LABELS[target.getDay()];
-    return `${month}月${day}日 ${weekday}`;
-}
-
-function resolveHistoryPeriod(timestamp) {
-    const hour = new Date(timestamp * 1000).getHours();
-    if (hour < 6) {
-        return { key: "dawn", label: "清晨" };
-    }
-    if (hour < 12) {
-        return { key: "morning", label: "上午" };
-    }
-    if (hour < 18) {
-        return { key: "afternoon", label: "下午" };
-    }
-    return { key: "evening", label: "晚间" };
-}
-
 function getHistoryEntryById(entryId) {
     if (!entryId) {
         return null;
@@ -1092,8 +1176,8 @@ function highlightHistoryEntry() {
     if (!state.historyHighlightId || !dom.historyList) {
         return;
     }
-    const selector = `[data-entry-id="${escapeCssIdentifier(state.historyHighlightId)}"]`;
-    const element = dom.historyList.querySelector(selector);
+    const row = listViews.history ? listViews.history.reveal(`entry:${state.historyHighlightId}`) : null;
+    const element = row ? row.querySelector("[data-entry-id]") : null;
     if (element) {
         element.classList.add("is-highlight");
         const isInSidebar = window.innerWidth >= 1200;
@@ -1127,7 +1211,7 @@ function renderCooldownItem(student) {
 function renderSelection() {
     if (!state.lastSelection) {
         setResultNamePlaceholder();
-        dom.resultNote.textContent = "等待抽取";
+        patchText(dom.resultNote, "等待抽取");
         return;
     }
     const selection = state.lastSelection;
@@ -1138,7 +1222,7 @@ function renderSelection() {
         const names = students.map(student => student.name).filter(Boolean);
         setResultNameNames(names);
         const count = selection.studentIds ? selection.studentIds.length : names.length;
-        dom.resultNote.textContent = count ? `抽取多人 · 共 ${count} 人` : "抽取多人";
+        patchText(dom.resultNote, count ? `抽取多人 · 共 ${count} 人` : "抽取多人");
         return;
     }
     if (mode === DRAW_MODES.GROUP) {
@@ -1146,11 +1230,11 @@ function renderSelection() {
         setResultNameNames(names);
         const groupValue = toFiniteNumber(selection.group);
         if (names.length) {
-            dom.resultNote.textContent = groupValue !== null ? `第 ${groupValue} 组` : "小组抽取";
+            patchText(dom.resultNote, groupValue !== null ? `第 ${groupValue} 组` : "小组抽取");
         } else if (groupValue !== null) {
-            dom.resultNote.textContent = `第 ${groupValue} 组 · 成员待载入`;
+            patchText(dom.resultNote, `第 ${groupValue} 组 · 成员待载入`);
         } else {
-            dom.resultNote.textContent = "小组抽取";
+            patchText(dom.resultNote, "小组抽取");
         }
         return;
     }
@@ -1158,11 +1242,11 @@ function renderSelection() {
     if (student) {
         setResultNameText(student.name || "--");
         const groupValue = toFiniteNumber(student.group ?? selection.group);
-        dom.resultNote.textContent = groupValue !== null ? `来自第 ${groupValue} 组` : "抽取一人";
+        patchText(dom.resultNote, groupValue !== null ? `来自第 ${groupValue} 组` : "抽取一人");
         return;
     }
     setResultNamePlaceholder();
-    dom.resultNote.textContent = "抽取一人";
+    patchText(dom.resultNote, "抽取一人");
     return;
 }
 
@@ -1182,6 +1266,9 @@ function updateControls() {
     if (dom.batchCount) {
         dom.batchCount.disabled = disabled || state.pickMode !== DRAW_MODES.BATCH;
     }
+    if (dom.roundCount) {
+        dom.roundCount.disabled = disabled;
+    }
     dom.clearCooldown.disabled = disabled;
     dom.addStudent.disabled = disabled;
     dom.cooldownDisplay.disabled = disabled;
@@ -1203,6 +1290,59 @@ function updateControls() {
     }
 }
 
+function searchStudents(keyword) {
+    const results = state.searchResults;
+    if (results && results.query === keyword && results.classId === state.currentClassId) {
+        return results.ids.map(id => state.studentsMap.get(id)).filter(Boolean);
+    }
+    return state.students.filter(student => matchesKeyword(student, keyword));
+}
+
+function scheduleServerSearch() {
+    clearTimeout(serverSearchTimer);
+    const keyword = state.search.trim();
+    if (!keyword || state.students.length <= SERVER_SEARCH_THRESHOLD || !sessionStore.uuid) {
+        state.searchResults = null;
+        return;
+    }
+    serverSearchTimer = setTimeout(() => {
+        runServerSearch(keyword);
+    }, SERVER_SEARCH_DELAY);
+}
+
+async function runServerSearch(keyword) {
+    const classId = state.currentClassId;
+    const ids = [];
+    // Results come back a page at a time; each page is shown as it arrives
+    // and the virtual list keeps long result sets cheap to render.
+    for (let total = Infinity; ids.length < total;) {
+        const params = new URLSearchParams({
+            uuid: sessionStore.uuid,
+            class_id: classId,
+            q: keyword,
+            offset: String(ids.length),
+            limit: String(SERVER_SEARCH_LIMIT)
+        });
+        let data;
+        try {
+            const response = await fetch(`/students/search?${params}`);
+            if (!response.ok) {
+                return;
+            }
+            data = await response.json();
+        } catch {
+            return;
+        }
+        if (state.search.trim() !== keyword || state.currentClassId !== classId) {
+            return;
+        }
+        data.students.forEach(student => ids.push(student.id));
+        state.searchResults = { query: keyword, classId, ids: ids.slice() };
+        renderLists();
+        total = data.students.length ? data.total : ids.length;
+    }
+}
+
 function matchesKeyword(student, rawKeyword) {
     const keyword = rawKeyword.trim();
     if (!keyword) {
@@ -1613,7 +1753,7 @@ async function handleClassSwitchRequest(classId) {
     setBusy(true);
     try {
         const response = await sendAction(ACTIONS.CLASS_SWITCH, { class_id: classId });
-        applyServerState(response);
+        await applyServerState(response);
         requestRender();
         closeModal();
         showToast(`已切换至 ${state.currentClassName}`, "success");
@@ -1650,7 +1790,7 @@ async function handleClassDeleteRequest(classId) {
     setBusy(true);
     try {
         const response = await sendAction(ACTIONS.CLASS_DELETE, { class_id: classId });
-        applyServerState(response);
+        await applyServerState(response);
         requestRender();
         showToast("班级已删除", "success");
     } catch (error) {
@@ -1748,7 +1888,7 @@ async function handleClassAddSubmit(event) {
     setBusy(true);
     try {
         const response = await sendAction(ACTIONS.CLASS_CREATE, { name });
-        applyServerState(response);
+        await applyServerState(response);
         requestRender();
         showToast("班级已添加", "success");
         closeModal();
@@ -1769,7 +1909,7 @@ async function submitClassReorder(order) {
     setBusy(true);
     try {
         const response = await sendAction(ACTIONS.CLASS_REORDER, { order });
-        applyServerState(response);
+        await applyServerState(response);
         requestRender();
         showToast("班级排序已更新", "success");
     } catch (error) {
@@ -1818,7 +1958,7 @@ async function handleCooldownSave(value) {
     setBusy(true);
     try {
         const response = await sendAction(ACTIONS.SET_COOLDOWN, { days: target });
-        applyServerState(response);
+        await applyServerState(response);
         requestRender();
         showToast("冷却时间已更新", "success");
         closeModal();
@@ -1851,7 +1991,7 @@ async function handleClearCooldown() {
     setBusy(true);
     try {
         const response = await sendAction(ACTIONS.CLEAR_COOLDOWN);
-        applyServerState(response);
+        await applyServerState(response);
         requestRender();
         showToast("冷却列表已清空", "success");
     } catch (error) {
@@ -2022,7 +2162,7 @@ async function runSimpleAction(action, payload, message) {
     setBusy(true);
     try {
         const response = await sendAction(action, payload);
-        applyServerState(response);
+        await applyServerState(response);
         requestRender();
         if (message) {
             showToast(message, "success");
@@ -2188,7 +2328,7 @@ async function submitHistoryNote(entryId, note) {
     setBusy(true);
     try {
         const response = await sendAction(ACTIONS.HISTORY_NOTE, { entry_id: entryId, note });
-        applyServerState(response);
+        await applyServerState(response);
         state.historyHighlightId = entryId;
         requestRender();
         closeModal();
@@ -2220,7 +2360,7 @@ async function handleHistoryDelete(entry) {
     setBusy(true);
     try {
         const response = await sendAction(ACTIONS.HISTORY_DELETE, { entry_id: entry.id });
-        applyServerState(response);
+        await applyServerState(response);
         requestRender();
         showToast("已删除历史记录", "success");
     } catch (error) {
@@ -2719,7 +2859,7 @@ async function handleHistoryClear(studentId) {
     setBusy(true);
     try {
         const response = await sendAction(ACTIONS.STUDENT_HISTORY_CLEAR, { student_id: studentId });
-        applyServerState(response);
+        await applyServerState(response);
         requestRender();
         showToast("已清空历史记录", "success");
     } catch (error) {
@@ -2739,7 +2879,7 @@ async function handleHistoryRemove(studentId, timestamp) {
     setBusy(true);
     try {
         const response = await sendAction(ACTIONS.STUDENT_HISTORY_REMOVE, { student_id: studentId, timestamp });
-        applyServerState(response);
+        await applyServerState(response);
         requestRender();
         showToast("已删除记录", "success");
     } catch (error) {
@@ -3048,7 +3188,7 @@ async function submitStudentCreate(payload) {
     setBusy(true);
     try {
         const response = await sendAction(ACTIONS.STUDENT_CREATE, payload);
-        applyServerState(response);
+        await applyServerState(response);
         requestRender();
         showToast("已添加学生", "success");
         closeModal();
@@ -3068,7 +3208,7 @@ async function submitStudentUpdate(payload) {
     setBusy(true);
     try {
         const response = await sendAction(ACTIONS.STUDENT_UPDATE, payload);
-        applyServerState(response);
+        await applyServerState(response);
         requestRender();
         showToast("已保存修改", "success");
         closeModal();
@@ -3091,7 +3231,7 @@ async function handleStudentDelete(student) {
     setBusy(true);
     try {
         const response = await sendAction(ACTIONS.STUDENT_DELETE, { student_id: student.id });
-        applyServerState(response);
+        await applyServerState(response);
         requestRender();
         showToast("已删除学生", "success");
         closeModal();
@@ -3112,18 +3252,29 @@ async function handleRandom(mode, extra = {}) {
         return;
     }
     closeContextMenu();
+    const rounds = readRoundCount();
+    if (rounds === null) {
+        return;
+    }
     const normalizedMode = normalizeDrawMode(mode);
     setBusy(true);
     try {
         const response = await sendAction(ACTIONS.RANDOM_PICK, {
             mode: normalizedMode,
             ignore_cooldown: state.ignoreCooldown,
+            ...(rounds > 1 ? { rounds } : {}),
             ...extra,
         });
         const result = response && typeof response === "object" ? response.result : null;
         const historyEntryId = result && result.history_entry_id ? String(result.history_entry_id) : "";
-        await runSelectionAnimation(result);
-        applyServerState(response);
+        // The new state is prepared while the draw animates.
+        const prepared = prepareServerState(response);
+        if (result && Array.isArray(result.rounds)) {
+            await runRoundsAnimation(result);
+        } else {
+            await runSelectionAnimation(result);
+        }
+        commitServerState(await prepared);
         if (historyEntryId) {
             state.historyHighlightId = historyEntryId;
         }
@@ -3141,6 +3292,40 @@ async function handleRandom(mode, extra = {}) {
     }
 }
 
+const ROUND_REVEAL_PAUSE = 900;
+const MAX_ROUNDS = 50;
+
+// The number of rounds to draw, or null after warning about a bad value.
+function readRoundCount() {
+    if (!dom.roundCount) {
+        return 1;
+    }
+    const raw = Number(dom.roundCount.value || 1);
+    if (!Number.isFinite(raw) || raw < 1 || raw > MAX_ROUNDS) {
+        showToast(`请输入正确的抽取轮数（1-${MAX_ROUNDS}）`, "warning");
+        dom.roundCount.focus();
+        dom.roundCount.select();
+        return null;
+    }
+    const rounds = Math.floor(raw);
+    dom.roundCount.value = String(rounds);
+    return rounds;
+}
+
+async function runRoundsAnimation(result) {
+    const rounds = result.rounds;
+    for (let index = 0; index < rounds.length; index += 1) {
+        if (index > 0) {
+            await new Promise(resolve => setTimeout(resolve, ROUND_REVEAL_PAUSE));
+        }
+        await runSelectionAnimation(rounds[index]);
+    }
+    const requested = Number(result.requested_rounds);
+    if (Number.isFinite(requested) && rounds.length < requested) {
+        showToast(`可抽取人数不足，仅完成 ${rounds.length} 轮`, "warning");
+    }
+}
+
 function buildAnimationSequence(pool, finalIds) {
     const base = Array.from(new Set([...pool.filter(Boolean), ...finalIds]));
     if (!base.length) {
@@ -3347,7 +3532,7 @@ async function submitImportPayload(payload) {
         throw new Error(message);
     }
     if (body) {
-        applyServerState(body);
+        await applyServerState(body);
     }
 }
 
@@ -3599,26 +3784,6 @@ function syncSelection() {
     }
 }
 
-function getSortedStudents(students) {
-    const list = students.slice();
-    list.sort((a, b) => {
-        const count = b.pick_count - a.pick_count;
-        if (count !== 0) {
-            return count;
-        }
-        const groupDiff = a.group - b.group;
-        if (groupDiff !== 0) {
-            return groupDiff;
-        }
-        const nameDiff = a.name.localeCompare(b.name, "zh-CN");
-        if (nameDiff !== 0) {
-            return nameDiff;
-        }
-        return a.id.localeCompare(b.id, "zh-CN");
-    });
-    return list;
-}
-
 async function sendAction(action, data, options = {}) {
     const payload = { action, ...(data || {}) };
     if (sessionStore.uuid) {
@@ -3686,85 +3851,6 @@ function isAbortError(error) {
     return !!(error && error.name === "AbortError");
 }
 
-function convertUnifiedToLegacy(source) {
-    if (!source || typeof source !== "object") {
-        return {};
-    }
-    if (Array.isArray(source.classes)) {
-        return source;
-    }
-    const classesSource = source.classes && typeof source.classes === "object" ? source.classes : {};
-    const runtime = source.runtime && typeof source.runtime === "object" ? source.runtime : {};
-    const classes = [];
-    const classesData = {};
-    const nowSeconds = Date.now() / 1000;
-    let orderCursor = 0;
-    for (const [classId, entry] of Object.entries(classesSource)) {
-        if (!classId || !entry || typeof entry !== "object") {
-            continue;
-        }
-        const meta = entry.meta && typeof entry.meta === "object" ? entry.meta : {};
-        const algorithm = entry.algorithm_data && typeof entry.algorithm_data === "object" ? entry.algorithm_data : {};
-        const studentSource = entry.students && typeof entry.students === "object" ? entry.students : {};
-        const students = [];
-        for (const [studentId, studentEntry] of Object.entries(studentSource)) {
-            if (!studentId || !studentEntry || typeof studentEntry !== "object") {
-                continue;
-            }
-            const history = Array.isArray(studentEntry.pick_history) ? studentEntry.pick_history.map(Number).filter(value => Number.isFinite(value)) : [];
-            const lastFromHistory = history.length ? history[history.length - 1] : 0;
-            students.push({
-                id: String(studentId),
-                name: String(studentEntry.name || ""),
-                group: Number(studentEntry.group) || 0,
-                last_pick: Number(studentEntry.last_picked_at ?? studentEntry.last_pick ?? lastFromHistory) || 0,
-                pick_count: Number(studentEntry.total_picked_count ?? studentEntry.pick_count ?? history.length) || history.length,
-                pick_history: history,
-                cooldown_started_at: Number(studentEntry.cooldown_started_at ?? 0) || 0,
-                cooldown_expires_at: Number(studentEntry.cooldown_expires_at ?? 0) || 0,
-            });
-        }
-        const cooldownDays = Number(algorithm.cooldown_days ?? meta.cooldown_days ?? meta.cooldown_duration ?? 3);
-        classesData[classId] = {
-            cooldown_days: Math.max(1, Number.isFinite(cooldownDays) ? cooldownDays : 3),
-            students,
-            history: algorithm.history && typeof algorithm.history === "object" ? algorithm.history : { entries: [] },
-            generated_at: nowSeconds,
-        };
-        const order = Number(meta.order);
-        classes.push({
-            id: classId,
-            name: String(meta.name || DEFAULT_CLASS_NAME),
-            order: Number.isFinite(order) ? order : orderCursor,
-            student_count: students.length,
-            cooldown_days: classesData[classId].cooldown_days,
-            created_at: Number(meta.created_at) || 0,
-            updated_at: Number(meta.updated_at) || 0,
-            last_used_at: Number(meta.last_used_at) || 0,
-        });
-        orderCursor += 1;
-    }
-    classes.sort((a, b) => a.order - b.order);
-    const currentId = runtime.active_class_id && classes.some(item => item.id === runtime.active_class_id)
-        ? runtime.active_class_id
-        : (classes[0] ? classes[0].id : "");
-    const currentMeta = classes.find(item => item.id === currentId) || classes[0] || null;
-    const currentPayload = currentMeta
-        ? classesData[currentMeta.id]
-        : { cooldown_days: 3, students: [], history: { entries: [] }, generated_at: nowSeconds };
-    return {
-        version: Number(source.version) || 0,
-        current_class_id: currentMeta ? currentMeta.id : "",
-        current_class: {
-            id: currentMeta ? currentMeta.id : "",
-            name: currentMeta ? currentMeta.name : DEFAULT_CLASS_NAME,
-            payload: currentPayload,
-        },
-        classes,
-        classes_data: classesData,
-    };
-}
-
 function convertLegacyToUnified(normalized) {
     const source = normalized && typeof normalized === "object" ? normalized : {};
     const preferences = sessionStore.data && typeof sessionStore.data === "object" && sessionStore.data.preferences
@@ -3817,197 +3903,11 @@ function convertLegacyToUnified(normalized) {
             },
             students: studentsMap,
         };
-    });
-    return result;
-}
-
-function normalizeAppState(raw) {
-    const source = raw && typeof raw === "object" ? raw : {};
-    const classes = Array.isArray(source.classes) ? source.classes : [];
-    const normalizedClasses = classes.map((item, index) => normalizeClassMeta(item, index)).sort((a, b) => a.order - b.order);
-    let currentId = typeof source.current_class_id === "string" ? source.current_class_id : "";
-    if (currentId && !normalizedClasses.some(item => item.id === currentId)) {
-        currentId = "";
-    }
-    const fallbackId = currentId || (normalizedClasses.length ? normalizedClasses[0].id : "");
-    const currentClass = source.current_class && typeof source.current_class === "object" ? { ...source.current_class } : {};
-    currentClass.id = typeof currentClass.id === "string" ? currentClass.id : fallbackId;
-    currentClass.name = typeof currentClass.name === "string" && currentClass.name.trim() ? currentClass.name.trim() : "";
-    if (!currentClass.name) {
-        const metaMatch = normalizedClasses.find(item => item.id === currentClass.id);
-        currentClass.name = metaMatch ? metaMatch.name : "默认班级";
-    }
-    let payloadCandidate = currentClass.payload;
-    if (!payloadCandidate || typeof payloadCandidate !== "object") {
-        payloadCandidate = source.payload;
-    }
-    if (!payloadCandidate || typeof payloadCandidate !== "object" || (!Array.isArray(payloadCandidate.students) && !Array.isArray(source.students) && source.cooldown_days === undefined)) {
-        payloadCandidate = {};
-    }
-    if ((!Array.isArray(payloadCandidate.students) || payloadCandidate.students.length === 0) && Array.isArray(source.students)) {
-        payloadCandidate = { cooldown_days: source.cooldown_days, students: source.students, generated_at: source.generated_at };
-    }
-    currentClass.payload = payloadCandidate;
-    if (!normalizedClasses.length) {
-        const synthesizedId = currentClass.id || "default";
-        normalizedClasses.push({
-            id: synthesizedId,
-            name: currentClass.name || "默认班级",
-            order: 0,
-            student_count: Array.isArray(payloadCandidate.students) ? payloadCandidate.students.length : 0,
-            cooldown_days: Number(payloadCandidate.cooldown_days) || Number(source.cooldown_days) || 3,
-            created_at: Number(source.created_at) || 0,
-            updated_at: Number(source.updated_at) || 0,
-            last_used_at: Number(source.last_used_at) || 0
-        });
-        currentId = synthesizedId;
-        currentClass.id = synthesizedId;
-    }
-    // Extract classes_data from source, preserving classroom data for all classes
-    const classesData = {};
-    if (source.classes_data && typeof source.classes_data === "object") {
-        Object.assign(classesData, source.classes_data);
-    }
-    // Also extract data from individual class items in the classes array
-    classes.forEach(item => {
-        if (item && typeof item === "object" && item.id && item.data) {
-            if (!classesData[item.id]) {
-                classesData[item.id] = item.data;
-            }
+        if (payload.revision) {
+            result.classes[classId].revision = payload.revision;
         }
     });
-    return {
-        version: Number.isFinite(Number(source.version)) ? Number(source.version) : 0,
-        current_class_id: currentId || (normalizedClasses.length ? normalizedClasses[0].id : ""),
-        current_class: currentClass,
-        classes: normalizedClasses,
-        classes_data: classesData
-    };
-}
-
-function normalizeClassMeta(entry, index) {
-    const item = entry && typeof entry === "object" ? entry : {};
-    const id = typeof item.id === "string" && item.id.trim() ? item.id.trim() : `class-${index + 1}`;
-    const name = typeof item.name === "string" && item.name.trim() ? item.name.trim() : "默认班级";
-    const toNumber = (value, fallback = 0) => {
-        const numeric = Number(value);
-        return Number.isFinite(numeric) ? numeric : fallback;
-    };
-    return {
-        id,
-        name,
-        order: toNumber(item.order, index),
-        student_count: Math.max(0, toNumber(item.student_count, 0)),
-        cooldown_days: Math.max(1, toNumber(item.cooldown_days, 3)),
-        created_at: toNumber(item.created_at, 0),
-        updated_at: toNumber(item.updated_at, 0),
-        last_used_at: toNumber(item.last_used_at, 0)
-    };
-}
-
-function normalizePayload(raw) {
-    const source = raw && typeof raw === "object" ? raw : {};
-    const students = Array.isArray(source.students) ? source.students.map(normalizeStudent) : [];
-    const history = normalizeHistoryData(source.history);
-    return {
-        cooldown_days: Math.max(1, Number(source.cooldown_days) || 1),
-        students,
-        generated_at: Number(source.generated_at) || Date.now() / 1000,
-        history
-    };
-}
-
-function normalizeHistoryData(raw) {
-    const container = raw && typeof raw === "object" ? raw : {};
-    let entriesSource = container.entries;
-    if (!Array.isArray(entriesSource) && Array.isArray(raw)) {
-        entriesSource = raw;
-    }
-    const entries = Array.isArray(entriesSource) ? entriesSource.map(normalizeHistoryEntry).filter(entry => entry !== null) : [];
-    let updatedAt = Number(container.updated_at);
-    if (!Number.isFinite(updatedAt) || updatedAt <= 0) {
-        updatedAt = Date.now() / 1000;
-    }
-    return { entries, updated_at: updatedAt };
-}
-
-function normalizeHistoryEntry(entry) {
-    if (!entry || typeof entry !== "object") {
-        return null;
-    }
-    const id = entry.id || entry.entry_id;
-    const timestamp = Number(entry.timestamp);
-    if (!id || !Number.isFinite(timestamp) || timestamp <= 0) {
-        return null;
-    }
-    const mode = normalizeDrawMode(entry && entry.mode);
-    const students = Array.isArray(entry.students) ? entry.students.map(normalizeHistoryStudent).filter(student => student !== null) : [];
-    let group = Number(entry.group);
-    if (!Number.isFinite(group)) {
-        group = null;
-    }
-    const count = Number(entry.count);
-    const requested = Number(entry.requested_count);
-    const note = typeof entry.note === "string" ? entry.note.trim() : "";
-    return {
-        id: String(id),
-        timestamp,
-        mode,
-        students,
-        group,
-        count: Number.isFinite(count) ? count : students.length,
-        requested_count: Number.isFinite(requested) ? requested : null,
-        ignore_cooldown: Boolean(entry.ignore_cooldown),
-        note
-    };
-}
-
-function normalizeHistoryStudent(student) {
-    if (!student || typeof student !== "object") {
-        return null;
-    }
-    const id = String(student.id || student.student_id || "");
-    const name = String(student.name || "").trim();
-    let group = Number(student.group);
-    if (!Number.isFinite(group)) {
-        group = null;
-    }
-    return { id, name, group };
-}
-
-function normalizeStudent(student) {
-    const history = Array.isArray(student.pick_history) ? student.pick_history.map(value => Number(value)).filter(value => Number.isFinite(value)) : [];
-    const nowSeconds = Date.now() / 1000;
-    const rawRemaining = Number(student.remaining_cooldown);
-    const rawLastPick = Number(student.last_pick);
-    const rawPickCount = Number(student.pick_count);
-    const rawCooldownStarted = Number(student.cooldown_started_at);
-    const rawCooldownExpires = Number(student.cooldown_expires_at);
-    const cooldownStarted = Number.isFinite(rawCooldownStarted) && rawCooldownStarted > 0 ? rawCooldownStarted : 0;
-    const cooldownExpires = Number.isFinite(rawCooldownExpires) && rawCooldownExpires > 0 ? rawCooldownExpires : 0;
-    let remaining = Number.isFinite(rawRemaining) ? rawRemaining : Number.isFinite(cooldownExpires) ? Math.max(0, cooldownExpires - nowSeconds) : 0;
-    if (!Number.isFinite(remaining)) {
-        remaining = 0;
-    }
-    remaining = Math.max(0, remaining);
-    const lastPick = Number.isFinite(rawLastPick) ? rawLastPick : 0;
-    const pickCount = Number.isFinite(rawPickCount) ? rawPickCount : history.length;
-    const isCooling =
-        student.is_cooling !== undefined
-            ? Boolean(student.is_cooling)
-            : remaining > 0 || cooldownExpires > nowSeconds;
-    return {
-        id: String(student.id || ""),
-        name: String(student.name || ""),
-        group: Number(student.group) || 0,
-        last_pick: lastPick,
-        remaining_cooldown: remaining,
-        cooldown_started_at: cooldownStarted,
-        cooldown_expires_at: cooldownExpires,
-        pick_count: pickCount,
-        pick_history: history,
-        is_cooling: isCooling
-    };
+    return result;
 }
 
 function groupColor(value) {
@@ -4106,11 +4006,6 @@ function escapeCssIdentifier(value) {
     return source.replace(/[^a-zA-Z0-9_-]/g, match => `\\${match}`);
 }
 
-function startOfDay(date) {
-    const target = date instanceof Date ? date : new Date(date);
-    return new Date(target.getFullYear(), target.getMonth(), target.getDate());
-}
-
 function buildDomId(prefix, value) {
     const segment = encodeURIComponent(String(value));
     return `${prefix}-${segment}`;
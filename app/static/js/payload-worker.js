@@ -0,0 +1,13 @@
+"use strict";
+
+// Prepares server states off the page's thread; see prepareAppState.
+importScripts("payload.js");
+
+self.addEventListener("message", event => {
+    const { id, raw, historyKey } = event.data;
+    try {
+        self.postMessage({ id, prepared: prepareAppState(raw, historyKey) });
+    } catch (error) {
+        self.postMessage({ id, error: String((error && error.message) || error) });
+    }
+});
@@ -0,0 +1,482 @@
+"use strict";
+
+// Conversion and normalization of server state, and the derived history
+// rows. Nothing here touches the DOM, so the page and payload-worker.js share
+// this file.
+
+const DRAW_MODES = Object.freeze({
+    SINGLE: "single",
+    BATCH: "batch",
+    GROUP: "group",
+});
+
+const DRAW_MODE_ALIASES = {
+    [DRAW_MODES.SINGLE]: DRAW_MODES.SINGLE,
+    any: DRAW_MODES.SINGLE,
+    student: DRAW_MODES.SINGLE,
+    [DRAW_MODES.BATCH]: DRAW_MODES.BATCH,
+    [DRAW_MODES.GROUP]: DRAW_MODES.GROUP,
+};
+
+const DEFAULT_CLASS_NAME = "默认班级";
+const WEEKDAY_LABELS = ["周日", "周一", "周二", "周三", "周四", "周五", "周六"];
+
+function normalizeDrawMode(value) {
+    const key = typeof value === "string" ? value.trim().toLowerCase() : "";
+    return DRAW_MODE_ALIASES[key] || DRAW_MODES.SINGLE;
+}
+
+function convertUnifiedToLegacy(source) {
+    if (!source || typeof source !== "object") {
+        return {};
+    }
+    if (Array.isArray(source.classes)) {
+        return source;
+    }
+    const classesSource = source.classes && typeof source.classes === "object" ? source.classes : {};
+    const runtime = source.runtime && typeof source.runtime === "object" ? source.runtime : {};
+    const classes = [];
+    const classesData = {};
+    const nowSeconds = Date.now() / 1000;
+    let orderCursor = 0;
+    for (const [classId, entry] of Object.entries(classesSource)) {
+        if (!classId || !entry || typeof entry !== "object") {
+            continue;
+        }
+        const meta = entry.meta && typeof entry.meta === "object" ? entry.meta : {};
+        const algorithm = entry.algorithm_data && typeof entry.algorithm_data === "object" ? entry.algorithm_data : {};
+        const studentSource = entry.students && typeof entry.students === "object" ? entry.students : {};
+        const students = [];
+        for (const [studentId, studentEntry] of Object.entries(studentSource)) {
+            if (!studentId || !studentEntry || typeof studentEntry !== "object") {
+                continue;
+            }
+            const history = Array.isArray(studentEntry.pick_history) ? studentEntry.pick_history.map(Number).filter(value => Number.isFinite(value)) : [];
+            const lastFromHistory = history.length ? history[history.length - 1] : 0;
+            students.push({
+                id: String(studentId),
+                name: String(studentEntry.name || ""),
+                group: Number(studentEntry.group) || 0,
+                last_pick: Number(studentEntry.last_picked_at ?? studentEntry.last_pick ?? lastFromHistory) || 0,
+                pick_count: Number(studentEntry.total_picked_count ?? studentEntry.pick_count ?? history.length) || history.length,
+                pick_history: history,
+                cooldown_started_at: Number(studentEntry.cooldown_started_at ?? 0) || 0,
+                cooldown_expires_at: Number(studentEntry.cooldown_expires_at ?? 0) || 0,
+            });
+        }
+        const cooldownDays = Number(algorithm.cooldown_days ?? meta.cooldown_days ?? meta.cooldown_duration ?? 3);
+        classesData[classId] = {
+            cooldown_days: Math.max(1, Number.isFinite(cooldownDays) ? cooldownDays : 3),
+            students,
+            history: algorithm.history && typeof algorithm.history === "object" ? algorithm.history : { entries: [] },
+            stats: entry.stats && typeof entry.stats === "object" ? entry.stats : null,
+            revision: typeof entry.revision === "string" ? entry.revision : "",
+            generated_at: nowSeconds,
+        };
+        const order = Number(meta.order);
+        classes.push({
+            id: classId,
+            name: String(meta.name || DEFAULT_CLASS_NAME),
+            order: Number.isFinite(order) ? order : orderCursor,
+            student_count: students.length,
+            cooldown_days: classesData[classId].cooldown_days,
+            created_at: Number(meta.created_at) || 0,
+            updated_at: Number(meta.updated_at) || 0,
+            last_used_at: Number(meta.last_used_at) || 0,
+        });
+        orderCursor += 1;
+    }
+    classes.sort((a, b) => a.order - b.order);
+    const currentId = runtime.active_class_id && classes.some(item => item.id === runtime.active_class_id)
+        ? runtime.active_class_id
+        : (classes[0] ? classes[0].id : "");
+    const currentMeta = classes.find(item => item.id === currentId) || classes[0] || null;
+    const currentPayload = currentMeta
+        ? classesData[currentMeta.id]
+        : { cooldown_days: 3, students: [], history: { entries: [] }, generated_at: nowSeconds };
+    return {
+        version: Number(source.version) || 0,
+        current_class_id: currentMeta ? currentMeta.id : "",
+        current_class: {
+            id: currentMeta ? currentMeta.id : "",
+            name: currentMeta ? currentMeta.name : DEFAULT_CLASS_NAME,
+            payload: currentPayload,
+        },
+        classes,
+        classes_data: classesData,
+    };
+}
+
+function normalizeAppState(raw) {
+    const source = raw && typeof raw === "object" ? raw : {};
+    const classes = Array.isArray(source.classes) ? source.classes : [];
+    const normalizedClasses = classes.map((item, index) => normalizeClassMeta(item, index)).sort((a, b) => a.order - b.order);
+    let currentId = typeof source.current_class_id === "string" ? source.current_class_id : "";
+    if (currentId && !normalizedClasses.some(item => item.id === currentId)) {
+        currentId = "";
+    }
+    const fallbackId = currentId || (normalizedClasses.length ? normalizedClasses[0].id : "");
+    const currentClass = source.current_class && typeof source.current_class === "object" ? { ...source.current_class } : {};
+    currentClass.id = typeof currentClass.id === "string" ? currentClass.id : fallbackId;
+    currentClass.name = typeof currentClass.name === "string" && currentClass.name.trim() ? currentClass.name.trim() : "";
+    if (!currentClass.name) {
+        const metaMatch = normalizedClasses.find(item => item.id === currentClass.id);
+        currentClass.name = metaMatch ? metaMatch.name : "默认班级";
+    }
+    let payloadCandidate = currentClass.payload;
+    if (!payloadCandidate || typeof payloadCandidate !== "object") {
+        payloadCandidate = source.payload;
+    }
+    if (!payloadCandidate || typeof payloadCandidate !== "object" || (!Array.isArray(payloadCandidate.students) && !Array.isArray(source.students) && source.cooldown_days === undefined)) {
+        payloadCandidate = {};
+    }
+    if ((!Array.isArray(payloadCandidate.students) || payloadCandidate.students.length === 0) && Array.isArray(source.students)) {
+        payloadCandidate = { cooldown_days: source.cooldown_days, students: source.students, generated_at: source.generated_at };
+    }
+    currentClass.payload = payloadCandidate;
+    if (!normalizedClasses.length) {
+        const synthesizedId = currentClass.id || "default";
+        normalizedClasses.push({
+            id: synthesizedId,
+            name: currentClass.name || "默认班级",
+            order: 0,
+            student_count: Array.isArray(payloadCandidate.students) ? payloadCandidate.students.length : 0,
+            cooldown_days: Number(payloadCandidate.cooldown_days) || Number(source.cooldown_days) || 3,
+            created_at: Number(source.created_at) || 0,
+            updated_at: Number(source.updated_at) || 0,
+            last_used_at: Number(source.last_used_at) || 0
+        });
+        currentId = synthesizedId;
+        currentClass.id = synthesizedId;
+    }
+    // Extract classes_data from source, preserving classroom data for all classes
+    const classesData = {};
+    if (source.classes_data && typeof source.classes_data === "object") {
+        Object.assign(classesData, source.classes_data);
+    }
+    // Also extract data from individual class items in the classes array
+    classes.forEach(item => {
+        if (item && typeof item === "object" && item.id && item.data) {
+            if (!classesData[item.id]) {
+                classesData[item.id] = item.data;
+            }
+        }
+    });
+    return {
+        version: Number.isFinite(Number(source.version)) ? Number(source.version) : 0,
+        current_class_id: currentId || (normalizedClasses.length ? normalizedClasses[0].id : ""),
+        current_class: currentClass,
+        classes: normalizedClasses,
+        classes_data: classesData
+    };
+}
+
+function normalizeClassMeta(entry, index) {
+    const item = entry && typeof entry === "object" ? entry : {};
+    const id = typeof item.id === "string" && item.id.trim() ? item.id.trim() : `class-${index + 1}`;
+    const name = typeof item.name === "string" && item.name.trim() ? item.name.trim() : "默认班级";
+    const toNumber = (value, fallback = 0) => {
+        const numeric = Number(value);
+        return Number.isFinite(numeric) ? numeric : fallback;
+    };
+    return {
+        id,
+        name,
+        order: toNumber(item.order, index),
+        student_count: Math.max(0, toNumber(item.student_count, 0)),
+        cooldown_days: Math.max(1, toNumber(item.cooldown_days, 3)),
+        created_at: toNumber(item.created_at, 0),
+        updated_at: toNumber(item.updated_at, 0),
+        last_used_at: toNumber(item.last_used_at, 0)
+    };
+}
+
+function normalizePayload(raw) {
+    const source = raw && typeof raw === "object" ? raw : {};
+    const students = Array.isArray(source.students) ? source.students.map(normalizeStudent) : [];
+    const history = normalizeHistoryData(source.history);
+    return {
+        cooldown_days: Math.max(1, Number(source.cooldown_days) || 1),
+        students,
+        generated_at: Number(source.generated_at) || Date.now() / 1000,
+        stats: source.stats && typeof source.stats === "object" ? source.stats : null,
+        revision: typeof source.revision === "string" ? source.revision : "",
+        history
+    };
+}
+
+function normalizeHistoryData(raw) {
+    const container = raw && typeof raw === "object" ? raw : {};
+    let entriesSource = container.entries;
+    if (!Array.isArray(entriesSource) && Array.isArray(raw)) {
+        entriesSource = raw;
+    }
+    const entries = Array.isArray(entriesSource) ? entriesSource.map(normalizeHistoryEntry).filter(entry => entry !== null) : [];
+    let updatedAt = Number(container.updated_at);
+    if (!Number.isFinite(updatedAt) || updatedAt <= 0) {
+        updatedAt = Date.now() / 1000;
+    }
+    return { entries, updated_at: updatedAt };
+}
+
+function normalizeHistoryEntry(entry) {
+    if (!entry || typeof entry !== "object") {
+        return null;
+    }
+    const id = entry.id || entry.entry_id;
+    const timestamp = Number(entry.timestamp);
+    if (!id || !Number.isFinite(timestamp) || timestamp <= 0) {
+        return null;
+    }
+    const mode = normalizeDrawMode(entry && entry.mode);
+    const students = Array.isArray(entry.students) ? entry.students.map(normalizeHistoryStudent).filter(student => student !== null) : [];
+    let group = Number(entry.group);
+    if (!Number.isFinite(group)) {
+        group = null;
+    }
+    const count = Number(entry.count);
+    const requested = Number(entry.requested_count);
+    const note = typeof entry.note === "string" ? entry.note.trim() : "";
+    return {
+        id: String(id),
+        timestamp,
+        mode,
+        students,
+        group,
+        count: Number.isFinite(count) ? count : students.length,
+        requested_count: Number.isFinite(requested) ? requested : null,
+        ignore_cooldown: Boolean(entry.ignore_cooldown),
+        note
+    };
+}
+
+function normalizeHistoryStudent(student) {
+    if (!student || typeof student !== "object") {
+        return null;
+    }
+    const id = String(student.id || student.student_id || "");
+    const name = String(student.name || "").trim();
+    let group = Number(student.group);
+    if (!Number.isFinite(group)) {
+        group = null;
+    }
+    return { id, name, group };
+}
+
+function normalizeStudent(student) {
+    const history = Array.isArray(student.pick_history) ? student.pick_history.map(value => Number(value)).filter(value => Number.isFinite(value)) : [];
+    const nowSeconds = Date.now() / 1000;
+    const rawRemaining = Number(student.remaining_cooldown);
+    const rawLastPick = Number(student.last_pick);
+    const rawPickCount = Number(student.pick_count);
+    const rawCooldownStarted = Number(student.cooldown_started_at);
+    const rawCooldownExpires = Number(student.cooldown_expires_at);
+    const cooldownStarted = Number.isFinite(rawCooldownStarted) && rawCooldownStarted > 0 ? rawCooldownStarted : 0;
+    const cooldownExpires = Number.isFinite(rawCooldownExpires) && rawCooldownExpires > 0 ? rawCooldownExpires : 0;
+    let remaining = Number.isFinite(rawRemaining) ? rawRemaining : Number.isFinite(cooldownExpires) ? Math.max(0, cooldownExpires - nowSeconds) : 0;
+    if (!Number.isFinite(remaining)) {
+        remaining = 0;
+    }
+    remaining = Math.max(0, remaining);
+    const lastPick = Number.isFinite(rawLastPick) ? rawLastPick : 0;
+    const pickCount = Number.isFinite(rawPickCount) ? rawPickCount : history.length;
+    const isCooling =
+        student.is_cooling !== undefined
+            ? Boolean(student.is_cooling)
+            : remaining > 0 || cooldownExpires > nowSeconds;
+    return {
+        id: String(student.id || ""),
+        name: String(student.name || ""),
+        group: Number(student.group) || 0,
+        last_pick: lastPick,
+        remaining_cooldown: remaining,
+        cooldown_started_at: cooldownStarted,
+        cooldown_expires_at: cooldownExpires,
+        pick_count: pickCount,
+        pick_history: history,
+        is_cooling: isCooling
+    };
+}
+
+function getSortedStudents(students) {
+    const list = students.slice();
+    list.sort((a, b) => {
+        const count = b.pick_count - a.pick_count;
+        if (count !== 0) {
+            return count;
+        }
+        const groupDiff = a.group - b.group;
+        if (groupDiff !== 0) {
+            return groupDiff;
+        }
+        const nameDiff = a.name.localeCompare(b.name, "zh-CN");
+        if (nameDiff !== 0) {
+            return nameDiff;
+        }
+        return a.id.localeCompare(b.id, "zh-CN");
+    });
+    return list;
+}
+
+function buildHistoryGroups(entries) {
+    const sorted = entries.slice().sort((a, b) => b.timestamp - a.timestamp);
+    const dayMap = new Map();
+    for (const entry of sorted) {
+        const dayKey = buildHistoryDayKey(entry.timestamp);
+        let group = dayMap.get(dayKey);
+        if (!group) {
+            group = {
+                key: dayKey,
+                label: formatHistoryDayLabel(entry.timestamp),
+                order: entry.timestamp,
+                subgroups: new Map()
+            };
+            dayMap.set(dayKey, group);
+        }
+        const period = resolveHistoryPeriod(entry.timestamp);
+        let bucket = group.subgroups.get(period.key);
+        if (!bucket) {
+            bucket = { key: period.key, label: period.label, entries: [] };
+            group.subgroups.set(period.key, bucket);
+        }
+        bucket.entries.push(entry);
+    }
+    return Array.from(dayMap.values())
+        .sort((a, b) => b.order - a.order)
+        .map(group => {
+            const subgroups = Array.from(group.subgroups.values());
+            if (subgroups.length <= 1) {
+                const entriesList = subgroups.length ? subgroups[0].entries : [];
+                return { key: group.key, label: group.label, entries: entriesList, subgroups: [] };
+            }
+            return { key: group.key, label: group.label, entries: [], subgroups };
+        });
+}
+
+// Day labels, period labels and entries as one sequence of rows for the
+// history view. ``after`` names the kind of row an entry follows, which sets
+// the spacing above it.
+function flattenHistoryGroups(groups) {
+    const rows = [];
+    const pushEntries = (entries, after) => {
+        entries.forEach((entry, index) => {
+            rows.push({ key: `entry:${entry.id}`, kind: "entry", entry, after: index ? "entry" : after });
+        });
+    };
+    for (const group of groups) {
+        rows.push({ key: `day:${group.key}`, kind: "day", label: group.label, first: !rows.length });
+        if (!group.subgroups.length) {
+            pushEntries(group.entries, "day");
+            continue;
+        }
+        for (const subgroup of group.subgroups) {
+            rows.push({ key: `period:${group.key}:${subgroup.key}`, kind: "period", label: subgroup.label });
+            pushEntries(subgroup.entries, "period");
+        }
+    }
+    return rows;
+}
+
+function buildHistoryDayKey(timestamp) {
+    const date = new Date(timestamp * 1000);
+    const month = String(date.getMonth() + 1).padStart(2, "0");
+    const day = String(date.getDate()).padStart(2, "0");
+    return `${date.getFullYear()}-${month}-${day}`;
+}
+
+function formatHistoryDayLabel(timestamp) {
+    const target = new Date(timestamp * 1000);
+    const diff = Math.round((startOfDay(new Date()) - startOfDay(target)) / 86400000);
+    if (diff === 0) {
+        return "今天";
+    }
+    if (diff === 1) {
+        return "昨天";
+    }
+    if (diff === 2) {
+        return "前天";
+    }
+    const month = target.getMonth() + 1;
+    const day = target.getDate();
+    const weekday = WEEKDAY_LABELS[target.getDay()];
+    return `${month}月${day}日 ${weekday}`;
+}
+
+function resolveHistoryPeriod(timestamp) {
+    const hour = new Date(timestamp * 1000).getHours();
+    if (hour < 6) {
+        return { key: "dawn", label: "清晨" };
+    }
+    if (hour < 12) {
+        return { key: "morning", label: "上午" };
+    }
+    if (hour < 18) {
+        return { key: "afternoon", label: "下午" };
+    }
+    return { key: "evening", label: "晚间" };
+}
+
+function startOfDay(date) {
+    const target = date instanceof Date ? date : new Date(date);
+    return new Date(target.getFullYear(), target.getMonth(), target.getDate());
+}
+
+// Key of the history rows built from ``payload``. Besides the revision tag it
+// covers the entries themselves, everything renderHistoryRow shows, so rows
+// are never reused for a history they were not built from.
+function historyRowsKey(classId, payload) {
+    if (!payload || !payload.revision) {
+        return "";
+    }
+    const entries = payload.history && Array.isArray(payload.history.entries) ? payload.history.entries : [];
+    const day = buildHistoryDayKey(Date.now() / 1000);
+    return `${classId}:${payload.revision}:${day}:${entries.length}:${historyFingerprint(entries)}`;
+}
+
+// FNV-1a over the parts of each entry that show in the history rows.
+function historyFingerprint(entries) {
+    let hash = 0x811c9dc5;
+    const mix = text => {
+        for (let index = 0; index < text.length; index += 1) {
+            hash = Math.imul(hash ^ text.charCodeAt(index), 0x01000193);
+        }
+    };
+    for (const entry of entries) {
+        mix(`${entry.id}\u0000${entry.timestamp}\u0000${entry.mode}\u0000${entry.group}\u0000${entry.count}\u0000${entry.ignore_cooldown}\u0000${entry.note}\u0000`);
+        for (const student of entry.students) {
+            mix(`${student.id}\u0001${student.name}\u0001`);
+        }
+    }
+    return (hash >>> 0).toString(36);
+}
+
+// Everything applyAppState needs from a raw or unified state: the normalized
+// state, each class payload, and the sorted students and history rows of the
+// current class. History rows are left out when ``historyKey`` shows the
+// caller already holds them.
+function prepareAppState(raw, historyKey) {
+    const normalized = normalizeAppState(convertUnifiedToLegacy(raw));
+    const payloads = {};
+    Object.entries(normalized.classes_data || {}).forEach(([classId, payload]) => {
+        if (payload && typeof payload === "object") {
+            payloads[classId] = normalizePayload(payload);
+        }
+    });
+    const currentId = normalized.current_class_id || (normalized.classes.length ? normalized.classes[0].id : "");
+    let payload = payloads[currentId];
+    if (!payload) {
+        const rawCurrent = normalized.current_class && typeof normalized.current_class === "object" ? normalized.current_class : {};
+        payload = normalizePayload(rawCurrent.payload || {});
+    }
+    const key = historyRowsKey(currentId, payload);
+    let history = null;
+    if (!key || key !== historyKey) {
+        const entries = Array.isArray(payload.history.entries) ? payload.history.entries : [];
+        history = { key, rows: entries.length ? flattenHistoryGroups(buildHistoryGroups(entries)) : [] };
+    }
+    return {
+        normalized,
+        payloads,
+        current: { id: currentId, payload, students: getSortedStudents(payload.students), history }
+    };
+}
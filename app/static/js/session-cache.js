@@ -0,0 +1,189 @@
+"use strict";
+
+// Client copy of the session data in IndexedDB. Each class's students and
+// algorithm data are one record, keyed by the server's revision tag for the
+// class, so saving after a draw rewrites only the class that changed. Class metadata,
+// preferences and the runtime state are small and go in one session record.
+// Records are gzipped when the browser has CompressionStream. Saves are
+// debounced and run off the response path; nothing here blocks rendering.
+const sessionCache = (() => {
+    const DB_NAME = "pickme";
+    const DB_VERSION = 1;
+    const SESSIONS = "sessions";
+    const CLASSES = "classes";
+    // Bumped when the layout of the records changes; older caches are ignored.
+    const FORMAT = 2;
+    const SAVE_DELAY = 800;
+
+    let database = null;
+    let saveTimer = 0;
+    let queued = null;
+    let writing = Promise.resolve();
+    // Revision tag of each class record as last read or written, by owner and id.
+    const stored = new Map();
+
+    function settle(request) {
+        return new Promise((resolve, reject) => {
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    function completion(transaction) {
+        return new Promise((resolve, reject) => {
+            transaction.oncomplete = () => resolve();
+            transaction.onerror = () => reject(transaction.error);
+            transaction.onabort = () => reject(transaction.error || new Error("Transaction aborted"));
+        });
+    }
+
+    function open() {
+        if (!database) {
+            database = new Promise((resolve, reject) => {
+                if (typeof indexedDB === "undefined") {
+                    reject(new Error("IndexedDB is not available"));
+                    return;
+                }
+                const request = indexedDB.open(DB_NAME, DB_VERSION);
+                request.onupgradeneeded = () => {
+                    const db = request.result;
+                    db.createObjectStore(SESSIONS, { keyPath: "owner" });
+                    db.createObjectStore(CLASSES, { keyPath: ["owner", "id"] }).createIndex("owner", "owner");
+                };
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => reject(request.error);
+            });
+        }
+        return database;
+    }
+
+    async function encode(body) {
+        const text = JSON.stringify(body);
+        if (typeof CompressionStream !== "function") {
+            return { encoding: "json", body: text };
+        }
+        const stream = new Blob([text]).stream().pipeThrough(new CompressionStream("gzip"));
+        return { encoding: "gzip", body: await new Response(stream).arrayBuffer() };
+    }
+
+    async function decode(record) {
+        if (record.encoding === "json") {
+            return JSON.parse(record.body);
+        }
+        if (record.encoding !== "gzip" || typeof DecompressionStream !== "function") {
+            return null;
+        }
+        const stream = new Blob([record.body]).stream().pipeThrough(new DecompressionStream("gzip"));
+        return JSON.parse(await new Response(stream).text());
+    }
+
+    async function read(owner) {
+        const db = await open();
+        const transaction = db.transaction([SESSIONS, CLASSES], "readonly");
+        const [session, records] = await Promise.all([
+            settle(transaction.objectStore(SESSIONS).get(owner)),
+            settle(transaction.objectStore(CLASSES).index("owner").getAll(owner)),
+        ]);
+        if (!session || session.format !== FORMAT) {
+            return null;
+        }
+        const byId = new Map(records.map(record => [record.id, record]));
+        const classes = {};
+        for (const [id, meta] of session.classes) {
+            const record = byId.get(id);
+            const body = record ? await decode(record) : null;
+            if (!body) {
+                return null;
+            }
+            classes[id] = { meta, ...body, revision: record.revision };
+        }
+        for (const record of records) {
+            stored.set(`${owner}\n${record.id}`, record.revision);
+        }
+        return { ...session.state, classes };
+    }
+
+    async function write(owner, data) {
+        const source = data.classes && typeof data.classes === "object" ? data.classes : {};
+        const { classes: _classes, ...state } = data;
+        const classes = [];
+        const changed = [];
+        for (const [id, entry] of Object.entries(source)) {
+            if (!entry || typeof entry !== "object") {
+                continue;
+            }
+            // Stats are relative to the time they were computed; they are
+            // left out and come back with the next server response.
+            const { meta, revision, stats: _stats, ...body } = entry;
+            classes.push([id, meta || {}]);
+            // Tags name one state of one loaded class, so an unchanged tag
+            // means the stored record is current and the class is not
+            // serialized at all.
+            const tag = typeof revision === "string" ? revision : "";
+            if (tag && stored.get(`${owner}\n${id}`) === tag) {
+                continue;
+            }
+            changed.push({ owner, id, revision: tag, ...(await encode(body)) });
+        }
+        const kept = new Set(classes.map(([id]) => id));
+        const db = await open();
+        const transaction = db.transaction([SESSIONS, CLASSES], "readwrite");
+        const done = completion(transaction);
+        const records = transaction.objectStore(CLASSES);
+        transaction.objectStore(SESSIONS).put({ owner, format: FORMAT, saved_at: Date.now() / 1000, classes, state });
+        changed.forEach(record => records.put(record));
+        const removed = [];
+        const cursorRequest = records.index("owner").openKeyCursor(IDBKeyRange.only(owner));
+        cursorRequest.onsuccess = () => {
+            const cursor = cursorRequest.result;
+            if (!cursor) {
+                return;
+            }
+            const id = cursor.primaryKey[1];
+            if (!kept.has(id)) {
+                records.delete(cursor.primaryKey);
+                removed.push(id);
+            }
+            cursor.continue();
+        };
+        await done;
+        changed.forEach(record => stored.set(`${owner}\n${record.id}`, record.revision));
+        removed.forEach(id => stored.delete(`${owner}\n${id}`));
+    }
+
+    return {
+        // The cached session data of ``owner``, or null when there is none
+        // or it cannot be read.
+        async load(owner) {
+            try {
+                return await read(owner);
+            } catch (error) {
+                console.warn("Failed to read cached session data", error);
+                return null;
+            }
+        },
+        save(owner, data) {
+            queued = { owner, data };
+            if (!saveTimer) {
+                saveTimer = setTimeout(() => {
+                    saveTimer = 0;
+                    this.flush();
+                }, SAVE_DELAY);
+            }
+        },
+        flush() {
+            if (saveTimer) {
+                clearTimeout(saveTimer);
+                saveTimer = 0;
+            }
+            const job = queued;
+            queued = null;
+            if (job) {
+                writing = writing
+                    .then(() => write(job.owner, job.data))
+                    .catch(error => console.warn("Failed to cache session data", error));
+            }
+            return writing;
+        },
+    };
+})();
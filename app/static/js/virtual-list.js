@@ -0,0 +1,261 @@
+"use strict";
+
+// Windowed rendering for long lists. Only the rows in view, plus an overscan
+// on either side, are in the DOM; the height of the rows above and below is
+// taken up by padding on the list element. Row heights are measured once per
+// key (and again after a resize), so rows of one kind keep a stable pitch.
+// Rendered rows are kept by key; when a row's markup changes, its element is
+// patched in place so only the nodes that differ are touched.
+class VirtualList {
+    constructor(scroller, options) {
+        this.scroller = scroller;
+        this.target = options.target || scroller;
+        this.keyOf = options.keyOf;
+        this.renderRow = options.renderRow;
+        this.emptyHtml = options.emptyHtml || "";
+        this.estimate = options.estimate || 80;
+        this.overscan = options.overscan ?? 6;
+        this.items = [];
+        this.keys = [];
+        this.heights = new Map();
+        this.measuredTotal = 0;
+        this.rows = new Map();
+        this.offsets = [0];
+        this.range = [0, 0];
+        this.frame = 0;
+        this.gap = 0;
+        this.basePadding = null;
+        this.empty = false;
+        const schedule = () => this.schedule();
+        scroller.addEventListener("scroll", schedule, { passive: true });
+        window.addEventListener("scroll", schedule, { passive: true });
+        window.addEventListener("resize", () => {
+            this.heights.clear();
+            this.measuredTotal = 0;
+            this.schedule();
+        });
+    }
+
+    setItems(items) {
+        this.items = items;
+        this.keys = items.map(this.keyOf);
+        if (!items.length) {
+            if (this.empty) {
+                return;
+            }
+            this.empty = true;
+            this.rows.clear();
+            this.range = [0, 0];
+            this.target.style.paddingTop = "";
+            this.target.style.paddingBottom = "";
+            this.target.innerHTML = this.emptyHtml;
+            return;
+        }
+        this.empty = false;
+        this.update();
+    }
+
+    schedule() {
+        if (this.frame) {
+            return;
+        }
+        this.frame = requestAnimationFrame(() => {
+            this.frame = 0;
+            if (this.items.length) {
+                this.update();
+            }
+        });
+    }
+
+    // Bring the row with ``key`` into the rendered window and return its element.
+    reveal(key) {
+        const index = this.keys.indexOf(key);
+        if (index < 0) {
+            return null;
+        }
+        if (index < this.range[0] || index >= this.range[1]) {
+            this.render(Math.max(0, index - this.overscan), Math.min(this.items.length, index + this.overscan + 1));
+        }
+        const row = this.rows.get(key);
+        return row ? row.element : null;
+    }
+
+    update() {
+        this.measureBox();
+        this.layout();
+        let [start, end] = this.visibleRange();
+        this.render(start, end);
+        // Rows measured for the first time may have moved the window.
+        if (this.measureRendered()) {
+            this.layout();
+            [start, end] = this.visibleRange();
+            this.render(start, end);
+            this.measureRendered();
+        }
+        this.applyPadding();
+    }
+
+    measureBox() {
+        if (this.basePadding) {
+            return;
+        }
+        const style = getComputedStyle(this.target);
+        this.gap = parseFloat(style.rowGap) || 0;
+        this.basePadding = [parseFloat(style.paddingTop) || 0, parseFloat(style.paddingBottom) || 0];
+    }
+
+    heightOf(index) {
+        return this.heights.get(this.keys[index]) ?? this.estimate;
+    }
+
+    layout() {
+        const count = this.items.length;
+        const offsets = new Array(count + 1);
+        offsets[0] = 0;
+        for (let index = 0; index < count; index += 1) {
+            offsets[index + 1] = offsets[index] + this.heightOf(index) + this.gap;
+        }
+        this.offsets = offsets;
+    }
+
+    visibleRange() {
+        const scrollerRect = this.scroller.getBoundingClientRect();
+        const targetTop = this.target.getBoundingClientRect().top + this.basePadding[0];
+        const top = Math.max(scrollerRect.top, 0) - targetTop;
+        const bottom = Math.min(scrollerRect.bottom, window.innerHeight) - targetTop;
+        const offsets = this.offsets;
+        const count = this.items.length;
+        let low = 0;
+        let high = count;
+        while (low < high) {
+            const middle = (low + high) >> 1;
+            if (offsets[middle + 1] <= top) {
+                low = middle + 1;
+            } else {
+                high = middle;
+            }
+        }
+        let end = low;
+        while (end < count && offsets[end] < bottom) {
+            end += 1;
+        }
+        return [Math.max(0, low - this.overscan), Math.min(count, Math.max(end, low + 1) + this.overscan)];
+    }
+
+    render(start, end) {
+        const target = this.target;
+        const keep = new Map();
+        for (let index = start; index < end; index += 1) {
+            const key = this.keys[index];
+            const html = this.renderRow(this.items[index], index);
+            const row = this.rows.get(key);
+            if (!row) {
+                keep.set(key, { element: VirtualList.build(html), html });
+                continue;
+            }
+            if (row.html !== html) {
+                row.element = VirtualList.patch(row.element, VirtualList.build(html));
+                row.html = html;
+            }
+            keep.set(key, row);
+        }
+        const wanted = new Set();
+        for (const row of keep.values()) {
+            wanted.add(row.element);
+        }
+        for (const child of Array.from(target.children)) {
+            if (!wanted.has(child)) {
+                child.remove();
+            }
+        }
+        // Rows still in the window stay where they are; new ones are
+        // inserted in order around them.
+        let cursor = target.firstElementChild;
+        for (const row of keep.values()) {
+            if (row.element === cursor) {
+                cursor = cursor.nextElementSibling;
+            } else {
+                target.insertBefore(row.element, cursor);
+            }
+        }
+        this.rows = keep;
+        this.range = [start, end];
+        this.applyPadding();
+    }
+
+    measureRendered() {
+        let changed = false;
+        const [start, end] = this.range;
+        for (let index = start; index < end; index += 1) {
+            const key = this.keys[index];
+            const row = this.rows.get(key);
+            const height = row ? row.element.offsetHeight : 0;
+            const previous = this.heights.get(key);
+            if (height && previous !== height) {
+                this.measuredTotal += height - (previous ?? 0);
+                this.heights.set(key, height);
+                changed = true;
+            }
+        }
+        if (changed) {
+            // Rows not measured yet are assumed to be of average height.
+            this.estimate = this.measuredTotal / this.heights.size;
+        }
+        return changed;
+    }
+
+    applyPadding() {
+        const [start, end] = this.range;
+        const offsets = this.offsets;
+        const last = offsets[offsets.length - 1];
+        const before = offsets[start];
+        const after = end > start ? last - offsets[end] : last;
+        this.target.style.paddingTop = `${this.basePadding[0] + before}px`;
+        this.target.style.paddingBottom = `${this.basePadding[1] + Math.max(0, after)}px`;
+    }
+
+    // Bring ``node`` in line with ``next``: attributes and text are updated
+    // where they differ and children are matched by position. A node of
+    // another type is swapped for ``next``, which is returned in its place.
+    static patch(node, next) {
+        if (node.nodeType !== next.nodeType || node.nodeName !== next.nodeName) {
+            node.replaceWith(next);
+            return next;
+        }
+        if (node.nodeType !== Node.ELEMENT_NODE) {
+            if (node.nodeValue !== next.nodeValue) {
+                node.nodeValue = next.nodeValue;
+            }
+            return node;
+        }
+        for (const { name } of Array.from(node.attributes)) {
+            if (!next.hasAttribute(name)) {
+                node.removeAttribute(name);
+            }
+        }
+        for (const { name, value } of Array.from(next.attributes)) {
+            if (node.getAttribute(name) !== value) {
+                node.setAttribute(name, value);
+            }
+        }
+        const current = Array.from(node.childNodes);
+        const wanted = Array.from(next.childNodes);
+        wanted.forEach((child, index) => {
+            if (index < current.length) {
+                VirtualList.patch(current[index], child);
+            } else {
+                node.appendChild(child);
+            }
+        });
+        for (let index = wanted.length; index < current.length; index += 1) {
+            current[index].remove();
+        }
+        return node;
+    }
+
+    static build(html) {
+        const template = document.createElement("template");
+        template.innerHTML = html.trim();
+        return template.content.firstElementChild;
+    }
+}
@@ -48,8 +48,18 @@ class UnifiedStorage:
         data.ensure_defaults()
         self._store.save(data)
 
+    def evict_user(self, user_id: str) -> None:
+        """Drop the cached copy so the next load re-reads the saved file."""
+        self._store.evict(self.normalize_user_id(user_id))
+
     def export_user(self, data: UserData) -> str:
-        return json.dumps(data.to_dict(), ensure_ascii=False, indent=2)
+        payload = self._store.export_payload(data)
+        return json.dumps(payload, ensure_ascii=False, indent=2)
+
+    def read_archive(self, user_id: str, class_id: str) -> list[dict[str, Any]]:
+        """Archived history entries of a class, oldest first."""
+        normalized = self.normalize_user_id(user_id)
+        return self._store.read_archive(normalized, class_id)
 
     def with_user(
         self,
@@ -1,8 +1,17 @@
+import bisect
 import json
 import uuid
 
 
 _SECONDS_PER_DAY = 60 * 60 * 24
+# Pick timestamps closer than this are taken to be the same pick.
+HISTORY_TOLERANCE = 1e-6
+
+
+def _stored_float(value) -> float:
+    if type(value) is float or type(value) is int:
+        return float(value)
+    raise ValueError("number_expected")
 
 
 class Student:
@@ -130,30 +139,61 @@ class Student:
         self.__last_pick = 0.0
         self.force_pickable()
 
-    def remove_history_entry(self, timestamp: float, tolerance: float = 1e-6) -> bool:
+    def trim_history(self, timestamps: list[float]) -> int:
+        """Drop one pick at each of ``timestamps``; counters are kept."""
+        removed = 0
+        for timestamp in timestamps:
+            index = self.find_history_entry(timestamp)
+            if index is not None:
+                del self.__pick_history[index]
+                removed += 1
+        return removed
+
+    def find_history_entry(
+        self, timestamp: float, tolerance: float = HISTORY_TOLERANCE
+    ) -> int | None:
+        """Position of the pick at ``timestamp`` in ``pick_history``.
+
+        Picks are appended in time order, so the history is bisected;
+        histories imported out of order fall back to a scan.
+        """
         try:
             target = float(timestamp)
         except (TypeError, ValueError):
-            return False
-        index = None
-        for position, value in enumerate(self.__pick_history):
+            return None
+        history = self.__pick_history
+        index = bisect.bisect_left(history, target - tolerance)
+        if index < len(history) and abs(history[index] - target) <= tolerance:
+            return index
+        for position, value in enumerate(history):
             if abs(value - target) <= tolerance:
-                index = position
-                break
-        if index is None:
-            return False
+                return position
+        return None
+
+    def remove_history_at(self, index: int) -> float:
+        """Remove the pick at ``index`` of ``pick_history`` and return it."""
         previous_last_pick = self.__last_pick
         removed_value = self.__pick_history.pop(index)
         if self.__pick_history:
             self.__last_pick = max(self.__pick_history)
-        else:
+        elif abs(previous_last_pick - removed_value) <= HISTORY_TOLERANCE:
             self.__last_pick = 0.0
-        self.__pick_count = len(self.__pick_history)
+        # Archived picks are no longer in the history but still counted.
+        self.__pick_count = max(len(self.__pick_history), self.__pick_count - 1)
         if (
-            abs(previous_last_pick - removed_value) <= tolerance
-            or abs(self.__cooldown_started_at - removed_value) <= tolerance
+            abs(previous_last_pick - removed_value) <= HISTORY_TOLERANCE
+            or abs(self.__cooldown_started_at - removed_value) <= HISTORY_TOLERANCE
         ):
             self.force_pickable()
+        return removed_value
+
+    def remove_history_entry(
+        self, timestamp: float, tolerance: float = HISTORY_TOLERANCE
+    ) -> bool:
+        index = self.find_history_entry(timestamp, tolerance)
+        if index is None:
+            return False
+        self.remove_history_at(index)
         return True
 
     def register_pick(self, timestamp: float, cooldown_days: int) -> None:
@@ -190,6 +230,45 @@ class Student:
             "cooldown_expires_at": self.__cooldown_expires_at,
         }
 
+    @classmethod
+    def from_stored(cls, obj: dict) -> "Student":
+        """Rebuild a student exactly as ``serialize`` wrote it.
+
+        Nothing is coerced: any field of the wrong type raises ValueError
+        so the caller can fall back to ``deserialize``.
+        """
+        try:
+            student_id = obj["id"]
+            name = obj["name"]
+            group = obj["group"]
+            pick_count = obj["pick_count"]
+            last_pick = _stored_float(obj["last_pick"])
+            pick_history = [_stored_float(value) for value in obj["pick_history"]]
+            started_at = _stored_float(obj["cooldown_started_at"])
+            expires_at = _stored_float(obj["cooldown_expires_at"])
+        except (KeyError, TypeError) as error:
+            raise ValueError("student_invalid") from error
+        if (
+            type(student_id) is not int
+            or type(name) is not str
+            or type(group) is not int
+            or type(pick_count) is not int
+            or group < 0
+            or pick_count < len(pick_history)
+            or not 0.0 <= started_at <= expires_at
+        ):
+            raise ValueError("student_invalid")
+        student = cls.__new__(cls)
+        student.__id = student_id
+        student.__name = name
+        student.__group = group
+        student.__last_pick = last_pick
+        student.__pick_count = pick_count
+        student.__pick_history = pick_history
+        student.__cooldown_started_at = started_at
+        student.__cooldown_expires_at = expires_at
+        return student
+
     @staticmethod
     def deserialize(data, default_cooldown_days: int | None = None) -> "Student":
         if isinstance(data, str):
@@ -0,0 +1,490 @@
+from __future__ import annotations
+
+import bisect
+import heapq
+import unicodedata
+from operator import itemgetter
+from typing import Callable, Iterable
+
+from .student import Student
+
+
+def name_key(name: str) -> str:
+    """Comparison key for student names.
+
+    NFKC folds full-width letters, digits and the ideographic space onto
+    their ASCII forms; runs of whitespace collapse to one space and the
+    result is casefolded.
+    """
+    normalized = unicodedata.normalize("NFKC", str(name or ""))
+    return " ".join(normalized.split()).casefold()
+
+
+class NameIndex:
+    """Maps normalized names to the ids of the students carrying them.
+
+    Rosters loaded from older files may already hold duplicates, so every
+    key keeps the full set of ids instead of a single owner.
+    """
+
+    def __init__(self) -> None:
+        self._ids: dict[str, dict[int, None]] = {}
+        self._key_of: dict[int, str] = {}
+
+    def add(self, student: Student) -> None:
+        student_id = student.student_id
+        if student_id in self._key_of:
+            self.discard(student_id)
+        key = name_key(student.name)
+        self._key_of[student_id] = key
+        self._ids.setdefault(key, {})[student_id] = None
+
+    def discard(self, student_id: int) -> None:
+        key = self._key_of.pop(student_id, None)
+        if key is None:
+            return
+        ids = self._ids.get(key)
+        if ids is not None:
+            ids.pop(student_id, None)
+            if not ids:
+                del self._ids[key]
+
+    def contains(self, name: str, exclude_id: int | None = None) -> bool:
+        ids = self._ids.get(name_key(name))
+        if not ids:
+            return False
+        return any(student_id != exclude_id for student_id in ids)
+
+
+# Range bounds on the leading element of a sort key: inclusive "min" and
+# "max", exclusive "gt" and "lt".
+RANGE_OPERATORS = ("min", "max", "gt", "lt")
+_leading = itemgetter(0)
+
+# Sort keys of the maintained student orderings. Every key ends with the
+# student id, so no two students compare equal.
+STUDENT_ORDERS: dict[str, Callable[[Student], tuple]] = {
+    "default": lambda student: (
+        -student.pick_count,
+        student.group,
+        student.name.lower(),
+        student.student_id,
+    ),
+    "group": lambda student: (
+        student.group,
+        student.name.lower(),
+        student.student_id,
+    ),
+    "pick_count": lambda student: (student.pick_count, student.student_id),
+    "last_pick": lambda student: (student.last_pick, student.student_id),
+    "cooldown": lambda student: (student.cooldown_expires_at, student.student_id),
+}
+
+
+class SortedIds:
+    """Student ids kept in the order of a sort key.
+
+    Keys are computed once per change. The sorted lists are built lazily on
+    the first read after a bulk load and then kept up to date by bisecting
+    single students in and out.
+    """
+
+    def __init__(self, key: Callable[[Student], tuple]) -> None:
+        self._key = key
+        self._key_of: dict[int, tuple] = {}
+        # Sorted keys and, position for position, their student ids.
+        self._entries: list[tuple] | None = None
+        self._ids: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self._key_of)
+
+    def key_of(self, student_id: int) -> tuple:
+        return self._key_of[student_id]
+
+    def add(self, student: Student) -> None:
+        student_id = student.student_id
+        if student_id in self._key_of:
+            self.discard(student_id)
+        key = self._key(student)
+        self._key_of[student_id] = key
+        if self._entries is not None:
+            index = bisect.bisect_left(self._entries, key)
+            self._entries.insert(index, key)
+            self._ids.insert(index, student_id)
+
+    def discard(self, student_id: int) -> None:
+        key = self._key_of.pop(student_id, None)
+        if key is None or self._entries is None:
+            return
+        index = bisect.bisect_left(self._entries, key)
+        del self._entries[index]
+        del self._ids[index]
+
+    def refresh(self, student: Student) -> None:
+        """Reposition a student whose sort key may have changed."""
+        current = self._key_of.get(student.student_id)
+        if current is None or current == self._key(student):
+            return
+        self.add(student)
+
+    def invalidate(self, students: Iterable[Student]) -> None:
+        """Recompute every key after a change to many students at once."""
+        self._key_of = {student.student_id: self._key(student) for student in students}
+        self._entries = None
+
+    def ids(self) -> list[int]:
+        """Ids in order; the list is shared and must not be modified."""
+        self._ensure_sorted()
+        return self._ids
+
+    def bounds(self, limits: dict[str, float]) -> tuple[int, int]:
+        """Slice of ``ids()`` whose leading key lies within ``limits``."""
+        entries = self._ensure_sorted()
+        start, end = 0, len(entries)
+        if "min" in limits:
+            start = max(start, bisect.bisect_left(entries, limits["min"], key=_leading))
+        if "gt" in limits:
+            start = max(start, bisect.bisect_right(entries, limits["gt"], key=_leading))
+        if "max" in limits:
+            end = min(end, bisect.bisect_right(entries, limits["max"], key=_leading))
+        if "lt" in limits:
+            end = min(end, bisect.bisect_left(entries, limits["lt"], key=_leading))
+        return start, max(start, end)
+
+    def within(self, student_id: int, limits: dict[str, float]) -> bool:
+        value = self._key_of[student_id][0]
+        return (
+            ("min" not in limits or value >= limits["min"])
+            and ("gt" not in limits or value > limits["gt"])
+            and ("max" not in limits or value <= limits["max"])
+            and ("lt" not in limits or value < limits["lt"])
+        )
+
+    def median(self) -> float | None:
+        """Median of the leading key, or None when empty."""
+        entries = self._ensure_sorted()
+        if not entries:
+            return None
+        middle = len(entries) // 2
+        if len(entries) % 2:
+            return entries[middle][0]
+        return (entries[middle - 1][0] + entries[middle][0]) / 2
+
+    def _ensure_sorted(self) -> list[tuple]:
+        if self._entries is None:
+            self._entries = sorted(self._key_of.values())
+            self._ids = [key[-1] for key in self._entries]
+        return self._entries
+
+
+class SearchIndex:
+    """Incremental search over student names, ids and groups.
+
+    Names are indexed by character bigrams of their ``name_key``, which
+    suits two- and three-character Chinese names as well as Latin ones;
+    single-character queries use a unigram table. A query's bigram postings
+    are intersected; sharing every bigram does not make the query a
+    substring, so ``search`` keeps only candidates that contain it. Ids
+    are indexed by every decimal prefix, and groups are matched by prefix
+    over the (few) distinct group numbers.
+    """
+
+    def __init__(self) -> None:
+        self._keys: dict[int, str] = {}
+        self._groups: dict[int, int] = {}
+        self._grams: dict[str, dict[int, None]] = {}
+        self._id_prefixes: dict[str, dict[int, None]] = {}
+        self._group_members: dict[int, dict[int, None]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, student: Student) -> None:
+        student_id = student.student_id
+        if student_id in self._keys:
+            self.discard(student_id)
+        key = name_key(student.name)
+        self._keys[student_id] = key
+        self._groups[student_id] = student.group
+        for gram in self._name_grams(key):
+            self._grams.setdefault(gram, {})[student_id] = None
+        for prefix in self._prefixes(str(student_id)):
+            self._id_prefixes.setdefault(prefix, {})[student_id] = None
+        self._group_members.setdefault(student.group, {})[student_id] = None
+
+    def discard(self, student_id: int) -> None:
+        key = self._keys.pop(student_id, None)
+        if key is None:
+            return
+        group = self._groups.pop(student_id)
+        for gram in self._name_grams(key):
+            self._unlink(self._grams, gram, student_id)
+        for prefix in self._prefixes(str(student_id)):
+            self._unlink(self._id_prefixes, prefix, student_id)
+        self._unlink(self._group_members, group, student_id)
+
+    def search(self, query: str) -> list[list[int]]:
+        """Ids matching ``query`` in buckets, best kind of match first.
+
+        The buckets are an exact id, exact names, name prefixes, id
+        prefixes, groups and names containing the query; names are ordered
+        shortest first and everything else by id. An id can appear in more
+        than one bucket.
+        """
+        term = name_key(query)
+        if not term:
+            return []
+        keys = self._keys
+        exact_names: list[int] = []
+        name_prefixes: list[int] = []
+        inner_names: list[int] = []
+        for student_id in self._name_candidates(term):
+            key = keys[student_id]
+            if key == term:
+                exact_names.append(student_id)
+            elif key.startswith(term):
+                name_prefixes.append(student_id)
+            elif term in key:
+                inner_names.append(student_id)
+
+        def by_length(student_id: int) -> tuple[int, int]:
+            return len(keys[student_id]), student_id
+
+        name_prefixes.sort(key=by_length)
+        inner_names.sort(key=by_length)
+        exact_id: list[int] = []
+        id_prefixes: list[int] = []
+        groups: list[int] = []
+        if term.isdigit():
+            id_prefixes = sorted(self._id_prefixes.get(term, ()))
+            if int(term) in keys and str(int(term)) == term:
+                exact_id = [int(term)]
+            for group, members in self._group_members.items():
+                if str(group).startswith(term):
+                    groups.extend(members)
+            groups.sort()
+        return [
+            exact_id,
+            sorted(exact_names),
+            name_prefixes,
+            id_prefixes,
+            groups,
+            inner_names,
+        ]
+
+    def _name_candidates(self, term: str) -> list[int]:
+        grams = self._name_grams(term) if len(term) > 1 else [term]
+        postings = [self._grams.get(gram) for gram in grams]
+        if not all(postings):
+            return []
+        postings.sort(key=len)
+        candidates = postings[0].keys()
+        for other in postings[1:]:
+            candidates &= other.keys()
+        return list(candidates)
+
+    @staticmethod
+    def _name_grams(key: str) -> set[str]:
+        grams = set(key)
+        grams.update(key[index : index + 2] for index in range(len(key) - 1))
+        return grams
+
+    @staticmethod
+    def _prefixes(text: str) -> list[str]:
+        return [text[:length] for length in range(1, len(text) + 1)]
+
+    @staticmethod
+    def _unlink(table: dict, key, student_id: int) -> None:
+        members = table.get(key)
+        if members is not None:
+            members.pop(student_id, None)
+            if not members:
+                del table[key]
+
+
+class GroupIndex:
+    """Group membership index with per-group counts of cooling members.
+
+    Cooldowns run out with time rather than through a mutation, so expiries
+    are kept in a min-heap of ``(expires_at, student_id)`` that is drained
+    lazily whenever the index is queried. The index only tracks ids; callers
+    resolve them against their own roster.
+    """
+
+    def __init__(self) -> None:
+        self._members: dict[int, dict[int, None]] = {}
+        self._group_of: dict[int, int] = {}
+        self._cooling: dict[int, float] = {}
+        self._cooling_counts: dict[int, int] = {}
+        self._expiry: list[tuple[float, int]] = []
+        self._clock = 0.0
+
+    def add(self, student: Student) -> None:
+        student_id = student.student_id
+        if student_id in self._group_of:
+            self.discard(student_id)
+        group = student.group
+        self._group_of[student_id] = group
+        self._members.setdefault(group, {})[student_id] = None
+        self.refresh(student)
+
+    def discard(self, student_id: int) -> None:
+        group = self._group_of.pop(student_id, None)
+        if group is None:
+            return
+        self._uncount(student_id, group)
+        members = self._members.get(group)
+        if members is not None:
+            members.pop(student_id, None)
+            if not members:
+                del self._members[group]
+                self._cooling_counts.pop(group, None)
+
+    def refresh(self, student: Student) -> None:
+        """Re-evaluate the cooldown of a student after it was mutated."""
+        student_id = student.student_id
+        group = self._group_of.get(student_id)
+        if group is None:
+            return
+        if group != student.group:
+            self.add(student)
+            return
+        self._uncount(student_id, group)
+        expires_at = student.cooldown_expires_at
+        if expires_at > self._clock:
+            self._cooling[student_id] = expires_at
+            self._cooling_counts[group] = self._cooling_counts.get(group, 0) + 1
+            heapq.heappush(self._expiry, (expires_at, student_id))
+            if len(self._expiry) > 2 * len(self._cooling) + 64:
+                self._compact()
+
+    def groups(self) -> list[int]:
+        return sorted(self._members)
+
+    def member_ids(self, group: int) -> list[int]:
+        return list(self._members.get(group, ()))
+
+    def cooling_count(self, group: int, current_time: float) -> int:
+        self.expire(current_time)
+        return self._cooling_counts.get(group, 0)
+
+    def group_sizes(self) -> dict[int, int]:
+        return {group: len(members) for group, members in self._members.items()}
+
+    def cooling_counts(self, current_time: float) -> dict[int, int]:
+        self.expire(current_time)
+        return dict(self._cooling_counts)
+
+    def cooling_total(self, current_time: float) -> int:
+        self.expire(current_time)
+        return len(self._cooling)
+
+    def next_expiry(self, current_time: float) -> float | None:
+        """Earliest moment a cooling student becomes pickable again."""
+        self.expire(current_time)
+        heap = self._expiry
+        while heap and self._cooling.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def eligible_groups(self, current_time: float, ignore_cooldown: bool) -> list[int]:
+        if ignore_cooldown:
+            return self.groups()
+        self.expire(current_time)
+        counts = self._cooling_counts
+        return sorted(group for group in self._members if not counts.get(group))
+
+    def expire(self, current_time: float) -> None:
+        """Release every cooldown that ends at or before ``current_time``.
+
+        The clock only moves forward; a query for an earlier moment sees the
+        state as of the latest moment already observed.
+        """
+        if current_time > self._clock:
+            self._clock = float(current_time)
+        heap = self._expiry
+        while heap and heap[0][0] <= self._clock:
+            expires_at, student_id = heapq.heappop(heap)
+            if self._cooling.get(student_id) != expires_at:
+                continue
+            group = self._group_of.get(student_id)
+            if group is not None:
+                self._uncount(student_id, group)
+
+    def _uncount(self, student_id: int, group: int) -> None:
+        if self._cooling.pop(student_id, None) is None:
+            return
+        remaining = self._cooling_counts.get(group, 0) - 1
+        if remaining > 0:
+            self._cooling_counts[group] = remaining
+        else:
+            self._cooling_counts.pop(group, None)
+
+    def _compact(self) -> None:
+        self._expiry = [
+            (expires_at, student_id)
+            for student_id, expires_at in self._cooling.items()
+        ]
+        heapq.heapify(self._expiry)
+
+
+class RosterStats:
+    """Running totals over a roster: a histogram of pick counts, the sum of
+    all picks and draws per mode.
+
+    Every change adjusts the totals by the difference it makes, so reading
+    them never walks the roster.
+    """
+
+    def __init__(self) -> None:
+        self._pick_count_of: dict[int, int] = {}
+        self._histogram: dict[int, int] = {}
+        self._total_picks = 0
+        self._modes: dict[str, int] = {}
+
+    def add(self, student: Student) -> None:
+        student_id = student.student_id
+        if student_id in self._pick_count_of:
+            self.discard(student_id)
+        count = student.pick_count
+        self._pick_count_of[student_id] = count
+        self._histogram[count] = self._histogram.get(count, 0) + 1
+        self._total_picks += count
+
+    def discard(self, student_id: int) -> None:
+        count = self._pick_count_of.pop(student_id, None)
+        if count is None:
+            return
+        self._total_picks -= count
+        remaining = self._histogram[count] - 1
+        if remaining:
+            self._histogram[count] = remaining
+        else:
+            del self._histogram[count]
+
+    def refresh(self, student: Student) -> None:
+        current = self._pick_count_of.get(student.student_id)
+        if current is not None and current != student.pick_count:
+            self.add(student)
+
+    def count_modes(self, modes: dict[str, int], sign: int = 1) -> None:
+        for mode, count in modes.items():
+            remaining = self._modes.get(mode, 0) + sign * count
+            if remaining > 0:
+                self._modes[mode] = remaining
+            else:
+                self._modes.pop(mode, None)
+
+    def reset_modes(self) -> None:
+        self._modes = {}
+
+    @property
+    def total_picks(self) -> int:
+        return self._total_picks
+
+    def histogram(self) -> dict[int, int]:
+        return dict(sorted(self._histogram.items()))
+
+    def modes(self) -> dict[str, int]:
+        return dict(self._modes)
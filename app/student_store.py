@@ -0,0 +1,272 @@
+"""Student storage backends used by ``StudentsCms``.
+
+``DictStudentStore`` keeps one ``Student`` object per student and suits
+ordinary classrooms. ``ColumnarStudentStore`` keeps school-wide rosters as
+typed columns (struct of arrays) and hands out ``StudentView`` handles that
+behave like ``Student`` objects.
+"""
+
+from __future__ import annotations
+
+from array import array
+from typing import Iterable, Iterator
+
+from .student import Student
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is an optional extra
+    np = None
+
+# Rosters at least this large are loaded into the columnar store.
+COLUMNAR_THRESHOLD = 2000
+
+
+class DictStudentStore:
+    def __init__(self) -> None:
+        self._students: dict[int, Student] = {}
+
+    def add(self, student: Student) -> Student:
+        self._students[student.student_id] = student
+        return student
+
+    def pop(self, student_id: int) -> Student | None:
+        return self._students.pop(student_id, None)
+
+    def get(self, student_id: int) -> Student | None:
+        return self._students.get(student_id)
+
+    def __getitem__(self, student_id: int) -> Student:
+        return self._students[student_id]
+
+    def take(self, student_ids: Iterable[int]) -> list[Student]:
+        students = self._students
+        return [students[student_id] for student_id in student_ids]
+
+    def rekey(self, old_id: int, new_id: int) -> Student:
+        student = self._students.pop(old_id)
+        student.set_student_id(new_id)
+        self._students[new_id] = student
+        return student
+
+    def eligible(self, current_time: float, ignore_cooldown: bool) -> list[Student]:
+        if ignore_cooldown:
+            return list(self._students.values())
+        return [
+            student
+            for student in self._students.values()
+            if current_time >= student.cooldown_expires_at
+        ]
+
+    def values(self) -> Iterator[Student]:
+        return iter(self._students.values())
+
+    def __contains__(self, student_id: object) -> bool:
+        return student_id in self._students
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._students)
+
+    def __len__(self) -> int:
+        return len(self._students)
+
+
+def _column_property(column: str) -> property:
+    def getter(self: "StudentView"):
+        return getattr(self._store, column)[self._row]
+
+    def setter(self: "StudentView", value) -> None:
+        getattr(self._store, column)[self._row] = value
+
+    return property(getter, setter)
+
+
+class _History(array):
+    """Float column for one student's pick history, usable as a list."""
+
+    def __new__(cls, values=()):
+        return super().__new__(cls, "d", values)
+
+    def clear(self) -> None:
+        del self[:]
+
+
+def _history_getter(self: "StudentView") -> _History:
+    histories = self._store._histories
+    history = histories[self._row]
+    if history is None:
+        history = histories[self._row] = _History()
+    return history
+
+
+def _history_setter(self: "StudentView", value) -> None:
+    self._store._histories[self._row] = _History(value) if value else None
+
+
+class StudentView(Student):
+    """``Student`` handle backed by one row of a ``ColumnarStudentStore``.
+
+    ``Student`` keeps its state in name-mangled attributes; the view maps
+    those attribute names onto the store's columns, so every ``Student``
+    method runs unchanged against the columnar data.
+    """
+
+    def __init__(self, store: "ColumnarStudentStore", row: int) -> None:
+        self._store = store
+        self._row = row
+
+    _Student__id = _column_property("_ids")
+    _Student__name = _column_property("_names")
+    _Student__group = _column_property("_groups")
+    _Student__pick_count = _column_property("_pick_counts")
+    _Student__last_pick = _column_property("_last_picks")
+    _Student__cooldown_started_at = _column_property("_cooldown_started")
+    _Student__cooldown_expires_at = _column_property("_cooldown_expires")
+    _Student__pick_history = property(_history_getter, _history_setter)
+
+    def set_student_id(self, value: int) -> None:
+        self._store.rekey(self.student_id, int(value))
+
+
+class ColumnarStudentStore:
+    """Struct-of-arrays roster for very large classes.
+
+    Rows of removed students are recycled by later additions; their slot is
+    flagged in ``_live`` until then. Eligibility scans run over the
+    ``cooldown_expires_at`` column, vectorised with NumPy when it is
+    installed.
+    """
+
+    def __init__(self) -> None:
+        self._ids = array("q")
+        self._groups = array("q")
+        self._pick_counts = array("q")
+        self._last_picks = array("d")
+        self._cooldown_started = array("d")
+        self._cooldown_expires = array("d")
+        self._names: list[str] = []
+        self._histories: list[_History | None] = []
+        self._live = bytearray()
+        self._views: list[StudentView | None] = []
+        self._rows: dict[int, int] = {}
+        self._free_rows: list[int] = []
+
+    def add(self, student: Student) -> Student:
+        student_id = student.student_id
+        if student_id in self._rows:
+            self.pop(student_id)
+        history = student.pick_history
+        values = (
+            student_id,
+            student.group,
+            student.pick_count,
+            student.last_pick,
+            student.cooldown_started_at,
+            student.cooldown_expires_at,
+        )
+        if self._free_rows:
+            row = self._free_rows.pop()
+            for column, value in zip(self.__numeric_columns(), values):
+                column[row] = value
+            self._names[row] = student.name
+            self._histories[row] = _History(history) if history else None
+            self._live[row] = 1
+            self._views[row] = None
+        else:
+            row = len(self._ids)
+            for column, value in zip(self.__numeric_columns(), values):
+                column.append(value)
+            self._names.append(student.name)
+            self._histories.append(_History(history) if history else None)
+            self._live.append(1)
+            self._views.append(None)
+        self._rows[student_id] = row
+        return self.__view(row)
+
+    def pop(self, student_id: int) -> Student | None:
+        row = self._rows.pop(student_id, None)
+        if row is None:
+            return None
+        detached = Student(
+            name=self._names[row],
+            group=self._groups[row],
+            last_pick=self._last_picks[row],
+            pick_count=self._pick_counts[row],
+            pick_history=list(self._histories[row] or ()),
+            student_id=student_id,
+            cooldown_started_at=self._cooldown_started[row],
+            cooldown_expires_at=self._cooldown_expires[row],
+        )
+        self._live[row] = 0
+        self._names[row] = ""
+        self._histories[row] = None
+        self._views[row] = None
+        self._free_rows.append(row)
+        return detached
+
+    def get(self, student_id: int) -> Student | None:
+        row = self._rows.get(student_id)
+        return None if row is None else self.__view(row)
+
+    def __getitem__(self, student_id: int) -> Student:
+        return self.__view(self._rows[student_id])
+
+    def take(self, student_ids: Iterable[int]) -> list[Student]:
+        rows = self._rows
+        view = self.__view
+        return [view(rows[student_id]) for student_id in student_ids]
+
+    def rekey(self, old_id: int, new_id: int) -> Student:
+        row = self._rows.pop(old_id)
+        self._rows[new_id] = row
+        self._ids[row] = new_id
+        return self.__view(row)
+
+    def eligible(self, current_time: float, ignore_cooldown: bool) -> list[Student]:
+        if ignore_cooldown:
+            return list(self.values())
+        if np is not None and self._rows:
+            expires = np.frombuffer(self._cooldown_expires, dtype=np.float64)
+            live = np.frombuffer(self._live, dtype=np.uint8)
+            rows = np.flatnonzero((expires <= current_time) & (live != 0)).tolist()
+            del expires, live
+        else:
+            rows = [
+                row
+                for row, (expires_at, alive) in enumerate(
+                    zip(self._cooldown_expires, self._live)
+                )
+                if alive and current_time >= expires_at
+            ]
+        return [self.__view(row) for row in rows]
+
+    def values(self) -> Iterator[Student]:
+        for row in self._rows.values():
+            yield self.__view(row)
+
+    def __contains__(self, student_id: object) -> bool:
+        return student_id in self._rows
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __numeric_columns(self) -> tuple[array, ...]:
+        return (
+            self._ids,
+            self._groups,
+            self._pick_counts,
+            self._last_picks,
+            self._cooldown_started,
+            self._cooldown_expires,
+        )
+
+    def __view(self, row: int) -> StudentView:
+        # One view per row, so every lookup of a student, including the
+        # handle ``add`` returns, yields the same object.
+        view = self._views[row]
+        if view is None:
+            view = self._views[row] = StudentView(self, row)
+        return view
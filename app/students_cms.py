@@ -1,12 +1,36 @@
+import bisect
+import heapq
 import json
+import sys
 import time
 import uuid
-from typing import Any
+from typing import Any, Callable, Iterator
 
-from .student import Student
+from .pick_events import PickEventLog, count_metrics
+from .student import HISTORY_TOLERANCE, Student
+from .student_index import (
+    RANGE_OPERATORS,
+    STUDENT_ORDERS,
+    GroupIndex,
+    NameIndex,
+    RosterStats,
+    SearchIndex,
+    SortedIds,
+    name_key,
+)
+from .student_store import COLUMNAR_THRESHOLD, ColumnarStudentStore, DictStudentStore
 
 
 class DrawHistoryEntry:
+    """One recorded draw.
+
+    Students are kept as a tuple of ids. ``snapshots`` holds the name and
+    group of a student only when they no longer match the roster, because
+    the student was renamed, regrouped or deleted after the draw; every
+    other member is resolved against the roster when the entry is
+    expanded for display.
+    """
+
     __slots__ = (
         "entry_id",
         "timestamp",
@@ -15,7 +39,8 @@ class DrawHistoryEntry:
         "requested_count",
         "ignore_cooldown",
         "group",
-        "students",
+        "student_ids",
+        "snapshots",
         "note",
     )
 
@@ -33,6 +58,8 @@ class DrawHistoryEntry:
         requested_count: int | None = None,
         ignore_cooldown: bool = False,
         note: str = "",
+        student_ids: list[int] | None = None,
+        snapshots: dict[Any, Any] | None = None,
     ) -> None:
         self.entry_id = (entry_id or uuid.uuid4().hex).strip()
         self.timestamp = float(timestamp or time.time())
@@ -40,10 +67,14 @@ class DrawHistoryEntry:
         if normalized_mode not in self._SUPPORTED_MODES:
             normalized_mode = "single"
         self.mode = normalized_mode
-        self.students = self._normalize_students(students)
+        if student_ids is not None:
+            self.student_ids = self._normalize_ids(student_ids)
+            self.snapshots = self._normalize_snapshots(snapshots, self.student_ids)
+        else:
+            self.student_ids, self.snapshots = self._normalize_students(students)
         self.group = self._normalize_group(group)
         self.count = (
-            int(count) if isinstance(count, (int, float)) else len(self.students)
+            int(count) if isinstance(count, (int, float)) else len(self.student_ids)
         )
         self.requested_count = (
             int(requested_count)
@@ -54,34 +85,65 @@ class DrawHistoryEntry:
         self.note = self._normalize_note(note)
 
     @staticmethod
+    def _parse_id(value: Any) -> int:
+        try:
+            return int(value) if value is not None else 0
+        except (TypeError, ValueError):
+            return 0
+
+    @classmethod
+    def _normalize_ids(cls, values: Any) -> tuple[int, ...]:
+        if not isinstance(values, (list, tuple)):
+            return ()
+        return tuple(cls._parse_id(value) for value in values)
+
+    @classmethod
+    def _normalize_snapshots(
+        cls, raw: Any, student_ids: tuple[int, ...]
+    ) -> dict[int, tuple[str, int]]:
+        if not isinstance(raw, dict):
+            return {}
+        snapshots: dict[int, tuple[str, int]] = {}
+        for key, value in raw.items():
+            student_id = cls._parse_id(key)
+            if student_id not in student_ids or not isinstance(value, (list, tuple)):
+                continue
+            name = value[0] if value else ""
+            group = value[1] if len(value) > 1 else 0
+            snapshots[student_id] = cls._snapshot(name, group)
+        return snapshots
+
+    @classmethod
     def _normalize_students(
-        candidates: list[dict[str, Any]] | None,
-    ) -> list[dict[str, Any]]:
+        cls, candidates: list[dict[str, Any]] | None
+    ) -> tuple[tuple[int, ...], dict[int, tuple[str, int]]]:
+        """Split legacy ``{id, name, group}`` dicts into ids and snapshots.
+
+        Every member starts with a snapshot; ``StudentsCms`` drops the ones
+        that match its roster.
+        """
         if not isinstance(candidates, list):
-            return []
-        normalized: list[dict[str, Any]] = []
+            return (), {}
+        student_ids: list[int] = []
+        snapshots: dict[int, tuple[str, int]] = {}
         for item in candidates:
             if not isinstance(item, dict):
                 continue
             # Parse student_id as int
-            raw_id = item.get("id") or item.get("student_id")
-            try:
-                student_id = int(raw_id) if raw_id is not None else 0
-            except (TypeError, ValueError):
-                student_id = 0
-            name = str(item.get("name") or "").strip()
-            try:
-                group_value = int(item.get("group", 0))
-            except (TypeError, ValueError):
-                group_value = 0
-            normalized.append(
-                {
-                    "id": student_id,
-                    "name": name,
-                    "group": group_value,
-                }
+            student_id = cls._parse_id(item.get("id") or item.get("student_id"))
+            student_ids.append(student_id)
+            snapshots[student_id] = cls._snapshot(
+                item.get("name"), item.get("group", 0)
             )
-        return normalized
+        return tuple(student_ids), snapshots
+
+    @staticmethod
+    def _snapshot(name: Any, group: Any) -> tuple[str, int]:
+        try:
+            group_value = int(group)
+        except (TypeError, ValueError):
+            group_value = 0
+        return sys.intern(str(name or "").strip()), group_value
 
     @staticmethod
     def _normalize_group(value: Any) -> int | None:
@@ -94,8 +156,46 @@ class DrawHistoryEntry:
     def _normalize_note(value: Any) -> str:
         return str(value or "").strip()
 
-    def serialize(self) -> dict[str, Any]:
-        payload = {
+    def snapshot_student(self, student_id: int, name: str, group: int) -> None:
+        if student_id in self.student_ids and student_id not in self.snapshots:
+            self.snapshots[student_id] = self._snapshot(name, group)
+
+    def replace_student_id(self, old_id: int, new_id: int) -> None:
+        self.student_ids = tuple(
+            new_id if student_id == old_id else student_id
+            for student_id in self.student_ids
+        )
+        if old_id in self.snapshots:
+            self.snapshots[new_id] = self.snapshots.pop(old_id)
+
+    def drop_student(self, student_id: int) -> int:
+        """Remove ``student_id`` from the entry and return how many went."""
+        remaining = tuple(item for item in self.student_ids if item != student_id)
+        removed = len(self.student_ids) - len(remaining)
+        self.student_ids = remaining
+        self.snapshots.pop(student_id, None)
+        self.count = max(0, self.count - removed)
+        return removed
+
+    def expand_students(
+        self, resolve: Callable[[int], tuple[str, int] | None]
+    ) -> list[dict[str, Any]]:
+        students: list[dict[str, Any]] = []
+        for student_id in self.student_ids:
+            snapshot = self.snapshots.get(student_id) or resolve(student_id)
+            name, group = snapshot or ("", 0)
+            students.append({"id": student_id, "name": name, "group": group})
+        return students
+
+    def serialize(
+        self, resolve: Callable[[int], tuple[str, int] | None] | None = None
+    ) -> dict[str, Any]:
+        """Payload of the entry.
+
+        With ``resolve`` the students are expanded to ``{id, name, group}``
+        dicts; without it the compact stored form is produced.
+        """
+        payload: dict[str, Any] = {
             "id": self.entry_id,
             "timestamp": self.timestamp,
             "mode": self.mode,
@@ -103,8 +203,16 @@ class DrawHistoryEntry:
             "requested_count": self.requested_count,
             "ignore_cooldown": self.ignore_cooldown,
             "note": self.note,
-            "students": [dict(item) for item in self.students],
         }
+        if resolve is not None:
+            payload["students"] = self.expand_students(resolve)
+        else:
+            payload["student_ids"] = list(self.student_ids)
+            if self.snapshots:
+                payload["snapshots"] = {
+                    str(student_id): [name, group]
+                    for student_id, (name, group) in self.snapshots.items()
+                }
         if self.group is not None:
             payload["group"] = self.group
         return payload
@@ -121,11 +229,14 @@ class DrawHistoryEntry:
             timestamp_value = float(timestamp_raw)
         except (TypeError, ValueError):
             timestamp_value = time.time()
+        student_ids = payload.get("student_ids")
         return cls(
             entry_id=payload.get("id") or payload.get("entry_id"),
             timestamp=timestamp_value,
             mode=payload.get("mode") or payload.get("type") or "single",
             students=payload.get("students") or payload.get("members"),
+            student_ids=student_ids if isinstance(student_ids, list) else None,
+            snapshots=payload.get("snapshots"),
             group=payload.get("group"),
             count=payload.get("count"),
             requested_count=payload.get("requested_count"),
@@ -133,13 +244,276 @@ class DrawHistoryEntry:
             note=payload.get("note"),
         )
 
+    @classmethod
+    def from_stored(cls, payload: dict[str, Any]) -> "DrawHistoryEntry":
+        """Rebuild an entry from the compact form ``serialize`` writes.
+
+        Raises ValueError on anything that form would not contain, without
+        attempting the coercions of ``from_payload``.
+        """
+        try:
+            entry_id = payload["id"]
+            timestamp = payload["timestamp"]
+            mode = payload["mode"]
+            count = payload["count"]
+            requested_count = payload["requested_count"]
+            ignore_cooldown = payload["ignore_cooldown"]
+            note = payload["note"]
+            student_ids = tuple(payload["student_ids"])
+            raw_snapshots = payload.get("snapshots", {})
+            group = payload.get("group")
+            snapshots = {
+                int(key): (sys.intern(name), group_value)
+                for key, (name, group_value) in raw_snapshots.items()
+            }
+        except (KeyError, TypeError, ValueError, AttributeError) as error:
+            raise ValueError("history_invalid") from error
+        if (
+            type(entry_id) is not str
+            or type(timestamp) is not float
+            or mode not in cls._SUPPORTED_MODES
+            or type(count) is not int
+            or type(requested_count) is not int
+            or type(ignore_cooldown) is not bool
+            or type(note) is not str
+            or not (group is None or type(group) is int)
+            or not all(type(student_id) is int for student_id in student_ids)
+            or not all(
+                type(name) is str and type(group_value) is int
+                for name, group_value in snapshots.values()
+            )
+        ):
+            raise ValueError("history_invalid")
+        entry = cls.__new__(cls)
+        entry.entry_id = entry_id
+        entry.timestamp = timestamp
+        entry.mode = mode
+        entry.count = count
+        entry.requested_count = requested_count
+        entry.ignore_cooldown = ignore_cooldown
+        entry.group = group
+        entry.student_ids = student_ids
+        entry.snapshots = snapshots
+        entry.note = note
+        return entry
+
+
+class DrawHistoryLog:
+    """Draw history ordered by timestamp with lookup by entry id.
+
+    Entries are stored oldest first so that the usual case, a draw newer
+    than every recorded one, is an append; older entries are bisected into
+    place. Removal leaves a ``None`` tombstone that is compacted away once
+    tombstones make up half of the storage. Iteration yields newest first,
+    and entries sharing a timestamp come out most recently recorded first.
+
+    An inverted index maps each student id to the ids of the entries that
+    include the student, and ``events`` mirrors the log one pick per row
+    for analytics.
+    """
+
+    def __init__(self, entries: list[DrawHistoryEntry] | None = None) -> None:
+        self._entries: list[DrawHistoryEntry | None] = []
+        self._timestamps: list[float] = []
+        self._by_id: dict[str, DrawHistoryEntry] = {}
+        self._by_student: dict[int, dict[str, None]] = {}
+        self._tombstones = 0
+        self.events = PickEventLog()
+        if entries:
+            self.replace(entries)
+
+    def replace(self, entries: list[DrawHistoryEntry]) -> None:
+        """Load ``entries`` given newest first; later duplicate ids are dropped."""
+        unique: list[DrawHistoryEntry] = []
+        by_id: dict[str, DrawHistoryEntry] = {}
+        for entry in entries:
+            if entry.entry_id in by_id:
+                continue
+            by_id[entry.entry_id] = entry
+            unique.append(entry)
+        unique.reverse()
+        unique.sort(key=lambda item: item.timestamp)
+        self._entries = list(unique)
+        self._timestamps = [entry.timestamp for entry in unique]
+        self._by_id = by_id
+        self._by_student = {}
+        self.events = PickEventLog()
+        for entry in unique:
+            self._index(entry)
+        self._tombstones = 0
+
+    def add(self, entry: DrawHistoryEntry) -> None:
+        if entry.entry_id in self._by_id:
+            self.remove(entry.entry_id)
+        timestamp = entry.timestamp
+        if not self._timestamps or timestamp >= self._timestamps[-1]:
+            self._entries.append(entry)
+            self._timestamps.append(timestamp)
+        else:
+            index = bisect.bisect_right(self._timestamps, timestamp)
+            self._entries.insert(index, entry)
+            self._timestamps.insert(index, timestamp)
+        self._by_id[entry.entry_id] = entry
+        self._index(entry)
+
+    def get(self, entry_id: str) -> DrawHistoryEntry | None:
+        return self._by_id.get(entry_id)
+
+    def remove(self, entry_id: str) -> bool:
+        entry = self._by_id.pop(entry_id, None)
+        if entry is None:
+            return False
+        self._unindex(entry)
+        timestamps = self._timestamps
+        index = bisect.bisect_left(timestamps, entry.timestamp)
+        while self._entries[index] is not entry:
+            index += 1
+        self._entries[index] = None
+        self._tombstones += 1
+        if self._tombstones * 2 >= len(self._entries):
+            self._compact()
+        return True
+
+    def roll_off(
+        self, max_entries: int | None, cutoff: float
+    ) -> list[DrawHistoryEntry]:
+        """Remove and return, oldest first, the entries outside the window.
+
+        The window holds at most ``max_entries`` entries, none of them older
+        than ``cutoff``.
+        """
+        if self._tombstones:
+            self._compact()
+        count = bisect.bisect_left(self._timestamps, cutoff)
+        if max_entries is not None:
+            count = max(count, len(self._entries) - max_entries)
+        if count <= 0:
+            return []
+        removed = self._entries[:count]
+        del self._entries[:count]
+        del self._timestamps[:count]
+        for entry in removed:
+            self._by_id.pop(entry.entry_id, None)
+            self._unindex(entry)
+        return removed
+
+    def for_student(self, student_id: int) -> list[DrawHistoryEntry]:
+        """Entries that include ``student_id``, newest first."""
+        entries = [
+            self._by_id[entry_id] for entry_id in self._by_student.get(student_id, ())
+        ]
+        entries.sort(key=lambda item: item.timestamp, reverse=True)
+        return entries
+
+    def rekey_student(self, old_id: int, new_id: int) -> None:
+        entry_ids = self._by_student.pop(old_id, None)
+        if not entry_ids:
+            return
+        for entry_id in entry_ids:
+            self._by_id[entry_id].replace_student_id(old_id, new_id)
+        self.events.rekey_student(entry_ids, old_id, new_id)
+        self._by_student.setdefault(new_id, {}).update(entry_ids)
+
+    def detach_student(self, entry_id: str, student_id: int) -> bool:
+        """Drop ``student_id`` from one entry; an emptied entry is removed."""
+        entry_ids = self._by_student.get(student_id)
+        if not entry_ids or entry_id not in entry_ids:
+            return False
+        entry = self._by_id[entry_id]
+        if all(item == student_id for item in entry.student_ids):
+            return self.remove(entry_id)
+        del entry_ids[entry_id]
+        if not entry_ids:
+            del self._by_student[student_id]
+        entry.drop_student(student_id)
+        self.events.detach_student(entry_id, student_id)
+        return True
+
+    def __iter__(self) -> Iterator[DrawHistoryEntry]:
+        for entry in reversed(self._entries):
+            if entry is not None:
+                yield entry
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def _index(self, entry: DrawHistoryEntry) -> None:
+        for student_id in entry.student_ids:
+            self._by_student.setdefault(student_id, {})[entry.entry_id] = None
+        self.events.add(
+            entry.entry_id,
+            entry.timestamp,
+            entry.mode,
+            entry.group,
+            entry.student_ids,
+        )
+
+    def _unindex(self, entry: DrawHistoryEntry) -> None:
+        self.events.remove(entry.entry_id)
+        for student_id in entry.student_ids:
+            entry_ids = self._by_student.get(student_id)
+            if entry_ids is None:
+                continue
+            entry_ids.pop(entry.entry_id, None)
+            if not entry_ids:
+                del self._by_student[student_id]
+
+    def _compact(self) -> None:
+        live = [
+            (entry, timestamp)
+            for entry, timestamp in zip(self._entries, self._timestamps)
+            if entry is not None
+        ]
+        self._entries = [entry for entry, _ in live]
+        self._timestamps = [timestamp for _, timestamp in live]
+        self._tombstones = 0
+
+
+# Windows of fairness metrics kept per class revision.
+FAIRNESS_CACHE_SIZE = 16
+
+# Student fields that can be filtered by range, and the order indexing each.
+QUERY_FIELDS = {
+    "group": "group",
+    "pick_count": "pick_count",
+    "last_pick": "last_pick",
+    "cooldown_expires_at": "cooldown",
+}
+
 
 class StudentsCms:
-    def __init__(self, pick_cooldown: int = 3) -> None:
-        self.__students: dict[str, Student] = {}
+    def __init__(
+        self,
+        pick_cooldown: int = 3,
+        store: DictStudentStore | ColumnarStudentStore | None = None,
+        reuse_ids: bool = False,
+    ) -> None:
+        self.__students = store if store is not None else DictStudentStore()
+        self.__groups = GroupIndex()
+        self.__names = NameIndex()
+        self.__search = SearchIndex()
+        self.__orders = {name: SortedIds(key) for name, key in STUDENT_ORDERS.items()}
+        self.__stats = RosterStats()
+        # Ids below the high-water mark have been handed out before. Freed
+        # ids are only recycled when reuse_ids is set.
+        self.__next_id = 1
+        self.__reuse_ids = bool(reuse_ids)
+        self.__free_ids: list[int] = []
         self.__pick_cooldown = pick_cooldown
-        self.__history: list[DrawHistoryEntry] = []
+        self.__history = DrawHistoryLog()
         self.__history_updated_at: float = time.time()
+        # Aggregated pick statistics survive history roll-off; picks at or
+        # before archived_before live only in the class archive.
+        self.__pick_stats: dict[int, dict[str, Any]] = {}
+        self.__archived_before = 0.0
+        # Bumped by every change to data that is serialized, so callers can
+        # cache encoded payloads per revision.
+        self.__revision = 0
+        # Revisions restart whenever a class is loaded again; the nonce keeps
+        # revision tags of different loads apart.
+        self.__nonce = uuid.uuid4().hex[:12]
+        self.__fairness: dict[tuple, dict[str, Any]] = {}
+        self.__fairness_revision = -1
 
     @staticmethod
     def __parse_int(value) -> int:
@@ -148,19 +522,91 @@ class StudentsCms:
         except (TypeError, ValueError):
             return 0
 
+    @staticmethod
+    def __parse_float(value) -> float:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return 0.0
+
     @property
     def pick_cooldown(self) -> int:
         return self.__pick_cooldown
 
-    def add_student(self, student: Student) -> None:
-        self.__students[student.student_id] = student
+    @property
+    def revision(self) -> int:
+        return self.__revision
+
+    @property
+    def history_archived_before(self) -> float:
+        """Latest timestamp moved to the archive, or 0.0 if none was."""
+        return self.__archived_before
+
+    @property
+    def revision_tag(self) -> str:
+        """``revision`` qualified by this instance, for clients to compare."""
+        return f"{self.__nonce}.{self.__revision}"
+
+    @property
+    def next_student_id(self) -> int:
+        return self.__next_id
+
+    @property
+    def reuse_ids(self) -> bool:
+        return self.__reuse_ids
+
+    def add_student(self, student: Student) -> Student:
+        stored = self.__students.add(student)
+        self.__groups.add(stored)
+        self.__names.add(stored)
+        self.__search.add(stored)
+        for order in self.__orders.values():
+            order.add(stored)
+        self.__stats.add(stored)
+        self.__claim_id(stored.student_id)
+        self.__revision += 1
+        return stored
 
     def generate_student_id(self) -> int:
-        numeric = [student.student_id for student in self.__students.values()]
-        base = max(numeric) + 1 if numeric else 1
-        while base in self.__students:
-            base += 1
-        return base
+        free_ids = self.__free_ids
+        while free_ids and free_ids[0] in self.__students:
+            heapq.heappop(free_ids)
+        if free_ids:
+            return free_ids[0]
+        while self.__next_id in self.__students:
+            self.__next_id += 1
+            self.__revision += 1
+        return self.__next_id
+
+    def reserve_student_ids(self, count: int) -> list[int]:
+        """Hand out ``count`` unused ids at once.
+
+        Reserved ids are never generated again, whether or not a student is
+        created with them.
+        """
+        reserved: list[int] = []
+        free_ids = self.__free_ids
+        self.__revision += 1
+        while len(reserved) < count:
+            if free_ids:
+                student_id = heapq.heappop(free_ids)
+                if student_id in self.__students:
+                    continue
+            else:
+                student_id = self.__next_id
+                self.__next_id += 1
+                if student_id in self.__students:
+                    continue
+            reserved.append(student_id)
+        return reserved
+
+    def __claim_id(self, student_id: int) -> None:
+        if student_id >= self.__next_id:
+            self.__next_id = student_id + 1
+
+    def __release_id(self, student_id: int) -> None:
+        if self.__reuse_ids and 0 < student_id < self.__next_id:
+            heapq.heappush(self.__free_ids, student_id)
 
     def create_student(
         self, name: str, group: int, student_id: int | None = None
@@ -175,20 +621,65 @@ class StudentsCms:
         if self.student_name_exists(name_value):
             raise ValueError("name_exists")
         student = Student(name=name_value, group=group_value, student_id=new_id)
-        self.add_student(student)
-        return student
+        return self.add_student(student)
+
+    def create_students(
+        self, entries: list[tuple[str, int, int | None]]
+    ) -> list[Student]:
+        """Create several students, validating the whole batch first.
+
+        Entries without an id draw theirs from one ``reserve_student_ids``
+        call after the explicitly numbered entries have been added.
+        """
+        prepared: list[tuple[str, int, int | None]] = []
+        seen_names: set[str] = set()
+        seen_ids: set[int] = set()
+        for name, group, student_id in entries:
+            name_value = str(name or "").strip()
+            if not name_value:
+                raise ValueError("name_required")
+            key = name_key(name_value)
+            if key in seen_names or self.student_name_exists(name_value):
+                raise ValueError("name_exists")
+            seen_names.add(key)
+            if student_id is not None:
+                if student_id in seen_ids or student_id in self.__students:
+                    raise ValueError("id_exists")
+                seen_ids.add(student_id)
+            prepared.append((name_value, self.__parse_int(group), student_id))
+        created: dict[int, Student] = {}
+        for index, (name_value, group_value, student_id) in enumerate(prepared):
+            if student_id is not None:
+                created[index] = self.add_student(
+                    Student(name=name_value, group=group_value, student_id=student_id)
+                )
+        pending = [index for index in range(len(prepared)) if index not in created]
+        for index, new_id in zip(pending, self.reserve_student_ids(len(pending))):
+            name_value, group_value, _ = prepared[index]
+            created[index] = self.add_student(
+                Student(name=name_value, group=group_value, student_id=new_id)
+            )
+        return [created[index] for index in range(len(prepared))]
 
     def remove_student(self, student_id: int) -> bool:
-        return self.__students.pop(student_id, None) is not None
+        student = self.__students.pop(student_id)
+        if student is None:
+            return False
+        self.__revision += 1
+        for entry in self.__history.for_student(student_id):
+            entry.snapshot_student(student_id, student.name, student.group)
+        self.__groups.discard(student_id)
+        self.__names.discard(student_id)
+        self.__search.discard(student_id)
+        for order in self.__orders.values():
+            order.discard(student_id)
+        self.__stats.discard(student_id)
+        self.__drop_pick_stats(student_id)
+        self.__release_id(student_id)
+        return True
 
     def student_name_exists(self, name: str, exclude_id: int | None = None) -> bool:
-        lowered = name.lower()
-        for student in self.__students.values():
-            if exclude_id is not None and student.student_id == exclude_id:
-                continue
-            if student.name.lower() == lowered:
-                return True
-        return False
+        return self.__names.contains(name, exclude_id)
 
     def get_student_by_id(self, student_id: int) -> Student | None:
         return self.__students.get(student_id)
@@ -196,15 +687,95 @@ class StudentsCms:
     def get_students(self) -> list[Student]:
         return list(self.__students.values())
 
+    def student_count(self) -> int:
+        return len(self.__students)
+
     def history_entries(self) -> list[DrawHistoryEntry]:
         return list(self.__history)
 
     def record_history_entry(self, entry: DrawHistoryEntry) -> DrawHistoryEntry:
-        self.__history.insert(0, entry)
-        self.__sort_history()
+        self.__history.add(entry)
+        self.__prune_snapshots(entry)
+        for student_id in entry.student_ids:
+            self.__count_pick(student_id, entry.mode, entry.timestamp)
         self.__touch_history(entry.timestamp)
         return entry
 
+    def pick_stats(self, student_id: int) -> dict[str, Any]:
+        stats = self.__pick_stats.get(student_id)
+        if stats is None:
+            return {"modes": {}, "first_pick": 0.0, "last_pick": 0.0}
+        return {
+            "modes": dict(stats["modes"]),
+            "first_pick": stats["first_pick"],
+            "last_pick": stats["last_pick"],
+        }
+
+    def apply_history_retention(
+        self,
+        max_entries: int | None,
+        max_days: float | None,
+        current_time: float | None = None,
+    ) -> list[DrawHistoryEntry]:
+        """Roll history outside the retention window off the hot data.
+
+        Returns the removed entries, oldest first, for the caller to archive.
+        The pick timestamps those entries recorded are trimmed from their
+        students as well; picks without an entry stay. Pick counts and
+        ``pick_stats`` keep the totals.
+        """
+        cutoff = float("-inf")
+        if max_days is not None:
+            moment = time.time() if current_time is None else float(current_time)
+            cutoff = moment - float(max_days) * 86400.0
+        removed = self.__history.roll_off(max_entries, cutoff)
+        if not removed:
+            return removed
+        self.__archived_before = max(self.__archived_before, removed[-1].timestamp)
+        archived: dict[int, list[float]] = {}
+        for entry in removed:
+            for student_id in entry.student_ids:
+                archived.setdefault(student_id, []).append(entry.timestamp)
+        for student_id, timestamps in archived.items():
+            student = self.__students.get(student_id)
+            if student is not None:
+                student.trim_history(timestamps)
+        self.__touch_history()
+        return removed
+
+    def __count_pick(self, student_id: int, mode: str, timestamp: float) -> None:
+        stats = self.__pick_stats.get(student_id)
+        if stats is None:
+            stats = self.__pick_stats[student_id] = {
+                "modes": {},
+                "first_pick": timestamp,
+                "last_pick": timestamp,
+            }
+        modes = stats["modes"]
+        modes[mode] = modes.get(mode, 0) + 1
+        self.__stats.count_modes({mode: 1})
+        stats["first_pick"] = min(stats["first_pick"], timestamp)
+        stats["last_pick"] = max(stats["last_pick"], timestamp)
+
+    def __uncount_pick(self, student_id: int, mode: str) -> None:
+        stats = self.__pick_stats.get(student_id)
+        if stats is None:
+            return
+        modes = stats["modes"]
+        if mode not in modes:
+            return
+        self.__stats.count_modes({mode: 1}, -1)
+        remaining = modes[mode] - 1
+        if remaining > 0:
+            modes[mode] = remaining
+        else:
+            del modes[mode]
+
+    def __drop_pick_stats(self, student_id: int) -> None:
+        stats = self.__pick_stats.pop(student_id, None)
+        if stats is not None:
+            self.__stats.count_modes(stats["modes"], -1)
+
     def update_history_note(self, entry_id: str, note: str) -> DrawHistoryEntry:
         entry = self.__find_history_entry(entry_id)
         if not entry:
@@ -217,19 +788,130 @@ class StudentsCms:
         lookup = str(entry_id or "").strip()
         if not lookup:
             return False
-        for index, entry in enumerate(self.__history):
-            if entry.entry_id == lookup:
-                self.__history.pop(index)
-                self.__touch_history()
-                return True
-        return False
-
-    def export_history(self) -> dict[str, Any]:
+        if not self.__history.remove(lookup):
+            return False
+        self.__touch_history()
+        return True
+
+    def export_history(self, compact: bool = False) -> dict[str, Any]:
+        """History payload; ``compact`` keeps the stored id-only form."""
+        resolve = None if compact else self.__resolve_student
         return {
-            "entries": [entry.serialize() for entry in self.__history],
+            "entries": [entry.serialize(resolve) for entry in self.__history],
             "updated_at": self.__history_updated_at,
         }
 
+    def pick_report(
+        self,
+        since: float | None = None,
+        until: float | None = None,
+        student_id: int | None = None,
+        utc_offset: int | None = None,
+    ) -> dict[str, Any]:
+        """Rollups of the picks in the draw history; see ``PickEventLog``."""
+        return self.__history.events.report(since, until, student_id, utc_offset)
+
+    def fairness_report(
+        self, since: float | None = None, until: float | None = None
+    ) -> dict[str, Any]:
+        """Spread of picks across students and groups.
+
+        The baseline covers every pick counted on the students, including
+        archived ones. With ``since`` or ``until`` the same metrics are also
+        computed over the draw history in that window and compared with the
+        baseline; the window is not ``complete`` when part of it may lie in
+        the archive. ``last_picks`` lists ``[student_id, last_pick]`` pairs,
+        longest waiting first, with students never picked (0) ahead of the
+        rest. Reports are cached until the class changes.
+        """
+        if self.__fairness_revision != self.__revision:
+            self.__fairness = {}
+            self.__fairness_revision = self.__revision
+        key = (since, until)
+        report = self.__fairness.get(key)
+        if report is None:
+            if len(self.__fairness) >= FAIRNESS_CACHE_SIZE:
+                del self.__fairness[next(iter(self.__fairness))]
+            report = self.__fairness[key] = self.__build_fairness(since, until)
+        return report
+
+    def __build_fairness(
+        self, since: float | None, until: float | None
+    ) -> dict[str, Any]:
+        counts = {
+            student.student_id: student.pick_count
+            for student in self.__students.values()
+        }
+        baseline = self.__fairness_section(counts)
+        waiting = self.__orders["last_pick"]
+        last_picks = [
+            [student_id, waiting.key_of(student_id)[0]] for student_id in waiting.ids()
+        ]
+        report: dict[str, Any] = {
+            "baseline": baseline,
+            "oldest_last_pick": next(
+                (last_pick for _, last_pick in last_picks if last_pick > 0), None
+            ),
+            "last_picks": last_picks,
+            "archived_before": self.__archived_before or None,
+        }
+        if since is not None or until is not None:
+            picked = self.__history.events.student_counts(since, until)
+            window = self.__fairness_section(
+                {student_id: picked.get(student_id, 0) for student_id in counts}
+            )
+            window["change"] = {
+                name: window[name] - baseline[name]
+                for name in ("gini", "coverage", "group_coverage")
+            }
+            # Picks at or before archived_before are only in the archive.
+            window["complete"] = not self.__archived_before or (
+                since is not None and since > self.__archived_before
+            )
+            report["window"] = window
+        return report
+
+    def __fairness_section(self, counts: dict[int, int]) -> dict[str, Any]:
+        section = count_metrics(list(counts.values()))
+        groups: dict[str, dict[str, int]] = {}
+        covered = 0
+        sizes = self.__groups.group_sizes()
+        for group in sorted(sizes):
+            members = [
+                counts[student_id] for student_id in self.__groups.member_ids(group)
+            ]
+            picked = sum(1 for count in members if count)
+            covered += picked > 0
+            groups[str(group)] = {
+                "students": sizes[group],
+                "picked_students": picked,
+                "picks": sum(members),
+            }
+        students = section["students"]
+        section["coverage"] = (
+            (students - section["never_picked"]) / students if students else 0.0
+        )
+        section["groups"] = groups
+        section["groups_covered"] = covered
+        section["group_coverage"] = covered / len(sizes) if sizes else 0.0
+        return section
+
+    def serialize_history_entry(self, entry: DrawHistoryEntry) -> dict[str, Any]:
+        """Self-contained payload of one entry, with students expanded."""
+        return entry.serialize(self.__resolve_student)
+
+    def __resolve_student(self, student_id: int) -> tuple[str, int] | None:
+        student = self.__students.get(student_id)
+        if student is None:
+            return None
+        return student.name, student.group
+
+    def __prune_snapshots(self, entry: DrawHistoryEntry) -> None:
+        snapshots = entry.snapshots
+        for student_id in list(snapshots):
+            if snapshots[student_id] == self.__resolve_student(student_id):
+                del snapshots[student_id]
+
     def load_history(self, payload: Any) -> None:
         data = payload if isinstance(payload, dict) else {}
         raw_entries = []
@@ -244,9 +926,9 @@ class StudentsCms:
                     entry = DrawHistoryEntry.from_payload(item)
                 except ValueError:
                     continue
+                self.__prune_snapshots(entry)
                 entries.append(entry)
-        self.__history = entries
-        self.__sort_history()
+        self.__history = DrawHistoryLog(entries)
         updated_at = time.time()
         if isinstance(data, dict):
             try:
@@ -256,75 +938,74 @@ class StudentsCms:
         if not entries:
             updated_at = time.time()
         self.__history_updated_at = updated_at
+        self.__revision += 1
 
     def __find_history_entry(self, entry_id: str) -> DrawHistoryEntry | None:
         lookup = str(entry_id or "").strip()
         if not lookup:
             return None
-        for entry in self.__history:
-            if entry.entry_id == lookup:
-                return entry
-        return None
-
-    def __sort_history(self) -> None:
-        self.__history.sort(key=lambda item: item.timestamp, reverse=True)
+        return self.__history.get(lookup)
 
     def __touch_history(self, timestamp: float | None = None) -> None:
         now = time.time()
         target = float(timestamp) if timestamp is not None else now
         self.__history_updated_at = max(self.__history_updated_at, target, now)
+        self.__revision += 1
 
     def set_pick_cooldown(self, days: int) -> None:
         self.__pick_cooldown = max(1, int(days))
+        self.__revision += 1
+
+    def set_reuse_ids(self, enabled: bool) -> None:
+        """Turn id recycling on or off; only ids freed while on are reused."""
+        self.__reuse_ids = bool(enabled)
+        if not self.__reuse_ids:
+            self.__free_ids = []
+        self.__revision += 1
 
-    def sorted_students(self, search_term: str | None = None) -> list[Student]:
-        items = self.__students.values()
+    def sorted_students(
+        self, search_term: str | None = None, order: str = "default"
+    ) -> list[Student]:
+        """Students in one of the ``STUDENT_ORDERS``.
+
+        The orders are maintained as students change, so listing the whole
+        roster does not sort.
+        """
+        view = self.__orders.get(order)
+        if view is None:
+            raise ValueError("order_invalid")
         if search_term:
-            lowered = search_term.lower()
-
-            def matches(student: Student) -> bool:
-                return any(
-                    lowered in str(value).lower()
-                    for value in (
-                        student.student_id,
-                        student.name,
-                        student.group,
-                        student.pick_count,
-                    )
-                )
+            matches = set().union(*self.__search.search(search_term))
+            ordered = sorted(matches, key=view.key_of)
+        else:
+            ordered = view.ids()
+        return self.__students.take(ordered)
 
-            items = [student for student in items if matches(student)]
-        return sorted(
-            items,
-            key=lambda student: (
-                -student.pick_count,
-                student.group,
-                student.name.lower(),
-                student.student_id,
-            ),
-        )
+    def eligible_students(
+        self, ignore_cooldown: bool = False, current_time: float | None = None
+    ) -> list[Student]:
+        moment = time.time() if current_time is None else float(current_time)
+        return self.__students.eligible(moment, ignore_cooldown)
 
-    def eligible_students(self, ignore_cooldown: bool = False) -> list[Student]:
-        current_time = time.time()
-        return [
-            student
-            for student in self.__students.values()
-            if student.pickable(current_time, self.__pick_cooldown, ignore_cooldown)
-        ]
+    def eligible_groups(
+        self, ignore_cooldown: bool = False, current_time: float | None = None
+    ) -> list[int]:
+        moment = time.time() if current_time is None else float(current_time)
+        return self.__groups.eligible_groups(moment, ignore_cooldown)
 
-    def eligible_groups(self, ignore_cooldown: bool = False) -> list[int]:
-        current_time = time.time()
-        groups: dict[int, list[Student]] = {}
-        for student in self.__students.values():
-            groups.setdefault(student.group, []).append(student)
-        eligible = []
-        for group_id, members in groups.items():
-            if all(
-                s.pickable(current_time, self.__pick_cooldown, ignore_cooldown)
-                for s in members
-            ):
-                eligible.append(group_id)
-        return sorted(eligible)
+    def group_members(
+        self,
+        group: int,
+        ignore_cooldown: bool = False,
+        current_time: float | None = None,
+    ) -> list[Student]:
+        moment = time.time() if current_time is None else float(current_time)
+        members: list[Student] = []
+        for student_id in self.__groups.member_ids(group):
+            student = self.__students[student_id]
+            if student.pickable(moment, self.__pick_cooldown, ignore_cooldown):
+                members.append(student)
+        return members
 
     def register_random_pick(
         self, students: list[Student], *, timestamp: float | None = None
@@ -332,22 +1013,80 @@ class StudentsCms:
         moment = time.time() if timestamp is None else float(timestamp)
         for student in students:
             student.register_pick(moment, self.__pick_cooldown)
+            self.__reindex(student)
+        self.__revision += 1
+
+    def __reindex(self, student: Student) -> None:
+        """Update the indexes after picks or cooldowns of ``student`` changed."""
+        self.__groups.refresh(student)
+        for order in self.__orders.values():
+            order.refresh(student)
+        self.__stats.refresh(student)
 
     def force_cooldown(self, student: Student) -> None:
         student.apply_cooldown(time.time(), self.__pick_cooldown)
+        self.__reindex(student)
+        self.__revision += 1
 
     def force_end_cooldown(self, student: Student) -> None:
         student.force_pickable()
+        self.__reindex(student)
+        self.__revision += 1
 
     def clear_all_cooldowns(self) -> None:
         for student in self.__students.values():
             student.force_pickable()
+            self.__groups.refresh(student)
+        self.__orders["cooldown"].invalidate(self.__students.values())
+        self.__revision += 1
 
     def clear_student_history(self, student: Student) -> None:
         student.clear_history()
+        self.__drop_pick_stats(student.student_id)
+        self.__reindex(student)
+        self.__revision += 1
 
-    def remove_student_history_entry(self, student: Student, timestamp: float) -> bool:
-        return student.remove_history_entry(timestamp)
+    def student_history(self, student_id: int) -> list[DrawHistoryEntry]:
+        return self.__history.for_student(student_id)
+
+    def remove_student_history_entry(
+        self,
+        student: Student,
+        timestamp: float | None = None,
+        entry_id: str | None = None,
+    ) -> bool:
+        """Remove one pick of ``student``, by draw entry id or by timestamp.
+
+        A pick recorded in the draw history is removed together with the
+        student's place in that entry. Picks that predate the draw history
+        fall back to matching the student's own timestamps.
+        """
+        student_id = student.student_id
+        if entry_id is None and timestamp is not None:
+            for entry in self.__history.for_student(student_id):
+                if abs(entry.timestamp - timestamp) <= HISTORY_TOLERANCE:
+                    entry_id = entry.entry_id
+                    break
+        if entry_id is not None:
+            entry = self.__history.get(entry_id)
+            if entry is None or not self.__history.detach_student(
+                entry_id, student_id
+            ):
+                return False
+            index = student.find_history_entry(entry.timestamp)
+            if index is not None:
+                student.remove_history_at(index)
+            self.__uncount_pick(student_id, entry.mode)
+            self.__touch_history()
+            removed = True
+        elif timestamp is not None:
+            removed = student.remove_history_entry(timestamp)
+        else:
+            return False
+        if removed:
+            self.__reindex(student)
+            self.__revision += 1
+        return removed
 
     def update_student(
         self,
@@ -369,36 +1108,300 @@ class StudentsCms:
             if new_id != student.student_id and new_id in self.__students:
                 raise ValueError("id_exists")
             target_id = new_id
+        group_value = max(0, self.__parse_int(group))
+        if name_value != student.name or group_value != student.group:
+            for entry in self.__history.for_student(student_id):
+                entry.snapshot_student(student_id, student.name, student.group)
         if target_id != student.student_id:
-            self.__students.pop(student.student_id)
-            student.set_student_id(target_id)
-            self.__students[student.student_id] = student
+            self.__groups.discard(student.student_id)
+            student = self.__students.rekey(student.student_id, target_id)
+            self.__history.rekey_student(student_id, target_id)
+            stats = self.__pick_stats.pop(student_id, None)
+            if stats is not None:
+                self.__pick_stats[target_id] = stats
+            self.__release_id(student_id)
+            self.__claim_id(target_id)
+        self.__names.discard(student_id)
+        self.__search.discard(student_id)
+        for order in self.__orders.values():
+            order.discard(student_id)
+        self.__stats.discard(student_id)
         student.update(name_value, group)
+        self.__groups.add(student)
+        self.__names.add(student)
+        self.__search.add(student)
+        for order in self.__orders.values():
+            order.add(student)
+        self.__stats.add(student)
+        self.__revision += 1
         return student
 
+    def query_students(
+        self,
+        filters: dict[str, dict[str, float]] | None = None,
+        *,
+        order: str = "default",
+        descending: bool = False,
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> tuple[int, list[Student]]:
+        """Students whose fields fall within ``filters``, in ``order``.
+
+        ``filters`` maps ``QUERY_FIELDS`` to ``RANGE_OPERATORS`` bounds. The
+        narrowest range is read off its sorted index and the remaining
+        ranges are checked against their cached keys. Returns the number of
+        matches with the requested page.
+        """
+        sort_view = self.__orders.get(order)
+        if sort_view is None:
+            raise ValueError("query_invalid")
+        ranges = []
+        for field, limits in (filters or {}).items():
+            view = self.__orders.get(QUERY_FIELDS.get(field, ""))
+            if view is None or any(key not in RANGE_OPERATORS for key in limits):
+                raise ValueError("query_invalid")
+            start, end = view.bounds(limits)
+            ranges.append((end - start, view, start, end, limits))
+        if not ranges:
+            ordered = sort_view.ids()
+            total = len(ordered)
+            if descending:
+                ordered = ordered[::-1]
+        else:
+            ranges.sort(key=lambda item: item[0])
+            _, view, start, end, _ = ranges[0]
+            matches = view.ids()[start:end]
+            for _, other, _, _, limits in ranges[1:]:
+                matches = [
+                    student_id
+                    for student_id in matches
+                    if other.within(student_id, limits)
+                ]
+            total = len(matches)
+            if view is sort_view:
+                ordered = matches
+            elif total * 8 > len(sort_view):
+                # Filtering the maintained order beats sorting a large match.
+                members = set(matches)
+                ordered = [
+                    student_id
+                    for student_id in sort_view.ids()
+                    if student_id in members
+                ]
+            else:
+                ordered = sorted(matches, key=sort_view.key_of)
+            if descending:
+                ordered = ordered[::-1]
+        offset = max(0, offset)
+        stop = None if limit is None else offset + max(0, limit)
+        return total, self.__students.take(ordered[offset:stop])
+
+    def median_pick_count(self) -> float | None:
+        return self.__orders["pick_count"].median()
+
+    def roster_stats(self, current_time: float) -> dict[str, Any]:
+        """Class-wide totals, read off aggregates kept up to date by every
+        change rather than by scanning the roster.
+
+        ``next_expiry`` is the moment the cooling count next drops, after
+        which the numbers need to be fetched again.
+        """
+        groups = self.__groups
+        cooling_counts = groups.cooling_counts(current_time)
+        cooling = groups.cooling_total(current_time)
+        total = len(self.__students)
+        return {
+            "students": total,
+            "cooling": cooling,
+            "available": total - cooling,
+            "next_expiry": groups.next_expiry(current_time),
+            "groups": {
+                str(group): {
+                    "students": size,
+                    "cooling": cooling_counts.get(group, 0),
+                }
+                for group, size in sorted(groups.group_sizes().items())
+            },
+            "pick_counts": {
+                str(count): students
+                for count, students in self.__stats.histogram().items()
+            },
+            "total_picks": self.__stats.total_picks,
+            "modes": self.__stats.modes(),
+        }
+
+    def search_students(
+        self, query: str, offset: int = 0, limit: int = 50
+    ) -> tuple[int, list[Student]]:
+        """One page of students matching ``query``, best matches first.
+
+        Exact id and name matches rank first, then name prefixes, id
+        prefixes, group numbers and names containing the query. Returns the
+        total number of matches with the page.
+        """
+        buckets = self.__search.search(query)
+        total = len(set().union(*buckets))
+        wanted = max(0, offset) + max(0, limit)
+        ordered: dict[int, None] = {}
+        for bucket in buckets:
+            for student_id in bucket:
+                ordered.setdefault(student_id)
+                if len(ordered) >= wanted:
+                    break
+            if len(ordered) >= wanted:
+                break
+        page = list(ordered)[max(0, offset) :]
+        return total, [self.__students[student_id] for student_id in page]
+
+    def student_payload(self, student: Student, current_time: float) -> dict:
+        payload = student.to_dict(current_time, self.__pick_cooldown)
+        payload["is_cooling"] = payload["remaining_cooldown"] > 0
+        payload["pick_stats"] = self.pick_stats(student.student_id)
+        return payload
+
     def snapshot(self, current_time: float) -> dict:
-        items = []
-        for student in self.sorted_students():
-            payload = student.to_dict(current_time, self.__pick_cooldown)
-            payload["is_cooling"] = payload["remaining_cooldown"] > 0
-            items.append(payload)
         return {
             "cooldown_days": self.__pick_cooldown,
-            "students": items,
+            "students": [
+                self.student_payload(student, current_time)
+                for student in self.sorted_students()
+            ],
             "generated_at": current_time,
             "history": self.export_history(),
         }
 
+    def export_pick_stats(self) -> dict[str, Any]:
+        return {
+            "pick_stats": {
+                str(student_id): self.pick_stats(student_id)
+                for student_id in self.__pick_stats
+            },
+            "history_archived_before": self.__archived_before,
+        }
+
+    def load_pick_stats(self, payload: Any) -> None:
+        """Restore pick statistics, rebuilding them for older payloads."""
+        data = payload if isinstance(payload, dict) else {}
+        self.__revision += 1
+        self.__archived_before = self.__parse_float(data.get("history_archived_before"))
+        raw_stats = data.get("pick_stats")
+        self.__pick_stats = {}
+        self.__stats.reset_modes()
+        if isinstance(raw_stats, dict):
+            for key, item in raw_stats.items():
+                student_id = self.__parse_int(key)
+                if student_id not in self.__students or not isinstance(item, dict):
+                    continue
+                raw_modes = item.get("modes")
+                modes: dict[str, int] = {}
+                if isinstance(raw_modes, dict):
+                    for mode, count in raw_modes.items():
+                        if self.__parse_int(count) > 0:
+                            modes[str(mode)] = self.__parse_int(count)
+                self.__pick_stats[student_id] = {
+                    "modes": modes,
+                    "first_pick": self.__parse_float(item.get("first_pick")),
+                    "last_pick": self.__parse_float(item.get("last_pick")),
+                }
+                self.__stats.count_modes(modes)
+            return
+        for entry in reversed(list(self.__history)):
+            for student_id in entry.student_ids:
+                if student_id in self.__students:
+                    self.__count_pick(student_id, entry.mode, entry.timestamp)
+        for student in self.__students.values():
+            history = student.pick_history
+            if not history:
+                continue
+            stats = self.__pick_stats.get(student.student_id)
+            if stats is None:
+                self.__pick_stats[student.student_id] = {
+                    "modes": {},
+                    "first_pick": min(history),
+                    "last_pick": max(history),
+                }
+            else:
+                stats["first_pick"] = min(stats["first_pick"], min(history))
+
+    def export_id_state(self) -> dict[str, Any]:
+        state: dict[str, Any] = {"next_student_id": self.__next_id}
+        if self.__reuse_ids:
+            state["reuse_student_ids"] = True
+            state["free_student_ids"] = sorted(
+                student_id
+                for student_id in set(self.__free_ids)
+                if student_id not in self.__students
+            )
+        return state
+
+    def load_id_state(self, payload: Any) -> None:
+        data = payload if isinstance(payload, dict) else {}
+        self.__revision += 1
+        self.__reuse_ids = bool(data.get("reuse_student_ids", self.__reuse_ids))
+        self.__claim_id(self.__parse_int(data.get("next_student_id")) - 1)
+        free_ids: list[int] = []
+        raw_free = data.get("free_student_ids")
+        if self.__reuse_ids and isinstance(raw_free, list):
+            for item in raw_free:
+                student_id = self.__parse_int(item)
+                if student_id in self.__students:
+                    continue
+                if 0 < student_id < self.__next_id:
+                    free_ids.append(student_id)
+        heapq.heapify(free_ids)
+        self.__free_ids = free_ids
+
     def export(self) -> dict:
         return {
             "cooldown_days": self.__pick_cooldown,
             "students": [student.serialize() for student in self.__students.values()],
             "history": self.export_history(),
+            **self.export_id_state(),
         }
 
     def serialize(self) -> str:
         return json.dumps(self.export(), ensure_ascii=False, indent=2)
 
+    @staticmethod
+    def from_stored(
+        algorithm: dict[str, Any], students: dict[str, Any]
+    ) -> "StudentsCms":
+        """Rebuild a manager from the unified sections this version writes.
+
+        Students and compact history entries are constructed directly;
+        ValueError is raised on the first field that does not match what
+        ``Classroom.encode_unified`` produces, and the caller falls back to
+        ``deserialize``.
+        """
+        cooldown = algorithm.get("cooldown_days")
+        history = algorithm.get("history")
+        if (
+            type(cooldown) is not int
+            or not isinstance(students, dict)
+            or not isinstance(history, dict)
+            or not isinstance(history.get("entries"), list)
+            or type(history.get("updated_at")) is not float
+            or not isinstance(algorithm.get("pick_stats"), dict)
+        ):
+            raise ValueError("cms_invalid")
+        store = None
+        if len(students) >= COLUMNAR_THRESHOLD:
+            store = ColumnarStudentStore()
+        manager = StudentsCms(cooldown, store=store)
+        for key, item in students.items():
+            student = Student.from_stored(item)
+            student_id = student.student_id
+            if key != str(student_id) or student_id in manager.__students:
+                raise ValueError("cms_invalid")
+            manager.add_student(student)
+        manager.__history = DrawHistoryLog(
+            [DrawHistoryEntry.from_stored(item) for item in history["entries"]]
+        )
+        manager.__history_updated_at = history["updated_at"]
+        manager.load_id_state(algorithm)
+        manager.load_pick_stats(algorithm)
+        return manager
+
     @staticmethod
     def deserialize(data: str | dict | list | None) -> "StudentsCms":
         manager = StudentsCms()
@@ -422,10 +1425,15 @@ class StudentsCms:
             history_payload = raw.get("history")
         else:
             students_data = raw
+        if isinstance(students_data, list) and len(students_data) >= COLUMNAR_THRESHOLD:
+            manager.__students = ColumnarStudentStore()
         for item in students_data:
             student = Student.deserialize(
                 item, default_cooldown_days=manager.__pick_cooldown
             )
             manager.add_student(student)
         manager.load_history(history_payload)
+        if isinstance(raw, dict):
+            manager.load_id_state(raw)
+        manager.load_pick_stats(raw if isinstance(raw, dict) else None)
         return manager
@@ -1,17 +1,29 @@
 from __future__ import annotations
 
+import gzip
 import json
+import shutil
 import threading
 import time
 import uuid
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
 
 from .classrooms import ClassroomsState
+from .json_fragments import encode, encode_object
 
 USER_DATA_VERSION = 2
+# Marks files written by this version's encoder, which load without coercion.
+STORE_WRITER = "pickme-store/1"
 DATAFILE_SUFFIX = ".pickme.v2.json"
+ARCHIVE_DIRNAME = "archive"
+ARCHIVE_SUFFIX = ".history.jsonl.gz"
+# A file's bytes from before its first upgrade rewrite are kept beside it.
+UPGRADE_BACKUP_SUFFIX = ".bak"
+# Parsed users kept in memory; entries are checked against the file's stat.
+MAX_CACHED_USERS = 32
 DEFAULT_UUID = "local"
 
 DEFAULT_PREFERENCES: dict[str, Any] = {
@@ -224,6 +236,15 @@ def _unified_to_legacy(payload: dict[str, Any]) -> dict[str, Any]:
             "students": students_list,
             "history": algorithm.get("history", {"entries": [], "updated_at": 0}),
         }
+        for key in (
+            "next_student_id",
+            "reuse_student_ids",
+            "free_student_ids",
+            "pick_stats",
+            "history_archived_before",
+        ):
+            if key in algorithm:
+                class_payload[key] = algorithm[key]
         classes_data[class_id] = class_payload
         name_value = meta.get("name")
         if isinstance(name_value, str) and name_value.strip():
@@ -297,23 +318,60 @@ class UserData:
             self.runtime["active_class_id"] = self.classrooms.current_class_id
         self.metadata = dict(self.metadata or {})
 
-    def to_dict(self) -> dict[str, Any]:
-        """Serialize the user data into the persisted JSON format."""
+    def to_dict(self, compact: bool = False) -> dict[str, Any]:
+        """Serialize the user data into the persisted JSON format.
+
+        ``compact`` stores history entries as student ids (the on-disk
+        form); otherwise their students are expanded for the client.
+        """
         self.ensure_defaults()
         runtime = dict(self.runtime)
         runtime["active_class_id"] = self.classrooms.current_class_id
-        payload = {
-            "version": self.version,
-            "user_id": self.user_id,
-            "preferences": self.preferences,
-            "runtime": runtime,
-            "classes": self.classrooms.to_unified_payload(),
-        }
+        payload: dict[str, Any] = {"version": self.version}
+        if compact:
+            payload["writer"] = STORE_WRITER
+        payload["user_id"] = self.user_id
+        payload["preferences"] = self.preferences
+        payload["runtime"] = runtime
+        payload["classes"] = self.classrooms.to_unified_payload(compact=compact)
         payload["current_class_id"] = self.classrooms.current_class_id
         if self.metadata:
             payload["meta"] = self.metadata
         return payload
 
+    def to_json(
+        self,
+        compact: bool = False,
+        indent: int | None = None,
+        depth: int = 0,
+        runtime_extra: dict[str, Any] | None = None,
+    ) -> str:
+        """``to_dict`` encoded as JSON, splicing in cached class fragments."""
+        self.ensure_defaults()
+        runtime = dict(self.runtime)
+        runtime["active_class_id"] = self.classrooms.current_class_id
+        if runtime_extra:
+            runtime.update(runtime_extra)
+        members = [("version", encode(self.version, indent, depth + 1))]
+        if compact:
+            members.append(("writer", encode(STORE_WRITER, indent, depth + 1)))
+        members += [
+            ("user_id", encode(self.user_id, indent, depth + 1)),
+            ("preferences", encode(self.preferences, indent, depth + 1)),
+            ("runtime", encode(runtime, indent, depth + 1)),
+            (
+                "classes",
+                self.classrooms.encode_unified(compact, indent, depth + 1),
+            ),
+            (
+                "current_class_id",
+                encode(self.classrooms.current_class_id, indent, depth + 1),
+            ),
+        ]
+        if self.metadata:
+            members.append(("meta", encode(self.metadata, indent, depth + 1)))
+        return encode_object(members, indent, depth)
+
     def touch_accessed(self) -> None:
         """Update runtime access timestamps."""
         moment = _now()
@@ -358,6 +416,35 @@ class UserData:
             if strict:
                 raise ValueError("invalid_user_data_payload")
             payload = {}
+        if not strict and payload.get("writer") == STORE_WRITER:
+            try:
+                return cls._from_stored(payload)
+            except ValueError:
+                pass
+        return cls._from_tolerant(payload, default_user_id, strict)
+
+    @classmethod
+    def load_stored(
+        cls, payload: Any, *, default_user_id: str = DEFAULT_UUID
+    ) -> tuple["UserData", bool]:
+        """Load a data file payload of any format.
+
+        The flag is True when the payload is already in the current stored
+        form; otherwise the caller should write the upgraded data back.
+        """
+        if isinstance(payload, dict) and payload.get("writer") == STORE_WRITER:
+            try:
+                return cls._from_stored(payload), True
+            except ValueError:
+                pass
+        if not isinstance(payload, dict):
+            payload = {}
+        return cls._from_tolerant(payload, default_user_id, False), False
+
+    @classmethod
+    def _from_tolerant(
+        cls, payload: dict[str, Any], default_user_id: str, strict: bool
+    ) -> "UserData":
         version = payload.get("version")
         try:
             version_value = int(version) if version is not None else USER_DATA_VERSION
@@ -371,7 +458,13 @@ class UserData:
         preferences = payload.get("preferences")
         runtime = payload.get("runtime")
         metadata = payload.get("meta") or payload.get("metadata")
-        legacy_payload = _unified_to_legacy(payload)
+        # Files from before the unified format have a list of classes (or no
+        # classes at all) and are read directly.
+        legacy_payload = (
+            _unified_to_legacy(payload)
+            if isinstance(payload.get("classes"), dict)
+            else None
+        )
         try:
             state = ClassroomsState.from_payload(
                 payload,
@@ -384,17 +477,43 @@ class UserData:
             user_id=user_id,
             classrooms=state,
             preferences=preferences if isinstance(preferences, dict) else {},
-            runtime=(
-                legacy_payload.get("runtime", {})
-                if isinstance(legacy_payload, dict)
-                else {}
-            ),
+            runtime=runtime if isinstance(runtime, dict) else {},
             metadata=metadata if isinstance(metadata, dict) else {},
             version=version_value,
         )
         data.ensure_defaults()
         return data
 
+    @classmethod
+    def _from_stored(cls, payload: dict[str, Any]) -> "UserData":
+        """Fast path for files tagged with ``STORE_WRITER``.
+
+        Skips the legacy fallback and field coercion of ``from_dict``; raises
+        ValueError when the payload is not exactly what ``to_json`` writes.
+        """
+        user_id = payload.get("user_id")
+        preferences = payload.get("preferences")
+        runtime = payload.get("runtime")
+        metadata = payload.get("meta", {})
+        if (
+            not isinstance(user_id, str)
+            or _sanitize_uuid(user_id) != user_id
+            or not isinstance(preferences, dict)
+            or not isinstance(runtime, dict)
+            or not isinstance(metadata, dict)
+        ):
+            raise ValueError("invalid_user_data_payload")
+        data = cls(
+            user_id=user_id,
+            classrooms=ClassroomsState.from_stored(payload),
+            preferences=preferences,
+            runtime=runtime,
+            metadata=metadata,
+            version=payload["version"],
+        )
+        data.ensure_defaults()
+        return data
+
 
 class UserDataStore:
     """Persistence layer for unified per-user data files."""
@@ -406,6 +525,9 @@ class UserDataStore:
         self._lock = threading.RLock()
         self._data_dir = app_data_dir
         self._data_dir.mkdir(parents=True, exist_ok=True)
+        self._cache: OrderedDict[str, tuple[tuple[int, int], UserData]] = (
+            OrderedDict()
+        )
 
     @property
     def location_hint(self) -> str:
@@ -418,6 +540,53 @@ class UserDataStore:
         filename = f"{normalized}{DATAFILE_SUFFIX}"
         return self._data_dir / filename
 
+    def resolve_archive_path(self, user_id: str, class_id: str) -> Path | None:
+        normalized = _sanitize_uuid(user_id)
+        class_key = _sanitize_uuid(class_id)
+        if not normalized or not class_key:
+            return None
+        filename = f"{normalized}.{class_key}{ARCHIVE_SUFFIX}"
+        return self._data_dir / ARCHIVE_DIRNAME / filename
+
+    def read_archive(self, user_id: str, class_id: str) -> list[dict[str, Any]]:
+        """Archived history entries of a class, oldest first."""
+        path = self.resolve_archive_path(user_id, class_id)
+        if path is None or not path.exists():
+            return []
+        entries: list[dict[str, Any]] = []
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as handle:
+                for line in handle:
+                    try:
+                        item = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(item, dict):
+                        entries.append(item)
+        except (OSError, EOFError):
+            # A write cut short leaves a truncated final member; keep what
+            # was read before it.
+            pass
+        return entries
+
+    def export_payload(self, data: UserData) -> dict[str, Any]:
+        """Full payload with archived history merged back into each class."""
+        payload = data.to_dict()
+        for class_id, class_entry in payload.get("classes", {}).items():
+            archived = self.read_archive(data.user_id, class_id)
+            if not archived:
+                continue
+            history = class_entry["algorithm_data"]["history"]
+            entries = history.get("entries") or []
+            seen = {entry.get("id") for entry in entries}
+            for item in reversed(archived):
+                if item.get("id") not in seen:
+                    seen.add(item.get("id"))
+                    entries.append(item)
+            entries.sort(key=lambda item: item.get("timestamp") or 0.0, reverse=True)
+            history["entries"] = entries
+        return payload
+
     def generate_user_id(self) -> str:
         return uuid.uuid4().hex
 
@@ -433,12 +602,58 @@ class UserDataStore:
             path = self.resolve_path(normalized)
             if not path.exists():
                 data = self._create_default(normalized)
-                self._write_to_path(path, data.to_dict())
+                self._write_text(path, data.to_json(compact=True, indent=2))
+                self._remember(normalized, path, data)
                 created = True
             else:
-                data = self._load_from_path(path, normalized)
+                data = self._cached(normalized, path)
+                if data is None:
+                    data = self._load_from_path(path, normalized)
+                else:
+                    data.touch_accessed()
         return data, normalized, created
 
+    def evict(self, user_id: str) -> None:
+        """Forget the in-memory copy, e.g. after a failed, unsaved change."""
+        normalized = _sanitize_uuid(user_id)
+        if normalized:
+            with self._lock:
+                self._cache.pop(normalized, None)
+
+    def _cached(self, user_id: str, path: Path) -> UserData | None:
+        entry = self._cache.get(user_id)
+        if entry is None:
+            return None
+        signature, data = entry
+        if self._signature(path) != signature:
+            del self._cache[user_id]
+            return None
+        self._cache.move_to_end(user_id)
+        return data
+
+    def _remember(self, user_id: str, path: Path, data: UserData) -> None:
+        signature = self._signature(path)
+        if signature is None:
+            self._cache.pop(user_id, None)
+        else:
+            self._store_cached(user_id, signature, data)
+
+    def _store_cached(
+        self, user_id: str, signature: tuple[int, int], data: UserData
+    ) -> None:
+        self._cache[user_id] = (signature, data)
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > MAX_CACHED_USERS:
+            self._cache.popitem(last=False)
+
+    @staticmethod
+    def _signature(path: Path) -> tuple[int, int] | None:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
     def bootstrap_user(self, user_id: str | None = None) -> UserData:
         data, _, _ = self.ensure(user_id)
         return data
@@ -454,33 +669,127 @@ class UserDataStore:
                 raise ValueError("UserData missing persistent user_id")
             data.user_id = normalized
             path = self.resolve_path(normalized)
-            payload = data.to_dict()
-            self._write_to_path(path, payload)
+            self._archive_history(data)
+            self._write_text(path, data.to_json(compact=True, indent=2))
+            self._remember(normalized, path, data)
+            self._prune_archives(data)
+
+    def _archive_history(self, data: UserData) -> None:
+        """Move history outside each class's retention window to its archive.
+
+        The archive is appended to before the user file is rewritten, so a
+        failure in between can only duplicate entries, which readers skip.
+        """
+        for classroom in data.classrooms.iter_classes():
+            path = self.resolve_archive_path(data.user_id, classroom.class_id)
+            if path is None:
+                continue
+            retention = classroom.history_retention()
+            removed = classroom.cms.apply_history_retention(
+                retention["max_entries"], retention["max_days"]
+            )
+            if not removed:
+                continue
+            path.parent.mkdir(parents=True, exist_ok=True)
+            lines = "".join(
+                json.dumps(
+                    classroom.cms.serialize_history_entry(entry), ensure_ascii=False
+                )
+                + "\n"
+                for entry in removed
+            )
+            # Every append adds a gzip member; readers see one stream.
+            with gzip.open(path, "at", encoding="utf-8") as handle:
+                handle.write(lines)
+
+    def _prune_archives(self, data: UserData) -> None:
+        """Delete the archives of classes the user no longer has.
+
+        Runs after the user file is written, so a failed save never loses
+        the archive of a class that is still there.
+        """
+        archive_dir = self._data_dir / ARCHIVE_DIRNAME
+        if not archive_dir.exists():
+            return
+        kept: set[str] = set()
+        for classroom in data.classrooms.iter_classes():
+            path = self.resolve_archive_path(data.user_id, classroom.class_id)
+            if path is not None:
+                kept.add(path.name)
+        for archive in archive_dir.glob(f"{data.user_id}.*{ARCHIVE_SUFFIX}"):
+            if archive.name in kept:
+                continue
+            try:
+                archive.unlink()
+            except OSError:
+                pass
+
+    def upgrade_file(self, path: Path) -> str:
+        """Rewrite a data file in the current stored form.
+
+        Returns "current", "upgraded" or "unreadable"; files that are not a
+        JSON object are left untouched.
+        """
+        user_id = _sanitize_uuid(path.name.removesuffix(DATAFILE_SUFFIX))
+        payload = self._read_payload(path)
+        if not isinstance(payload, dict) or not user_id:
+            return "unreadable"
+        with self._lock:
+            data, current = UserData.load_stored(payload, default_user_id=user_id)
+            if current:
+                return "current"
+            self._write_upgraded(path, data)
+            self._cache.pop(user_id, None)
+        return "upgraded"
+
+    def iter_user_files(self) -> list[Path]:
+        return sorted(self._data_dir.glob(f"*{DATAFILE_SUFFIX}"))
 
     def _load_from_path(self, path: Path, user_id: str) -> UserData:
-        try:
-            raw = path.read_text(encoding="utf-8")
-            payload = json.loads(raw)
-        except (OSError, json.JSONDecodeError):
-            payload = {}
-        data = UserData.from_dict(payload, default_user_id=user_id)
+        payload = self._read_payload(path)
+        data, current = UserData.load_stored(payload, default_user_id=user_id)
+        if isinstance(payload, dict) and not current:
+            # Older formats are upgraded once so later loads take the
+            # fast path; files that do not parse are left for inspection.
+            self._write_upgraded(path, data)
+        signature = self._signature(path)
         data.touch_accessed()
+        if signature is not None:
+            self._store_cached(user_id, signature, data)
         return data
 
+    def _write_upgraded(self, path: Path, data: UserData) -> None:
+        """Rewrite an older file in the current form, keeping the original.
+
+        The tolerant loader drops what it cannot coerce, so the original
+        bytes are copied aside first; an existing backup is never replaced.
+        """
+        backup = path.with_name(path.name + UPGRADE_BACKUP_SUFFIX)
+        if not backup.exists():
+            shutil.copy2(path, backup)
+        self._write_text(path, data.to_json(compact=True, indent=2))
+
+    @staticmethod
+    def _read_payload(path: Path) -> Any | None:
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+
     def _create_default(self, user_id: str) -> UserData:
         data = UserData.default(user_id)
         data.touch_accessed()
         return data
 
     def _write_to_path(self, path: Path, payload: dict[str, Any]) -> None:
+        self._write_text(path, json.dumps(payload, ensure_ascii=False, indent=2))
+
+    def _write_text(self, path: Path, text: str) -> None:
         directory = path.parent
         directory.mkdir(parents=True, exist_ok=True)
         temp_path = path.with_suffix(path.suffix + ".tmp")
         try:
-            temp_path.write_text(
-                json.dumps(payload, ensure_ascii=False, indent=2),
-                encoding="utf-8",
-            )
+            temp_path.write_text(text, encoding="utf-8")
             temp_path.replace(path)
         finally:
             if temp_path.exists():
@@ -513,11 +822,21 @@ class UserDataStore:
             if not new_normalized:
                 raise ValueError("Invalid new user ID")
 
+            self._cache.pop(old_normalized, None)
+
             # Check if the target user exists
             new_path = self.resolve_path(new_normalized)
             if not new_path.exists():
                 raise ValueError("Target user ID does not exist")
 
+            archive_dir = self._data_dir / ARCHIVE_DIRNAME
+            if archive_dir.exists():
+                for archive in archive_dir.glob(f"{old_normalized}.*{ARCHIVE_SUFFIX}"):
+                    try:
+                        archive.unlink()
+                    except OSError:
+                        pass
+
             # Delete the old user's data file
             old_path = self.resolve_path(old_normalized)
             if old_path.exists():
@@ -0,0 +1,502 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import math
+import secrets
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Callable
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.classrooms import ClassroomsState
+from app.random_provider import EntropyBuffer
+from app.student import Student
+from app.student_store import ColumnarStudentStore, DictStudentStore
+from app.students_cms import DrawHistoryEntry, StudentsCms
+from app.user_data import UserData
+
+
+def timed(label: str, runs: int, func: Callable[[], object]) -> float:
+    started = time.perf_counter()
+    for _ in range(runs):
+        func()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<32} {elapsed * 1e9 / runs:>10.1f} ns/op")
+    return elapsed
+
+
+def chi_square_p_value(statistic: float, degrees: int) -> float:
+    """Upper tail of the chi-square distribution (Wilson-Hilferty)."""
+    if degrees <= 0:
+        return 1.0
+    scaled = (statistic / degrees) ** (1.0 / 3.0)
+    mean = 1.0 - 2.0 / (9.0 * degrees)
+    deviation = math.sqrt(2.0 / (9.0 * degrees))
+    z = (scaled - mean) / deviation
+    return 0.5 * math.erfc(z / math.sqrt(2.0))
+
+
+def bench_random(args: argparse.Namespace) -> None:
+    items = list(range(args.size))
+    source = EntropyBuffer()
+    print(f"choice over {args.size} items, {args.runs} calls")
+    baseline = timed("secrets.choice", args.runs, lambda: secrets.choice(items))
+    buffered = timed("EntropyBuffer.choice", args.runs, lambda: source.choice(items))
+    print(f"  speed-up: {baseline / buffered:.2f}x")
+
+    print(f"uniformity over {args.size} buckets, {args.samples} samples")
+    counts = [0] * args.size
+    for _ in range(args.samples):
+        counts[source.randbelow(args.size)] += 1
+    expected = args.samples / args.size
+    statistic = sum((count - expected) ** 2 / expected for count in counts)
+    p_value = chi_square_p_value(statistic, args.size - 1)
+    verdict = "ok" if p_value > 0.001 else "FAILED"
+    degrees = args.size - 1
+    print(f"  chi-square {statistic:.1f} (df={degrees}), p={p_value:.3f} {verdict}")
+    if verdict != "ok":
+        raise SystemExit(1)
+
+
+def sample_students(size: int) -> list[Student]:
+    now = time.time()
+    students = []
+    for index in range(size):
+        picks = [now - 86400.0 * (day + 1) for day in range(index % 4)]
+        student = Student(
+            name=f"学生{index:05d}",
+            group=index % 50,
+            pick_history=picks,
+            student_id=index + 1,
+        )
+        if picks:
+            student.apply_cooldown(picks[0], 3)
+        students.append(student)
+    return students
+
+
+def bench_roster(args: argparse.Namespace) -> None:
+    now = time.time()
+    print(f"roster of {args.size} students")
+    for label, store_type in (
+        ("dict of Student", DictStudentStore),
+        ("columnar", ColumnarStudentStore),
+    ):
+        gc.collect()
+        tracemalloc.start()
+        store = store_type()
+        for student in sample_students(args.size):
+            store.add(student)
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(label)
+        print(f"  {'memory':<32} {retained / args.size:>10.1f} bytes/student")
+        cms = StudentsCms(3, store=store)
+        timed(
+            "eligible_students scan",
+            args.runs,
+            lambda: cms.eligible_students(current_time=now),
+        )
+        if store_type is ColumnarStudentStore:
+            tracemalloc.start()
+            cms.get_students()
+            touched = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            label = "view cache, all rows read"
+            print(f"  {label:<32} {touched / args.size:>10.1f} bytes/student")
+
+
+def bench_names(args: argparse.Namespace) -> None:
+    print(f"create_student for rosters of up to {args.size} students")
+    for size in (args.size // 4, args.size // 2, args.size):
+        for label, explicit in (("explicit ids", True), ("generated ids", False)):
+            cms = StudentsCms(3)
+            started = time.perf_counter()
+            for index in range(size):
+                cms.create_student(
+                    f"Ｓｔｕｄｅｎｔ　{index:05d}",
+                    index % 10,
+                    student_id=index + 1 if explicit else None,
+                )
+            per_create = (time.perf_counter() - started) * 1e6 / size
+            print(f"  {size:>6} students, {label:<14} {per_create:>8.1f} us/create")
+
+
+def bench_search(args: argparse.Namespace) -> None:
+    surnames = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹"
+    given = "伟芳娜敏静丽强磊军洋勇艳杰娟涛明超霞平刚华玉萍红玲芬燕鹏辉"
+    cms = StudentsCms(3)
+    for index in range(args.size):
+        name = (
+            surnames[index % len(surnames)]
+            + given[index // len(surnames) % len(given)]
+            + given[index * 7 % len(given)]
+            + str(index // (len(surnames) * len(given)) or "")
+        )
+        cms.create_student(name, index % 40 + 1)
+    students = cms.get_students()
+    print(f"search over {args.size} students, first page of 50")
+    for query in ("王", "王伟", "伟芳", "12", "3"):
+
+        def scan() -> list[Student]:
+            lowered = query.lower()
+            return [
+                student
+                for student in students
+                if any(
+                    lowered in str(value).lower()
+                    for value in (student.student_id, student.name, student.group)
+                )
+            ]
+
+        total, _ = cms.search_students(query, 0, 50)
+        print(f"  query {query!r}, {total} matches")
+        timed("linear scan", args.runs, scan)
+        timed("search index", args.runs, lambda: cms.search_students(query, 0, 50))
+
+
+def bench_listing(args: argparse.Namespace) -> None:
+    now = time.time()
+    cms = StudentsCms(3)
+    for student in sample_students(args.size):
+        cms.add_student(student)
+    students = cms.get_students()
+    print(f"listing {args.size} students")
+    timed(
+        "sort on every call",
+        args.runs,
+        lambda: sorted(
+            students,
+            key=lambda student: (
+                -student.pick_count,
+                student.group,
+                student.name.lower(),
+                student.student_id,
+            ),
+        ),
+    )
+    timed("sorted_students, maintained", args.runs, cms.sorted_students)
+    timed(
+        "query: group 7, cooling",
+        args.runs,
+        lambda: cms.query_students(
+            {"group": {"min": 7, "max": 7}, "cooldown_expires_at": {"gt": now}}
+        ),
+    )
+    timed(
+        "query: not picked in 14 days",
+        args.runs,
+        lambda: cms.query_students(
+            {"last_pick": {"lt": now - 14 * 86400.0}}, limit=100
+        ),
+    )
+    timed(
+        "stats by scanning the roster",
+        args.runs,
+        lambda: (
+            sum(student.cooldown_expires_at > now for student in students),
+            Counter(student.group for student in students),
+            Counter(student.pick_count for student in students),
+        ),
+    )
+    timed("roster_stats, maintained", args.runs, lambda: cms.roster_stats(now))
+    clock = iter(range(10**9))
+    timed(
+        "pick, then list",
+        args.runs,
+        lambda: (
+            cms.register_random_pick(
+                [students[next(clock) % len(students)]], timestamp=now
+            ),
+            cms.sorted_students(),
+        ),
+    )
+
+
+def bench_history(args: argparse.Namespace) -> None:
+    print(f"history operations, {args.runs} calls per size")
+    for size in (args.size // 10, args.size // 2, args.size):
+        cms = StudentsCms(3)
+        started_at = time.time() - size
+        cms.load_history(
+            [
+                DrawHistoryEntry(timestamp=started_at + index).serialize()
+                for index in range(size)
+            ]
+        )
+        entry_ids = [entry.entry_id for entry in cms.history_entries()]
+        print(f"  {size} entries")
+        clock = iter(range(10**9))
+        timed(
+            "record_history_entry",
+            args.runs,
+            lambda: cms.record_history_entry(
+                DrawHistoryEntry(timestamp=started_at + size + next(clock))
+            ),
+        )
+        notes = iter(entry_ids)
+        timed(
+            "update_history_note",
+            min(args.runs, size),
+            lambda: cms.update_history_note(next(notes), "note"),
+        )
+        removals = iter(entry_ids)
+        timed(
+            "remove_history_record",
+            min(args.runs, size),
+            lambda: cms.remove_history_record(next(removals)),
+        )
+
+
+def bench_semester(args: argparse.Namespace) -> None:
+    cms = StudentsCms(3)
+    for index in range(args.students):
+        cms.create_student(f"学生{index:03d}", index % args.groups + 1)
+    members: dict[int, list[dict[str, object]]] = {}
+    for student in cms.get_students():
+        members.setdefault(student.group, []).append(
+            {"id": student.student_id, "name": student.name, "group": student.group}
+        )
+    started_at = time.time() - args.days * 86400.0
+    draws = args.days * args.draws_per_day
+    for index in range(draws):
+        group = index % args.groups + 1
+        cms.record_history_entry(
+            DrawHistoryEntry(
+                timestamp=started_at + index * 60.0,
+                mode="group",
+                group=group,
+                students=members[group],
+            )
+        )
+    print(f"{draws} group draws over {args.days} days, {args.students} students")
+    compact = cms.export_history(compact=True)
+    expanded = cms.export_history()
+    for label, payload in (("expanded", expanded), ("compact", compact)):
+        size = len(json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8"))
+        print(f"  {label + ' entries':<32} {size / 1024:>10.1f} KiB on disk")
+
+    def held_by(build: Callable[[], object]) -> int:
+        gc.collect()
+        tracemalloc.start()
+        held = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del held
+        return size
+
+    # Members as the loader used to hold them, against whole compact entries.
+    expanded_raw = json.loads(json.dumps(expanded))["entries"]
+    compact_raw = json.loads(json.dumps(compact))["entries"]
+    member_dicts = held_by(
+        lambda: [[dict(item) for item in entry["students"]] for entry in expanded_raw]
+    )
+    entries = held_by(
+        lambda: [DrawHistoryEntry.from_payload(entry) for entry in compact_raw]
+    )
+    print(f"  {'member dicts alone':<32} {member_dicts / 1024:>10.1f} KiB in memory")
+    print(f"  {'compact entries, whole':<32} {entries / 1024:>10.1f} KiB in memory")
+
+    def walk_entries() -> tuple[Counter, Counter]:
+        days: Counter[int] = Counter()
+        students: Counter[int] = Counter()
+        for entry in cms.export_history()["entries"]:
+            for student in entry["students"]:
+                days[int(entry["timestamp"]) // 86400] += 1
+                students[student["id"]] += 1
+        return days, students
+
+    timed("report by walking entries", args.runs, walk_entries)
+    timed("pick_report, columnar", args.runs, cms.pick_report)
+    window = (started_at, started_at + args.days * 43200.0)
+    timed(
+        "fairness_report, after a change",
+        args.runs,
+        lambda: (cms.set_pick_cooldown(3), cms.fairness_report(*window)),
+    )
+    timed("fairness_report, cached", args.runs, lambda: cms.fairness_report(*window))
+
+
+def bench_encode(args: argparse.Namespace) -> None:
+    now = time.time()
+    state = ClassroomsState.from_payload(None)
+    for index in range(args.classes):
+        cms = StudentsCms(3)
+        for number in range(args.students):
+            cms.create_student(f"学生{number:03d}", number % 8 + 1)
+        students = cms.get_students()
+        for draw in range(args.draws):
+            student = students[draw % len(students)]
+            cms.record_history_entry(
+                DrawHistoryEntry(
+                    timestamp=now - (args.draws - draw) * 60.0,
+                    students=[
+                        {
+                            "id": student.student_id,
+                            "name": student.name,
+                            "group": student.group,
+                        }
+                    ],
+                )
+            )
+        state.create_class(f"班级{index}", cms=cms)
+    data = UserData(user_id="0" * 32, classrooms=state)
+    data.ensure_defaults()
+    print(f"{args.classes} classes of {args.students} students, {args.draws} draws")
+    timed(
+        "to_dict + json.dumps",
+        args.runs,
+        lambda: json.dumps(data.to_dict(), ensure_ascii=False, separators=(",", ":")),
+    )
+    data.to_json()
+    timed("to_json, all classes clean", args.runs, lambda: data.to_json())
+    dirty = state.current_class.cms
+
+    def one_dirty() -> None:
+        dirty.set_pick_cooldown(dirty.pick_cooldown)
+        data.to_json()
+
+    timed("to_json, one class dirty", args.runs, one_dirty)
+
+
+def bench_load(args: argparse.Namespace) -> None:
+    now = time.time()
+    state = ClassroomsState.from_payload(None)
+    for index in range(args.classes):
+        cms = StudentsCms(3)
+        for number in range(args.students):
+            cms.create_student(f"学生{number:03d}", number % 8 + 1)
+        students = cms.get_students()
+        for draw in range(args.draws):
+            student = students[draw % len(students)]
+            cms.record_history_entry(
+                DrawHistoryEntry(
+                    timestamp=now - (args.draws - draw) * 60.0,
+                    students=[
+                        {
+                            "id": student.student_id,
+                            "name": student.name,
+                            "group": student.group,
+                        }
+                    ],
+                )
+            )
+            student.register_pick(now - (args.draws - draw) * 60.0, 3)
+        state.create_class(f"班级{index}", cms=cms)
+    text = UserData(user_id="0" * 32, classrooms=state).to_json(compact=True, indent=2)
+    untagged = json.loads(text)
+    untagged.pop("writer")
+    untagged_text = json.dumps(untagged, ensure_ascii=False, indent=2)
+    print(
+        f"{args.classes} classes x {args.students} students x {args.draws} draws, "
+        f"{len(text.encode('utf-8')) / 1048576:.1f} MiB"
+    )
+    timed("json.loads", args.runs, lambda: json.loads(text))
+    timed(
+        "from_dict, tolerant path",
+        args.runs,
+        lambda: UserData.from_dict(json.loads(untagged_text)),
+    )
+    timed(
+        "from_dict, tagged fast path",
+        args.runs,
+        lambda: UserData.from_dict(json.loads(text)),
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.benchmark",
+        description="Micro-benchmarks for PickMe internals.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    random_parser = commands.add_parser(
+        "random", help="Buffered entropy source against secrets.choice."
+    )
+    random_parser.add_argument("--size", type=int, default=60)
+    random_parser.add_argument("--runs", type=int, default=200_000)
+    random_parser.add_argument("--samples", type=int, default=600_000)
+    random_parser.set_defaults(handler=bench_random)
+
+    roster_parser = commands.add_parser(
+        "roster", help="Memory and eligibility scans per student store."
+    )
+    roster_parser.add_argument("--size", type=int, default=20_000)
+    roster_parser.add_argument("--runs", type=int, default=50)
+    roster_parser.set_defaults(handler=bench_roster)
+
+    names_parser = commands.add_parser(
+        "names", help="Roster entry: name checks and id allocation."
+    )
+    names_parser.add_argument("--size", type=int, default=8000)
+    names_parser.set_defaults(handler=bench_names)
+
+    search_parser = commands.add_parser(
+        "search", help="Student search: linear scan against the search index."
+    )
+    search_parser.add_argument("--size", type=int, default=10_000)
+    search_parser.add_argument("--runs", type=int, default=200)
+    search_parser.set_defaults(handler=bench_search)
+
+    listing_parser = commands.add_parser(
+        "listing", help="Roster listing, queries and stats from maintained indexes."
+    )
+    listing_parser.add_argument("--size", type=int, default=10_000)
+    listing_parser.add_argument("--runs", type=int, default=200)
+    listing_parser.set_defaults(handler=bench_listing)
+
+    history_parser = commands.add_parser(
+        "history", help="Draw history recording, lookup and removal."
+    )
+    history_parser.add_argument("--size", type=int, default=40_000)
+    history_parser.add_argument("--runs", type=int, default=2000)
+    history_parser.set_defaults(handler=bench_history)
+
+    semester_parser = commands.add_parser(
+        "semester", help="History size, memory and reports for a term."
+    )
+    semester_parser.add_argument("--students", type=int, default=60)
+    semester_parser.add_argument("--groups", type=int, default=10)
+    semester_parser.add_argument("--days", type=int, default=100)
+    semester_parser.add_argument("--draws-per-day", type=int, default=6)
+    semester_parser.add_argument("--runs", type=int, default=20)
+    semester_parser.set_defaults(handler=bench_semester)
+
+    encode_parser = commands.add_parser(
+        "encode", help="Response encoding with cached class fragments."
+    )
+    encode_parser.add_argument("--classes", type=int, default=8)
+    encode_parser.add_argument("--students", type=int, default=60)
+    encode_parser.add_argument("--draws", type=int, default=600)
+    encode_parser.add_argument("--runs", type=int, default=50)
+    encode_parser.set_defaults(handler=bench_encode)
+
+    load_parser = commands.add_parser(
+        "load", help="User file loading: tolerant against tagged fast path."
+    )
+    load_parser.add_argument("--classes", type=int, default=50)
+    load_parser.add_argument("--students", type=int, default=60)
+    load_parser.add_argument("--draws", type=int, default=2000)
+    load_parser.add_argument("--runs", type=int, default=3)
+    load_parser.set_defaults(handler=bench_load)
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
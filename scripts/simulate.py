@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_DATA_FILE = Path.home() / ".pickme" / "local.pickme.v2.json"
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.simulation import SimulationConfig, load_roster, sweep
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.simulate",
+        description="Simulate draws over a term to tune cooldown settings.",
+    )
+    parser.add_argument(
+        "--data-file",
+        type=Path,
+        default=DEFAULT_DATA_FILE,
+        help="User data file to read the classroom from.",
+    )
+    parser.add_argument(
+        "--class",
+        dest="class_id",
+        default=None,
+        help="Class id or name (defaults to the active class).",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=("single", "batch", "group"),
+        default="single",
+        help="Draw mode to simulate.",
+    )
+    parser.add_argument(
+        "--cooldown",
+        type=int,
+        action="append",
+        default=None,
+        help="Cooldown in days. Repeat to sweep several values.",
+    )
+    parser.add_argument("--batch-count", type=int, default=1)
+    parser.add_argument("--ignore-cooldown", action="store_true")
+    parser.add_argument("--days", type=int, default=120, help="Length of the term.")
+    parser.add_argument(
+        "--draws-per-day", type=int, default=6, help="Draws on every school day."
+    )
+    parser.add_argument(
+        "--weekdays",
+        default="0,1,2,3,4",
+        help="Comma separated school days, 0 is Monday.",
+    )
+    parser.add_argument(
+        "--replicas",
+        type=int,
+        default=1000,
+        help="Independent terms simulated side by side.",
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help="Ignore the cooldowns currently stored in the data file.",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=None,
+        help="Worker processes for sweeps (defaults to the CPU count).",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print the full reports as JSON."
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    roster = load_roster(args.data_file, args.class_id)
+    weekdays = tuple(
+        int(item) for item in args.weekdays.split(",") if item.strip() != ""
+    )
+    configs = [
+        SimulationConfig(
+            mode=args.mode,
+            cooldown_days=cooldown,
+            days=args.days,
+            draws_per_day=args.draws_per_day,
+            weekdays=weekdays,
+            batch_count=args.batch_count,
+            ignore_cooldown=args.ignore_cooldown,
+            replicas=args.replicas,
+            seed=args.seed,
+            respect_current_cooldowns=not args.fresh,
+        )
+        for cooldown in (args.cooldown or [3])
+    ]
+    reports = sweep(roster, configs, processes=args.processes)
+    if args.json:
+        print(json.dumps([report.to_dict() for report in reports], indent=2))
+        return
+    print(f"{len(roster)} students, {args.replicas} simulated terms per setting")
+    header = (
+        f"{'cooldown':>8} {'draws':>10} {'failed':>7} {'mean':>7} "
+        f"{'min':>5} {'max':>5} {'gini':>6} {'cv':>6} {'never':>6} {'secs':>6}"
+    )
+    print(header)
+    for report in reports:
+        picks = report.picks_per_student
+        fairness = report.fairness
+        print(
+            f"{report.config['cooldown_days']:>8} "
+            f"{report.scheduled_draws:>10} "
+            f"{report.failure_rate:>7.1%} "
+            f"{picks.get('mean', 0.0):>7.2f} "
+            f"{picks.get('min', 0.0):>5.0f} "
+            f"{picks.get('max', 0.0):>5.0f} "
+            f"{fairness.get('gini', 0.0):>6.3f} "
+            f"{fairness.get('coefficient_of_variation', 0.0):>6.3f} "
+            f"{fairness.get('never_picked_share', 0.0):>6.1%} "
+            f"{report.elapsed_seconds:>6.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+DEFAULT_APP_DATA_DIR = Path.home() / ".pickme" / "users"
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.user_data import UserDataStore
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.upgrade",
+        description=(
+            "Rewrite every user data file in the current format. "
+            "Run it while the server is stopped."
+        ),
+    )
+    parser.add_argument(
+        "--app-data-dir",
+        type=Path,
+        default=DEFAULT_APP_DATA_DIR,
+        help="Directory holding the user data files.",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=None,
+        help="Worker processes (defaults to the CPU count).",
+    )
+    return parser.parse_args()
+
+
+def upgrade_one(app_data_dir: Path, path: Path) -> str:
+    return UserDataStore(app_data_dir).upgrade_file(path)
+
+
+def main() -> None:
+    args = parse_args()
+    if not args.app_data_dir.is_dir():
+        raise SystemExit(f"No data directory at {args.app_data_dir}")
+    paths = UserDataStore(args.app_data_dir).iter_user_files()
+    total = len(paths)
+    print(f"{total} data files in {args.app_data_dir}")
+    outcomes: Counter[str] = Counter()
+    with ProcessPoolExecutor(max_workers=args.processes) as pool:
+        futures = {
+            pool.submit(upgrade_one, args.app_data_dir, path): path for path in paths
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            path = futures[future]
+            try:
+                outcome = future.result()
+            except Exception as error:  # noqa: BLE001 - reported per file
+                outcome = "failed"
+                print(f"  {path.name}: {error}")
+            outcomes[outcome] += 1
+            if outcome != "current":
+                print(f"[{done}/{total}] {path.name}: {outcome}")
+            elif done % 100 == 0 or done == total:
+                print(f"[{done}/{total}]")
+    summary = ", ".join(
+        f"{outcomes[key]} {key}"
+        for key in ("upgraded", "current", "unreadable", "failed")
+        if outcomes[key]
+    )
+    print(summary or "nothing to do")
+    if outcomes["failed"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()